@@ -0,0 +1,305 @@
+"""
+Approximate nearest-neighbour index (IVF, optional PQ) for the local vector backend.
+
+Rows of the local embedding matrix are clustered with spherical k-means into nlist
+inverted lists. A query scores the centroids, probes the nprobe closest lists and
+scores only their rows, instead of the whole matrix. With ANN_PQ_M > 0 the probed rows
+are first scored from product-quantized codes (m bytes per row) and only the best
+ANN_RERANK candidates are re-scored exactly against the memory-mapped matrix.
+
+The index is saved next to the matrix as ann.npz. It stores centroids, the list of
+every row and (optionally) PQ codebooks and codes; the inverted lists are rebuilt
+from the assignments at load. New rows can be appended with add(), which assigns
+them to the existing centroids without retraining. update_ann_index() does this when
+the new id table extends the one the index was built for. A fingerprint of every row's
+vector is kept as well, so rows whose embedding changed under the same id are found
+and re-assigned / re-encoded instead of keeping their stale list and PQ code.
+"""
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from config import ANN_MIN_PROFILES, ANN_NLIST, ANN_NPROBE, ANN_PQ_M, ANN_RERANK
+from local_store import load_local_index
+from search import SCORE_BLOCK_ROWS, normalize_rows, top_k_indices
+
+ANN_FILE = "ann.npz"
+KMEANS_ITERS = 20
+# Training sample per centroid; k-means on the full matrix adds little once lists have this many points
+TRAIN_POINTS_PER_LIST = 64
+PQ_CODES = 256
+
+
+# Odd 64-bit multipliers per dimension for row_fingerprints (fixed seed: fingerprints are saved)
+_FINGERPRINT_SEED = 0x5EED
+
+
+def ids_digest(ids: list[str]) -> str:
+    return hashlib.sha1(json.dumps(ids).encode("utf-8")).hexdigest()
+
+
+def row_fingerprints(vectors: np.ndarray) -> np.ndarray:
+    """
+    uint64 per row: sum of the float32 bit patterns times odd multipliers, mod 2**64.
+    Changing any value of a row changes its fingerprint (collisions ~2**-64); vectorized, in blocks.
+    """
+    n = len(vectors)
+    if not n:
+        return np.empty(0, dtype=np.uint64)
+    dim = vectors.shape[1]
+    mult = np.random.default_rng(_FINGERPRINT_SEED).integers(0, 2**63, size=dim, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    out = np.empty(n, dtype=np.uint64)
+    for start in range(0, n, SCORE_BLOCK_ROWS):
+        block = np.ascontiguousarray(vectors[start : start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        out[start : start + len(block)] = (block.view(np.uint32).astype(np.uint64) * mult).sum(axis=1, dtype=np.uint64)
+    return out
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray, metric: str = "ip") -> np.ndarray:
+    """Nearest centroid per row (max inner product, or min L2), in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    if metric == "l2":
+        c_sq = (centroids**2).sum(axis=1)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start : start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores = block @ centroids.T
+        if metric == "l2":
+            scores = 2 * scores - c_sq  # argmax of -||x - c||^2 up to a per-row constant
+        out[start : start + len(block)] = scores.argmax(axis=1)
+    return out
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, spherical: bool = True, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means on x (n, d). spherical=True keeps centroids unit-length (cosine)."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = np.array(x[rng.choice(len(x), k, replace=False)], dtype=np.float32)
+    metric = "ip" if spherical else "l2"
+    for _ in range(iters):
+        labels = _assign(x, centroids, metric)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums[nonempty] = np.add.reduceat(x[order], starts, axis=0)
+        empty = ~nonempty
+        # Re-seed empty clusters with random points so every list stays in use
+        sums[empty] = x[rng.choice(len(x), int(empty.sum()))]
+        counts[empty] = 1
+        centroids = sums / counts[:, None]
+        if spherical:
+            centroids = normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        assignments: np.ndarray,
+        trained_rows: int,
+        codebooks: np.ndarray | None = None,
+        codes: np.ndarray | None = None,
+        digest: str = "",
+        fingerprints: np.ndarray | None = None,
+    ):
+        self.centroids = centroids
+        self.assignments = assignments
+        self.trained_rows = trained_rows
+        self.codebooks = codebooks  # (m, 256, dim // m) or None
+        self.codes = codes  # (n, m) uint8 or None
+        self.digest = digest  # ids_digest of the rows covered
+        # row_fingerprints of the vectors each row was assigned / encoded from (None: index predates them)
+        self.fingerprints = fingerprints
+        self._build_lists()
+
+    def _build_lists(self) -> None:
+        self.list_rows = np.argsort(self.assignments, kind="stable").astype(np.int32)
+        self.list_offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.assignments, minlength=len(self.centroids)), out=self.list_offsets[1:])
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def train(cls, embeddings: np.ndarray, nlist: int = 0, pq_m: int = 0, seed: int = 0) -> "IVFIndex":
+        """Cluster the (normalized) matrix and assign every row; pq_m > 0 also trains PQ codes."""
+        n, dim = embeddings.shape
+        nlist = nlist or max(1, int(4 * np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, nlist * TRAIN_POINTS_PER_LIST)
+        sample = np.asarray(embeddings[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = kmeans(sample, nlist, seed=seed)
+        codebooks = None
+        if pq_m:
+            if dim % pq_m:
+                raise ValueError(f"ANN_PQ_M={pq_m} must divide the embedding dimension {dim}")
+            sub = dim // pq_m
+            pq_sample = sample[: PQ_CODES * TRAIN_POINTS_PER_LIST]
+            codebooks = np.stack(
+                [kmeans(pq_sample[:, j * sub : (j + 1) * sub], PQ_CODES, spherical=False, seed=seed) for j in range(pq_m)]
+            )
+        index = cls(
+            centroids, np.empty(0, dtype=np.int32), trained_rows=n, codebooks=codebooks, fingerprints=np.empty(0, dtype=np.uint64)
+        )
+        index.add(embeddings)
+        return index
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        m, _, sub = self.codebooks.shape
+        codes = np.empty((len(vectors), m), dtype=np.uint8)
+        for j in range(m):
+            codes[:, j] = _assign(vectors[:, j * sub : (j + 1) * sub], self.codebooks[j], "l2")
+        return codes
+
+    def add(self, vectors: np.ndarray, digest: str = "") -> None:
+        """Append rows (already L2-normalized, in matrix order) to their nearest lists."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors):
+            self.assignments = np.concatenate([self.assignments, _assign(vectors, self.centroids)])
+            if self.codebooks is not None:
+                fresh = self._encode(vectors)
+                self.codes = fresh if self.codes is None else np.concatenate([self.codes, fresh])
+            if self.fingerprints is not None:
+                self.fingerprints = np.concatenate([self.fingerprints, row_fingerprints(vectors)])
+            self._build_lists()
+        if digest:
+            self.digest = digest
+
+    def replace(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """Re-assign (and re-encode) existing rows whose vectors changed."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(rows):
+            return
+        self.assignments[rows] = _assign(vectors, self.centroids)
+        if self.codebooks is not None:
+            self.codes[rows] = self._encode(vectors)
+        if self.fingerprints is not None:
+            self.fingerprints[rows] = row_fingerprints(vectors)
+        self._build_lists()
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        query_embeddings: np.ndarray,
+        top_k: int,
+        nprobe: int = ANN_NPROBE,
+        rerank: int = ANN_RERANK,
+    ) -> list[tuple[int, float]]:
+        """
+        Max-fused top-k over all query embeddings, like search.top_k_scores but scoring only
+        rows in each query's nprobe closest lists. Returns [(row, score)] with score > 0.
+        """
+        queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        lists = np.unique(probe)
+        starts, ends = self.list_offsets[lists], self.list_offsets[lists + 1]
+        rows = np.concatenate([self.list_rows[a:b] for a, b in zip(starts, ends)])
+        if not len(rows):
+            return []
+        rows.sort()  # ascending rows -> sequential reads from the memmap
+        if self.codebooks is not None and len(rows) > max(rerank, top_k):
+            # Asymmetric distance: per-query lookup tables over the codebooks, summed over subspaces
+            m, _, sub = self.codebooks.shape
+            tables = np.einsum("qjs,jcs->qjc", queries.reshape(len(queries), m, sub), self.codebooks)
+            codes = self.codes[rows]
+            approx = np.zeros((len(queries), len(rows)), dtype=np.float32)
+            for j in range(m):
+                approx += tables[:, j, codes[:, j]]
+            rows = np.sort(rows[top_k_indices(approx.max(axis=0), max(rerank, top_k))])
+        scores = (np.asarray(embeddings[rows], dtype=np.float32) @ queries.T).max(axis=1)
+        return [(int(rows[i]), float(scores[i])) for i in top_k_indices(scores, top_k) if scores[i] > 0]
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        tmp = path.with_suffix(".tmp.npz")
+        arrays = {
+            "centroids": self.centroids,
+            "assignments": self.assignments,
+            "meta": np.array(json.dumps({"trained_rows": self.trained_rows, "digest": self.digest})),
+        }
+        if self.codebooks is not None:
+            arrays["codebooks"] = self.codebooks
+            arrays["codes"] = self.codes
+        if self.fingerprints is not None:
+            arrays["fingerprints"] = self.fingerprints
+        np.savez(tmp, **arrays)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "IVFIndex":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(
+                data["centroids"],
+                data["assignments"],
+                trained_rows=meta["trained_rows"],
+                codebooks=data["codebooks"] if "codebooks" in data else None,
+                codes=data["codes"] if "codes" in data else None,
+                digest=meta.get("digest", ""),
+                fingerprints=data["fingerprints"] if "fingerprints" in data else None,
+            )
+
+
+def load_ann_index(index_dir: str, ids: list[str]) -> IVFIndex | None:
+    """The saved index for this id table, or None (missing, or built for different rows)."""
+    path = Path(index_dir) / ANN_FILE
+    if not path.exists():
+        return None
+    index = IVFIndex.load(path)
+    if len(index) != len(ids) or index.digest != ids_digest(ids):
+        print(f"ANN index {path} does not match the local index; using exact search.", file=sys.stderr)
+        return None
+    return index
+
+
+def update_ann_index(index_dir: str, retrain: bool = False) -> IVFIndex | None:
+    """
+    Bring ann.npz in line with the local matrix after a rebuild. Rows appended to the id
+    table since the last run are added to the existing lists, and existing rows whose
+    vector changed (same id, new document or embedding) are re-assigned and re-encoded.
+    The index is retrained when the id table changed other than by appending, more than
+    half of the existing rows changed, the matrix has doubled since training, the PQ
+    setting changed, the index has no row fingerprints yet, or retrain=True.
+    Below ANN_MIN_PROFILES rows no index is kept.
+    """
+    ids, embeddings, _ = load_local_index(index_dir)
+    path = Path(index_dir) / ANN_FILE
+    if len(ids) < ANN_MIN_PROFILES:
+        path.unlink(missing_ok=True)
+        return None
+    index = None if retrain or not path.exists() else IVFIndex.load(path)
+    if index is not None:
+        pq_m = index.codebooks.shape[0] if index.codebooks is not None else 0
+        n_old = len(index)
+        if (
+            pq_m != ANN_PQ_M
+            or index.centroids.shape[1] != embeddings.shape[1]
+            or n_old > len(ids)
+            or index.digest != ids_digest(ids[:n_old])
+            or len(ids) > 2 * index.trained_rows
+            or index.fingerprints is None
+            or len(index.fingerprints) != n_old
+        ):
+            index = None
+        else:
+            changed = np.flatnonzero(index.fingerprints != row_fingerprints(embeddings[:n_old]))
+            if 2 * len(changed) > n_old:
+                index = None
+            else:
+                index.replace(changed, embeddings[changed])
+                index.add(embeddings[n_old:], digest=ids_digest(ids))
+    if index is None:
+        index = IVFIndex.train(embeddings, nlist=ANN_NLIST, pq_m=ANN_PQ_M)
+        index.digest = ids_digest(ids)
+    index.save(path)
+    return index
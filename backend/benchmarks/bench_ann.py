@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Recall@k and throughput of the IVF index (ann_index.IVFIndex) against exact search
+(search.top_k_scores) on a synthetic clustered corpus.
+
+Usage:
+  cd backend
+  python benchmarks/bench_ann.py                                  # 100k profiles, dim 1536
+  python benchmarks/bench_ann.py --sizes 100000 1000000 --dim 256 --nprobe 4 8 16 32 --pq-m 32
+
+Real embeddings are clustered (by field, company, role), so the corpus is drawn as
+noisy points around random topic centres rather than uniformly on the sphere, where
+no partitioning scheme can beat a scan. Each query is a batch of --phrases embeddings,
+max-fused like /search.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ann_index import IVFIndex  # noqa: E402
+from search import normalize_rows, top_k_scores  # noqa: E402
+
+
+def _clustered_corpus(n: int, dim: int, topics: int, noise: float, rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    centres = normalize_rows(rng.standard_normal((topics, dim), dtype=np.float32))
+    out = np.empty((n, dim), dtype=np.float32)
+    chunk = 65536
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        block = centres[rng.integers(topics, size=m)] + noise * rng.standard_normal((m, dim), dtype=np.float32) / np.sqrt(dim)
+        out[start : start + m] = normalize_rows(block)
+    return out, centres
+
+
+def _queries(centres: np.ndarray, count: int, phrases: int, noise: float, rng: np.random.Generator) -> list[np.ndarray]:
+    dim = centres.shape[1]
+    return [
+        normalize_rows(centres[rng.integers(len(centres), size=phrases)] + noise * rng.standard_normal((phrases, dim), dtype=np.float32) / np.sqrt(dim))
+        for _ in range(count)
+    ]
+
+
+def _qps(fn, queries: list[np.ndarray]) -> tuple[float, list]:
+    fn(queries[0])  # warm-up
+    t0 = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return len(queries) / (time.perf_counter() - t0), results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--topics", type=int, default=2000, help="cluster centres in the synthetic corpus")
+    parser.add_argument("--noise", type=float, default=1.5, help="spread of points around their centre")
+    parser.add_argument("--nlist", type=int, default=0, help="inverted lists (0 = 4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--pq-m", type=int, default=0, help="PQ subspaces (0 = exact scoring of probed rows)")
+    parser.add_argument("--rerank", type=int, default=200)
+    parser.add_argument("--phrases", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} phrases={args.phrases} top_k={args.top_k} queries={args.queries} pq_m={args.pq_m}")
+    for n in args.sizes:
+        corpus, centres = _clustered_corpus(n, args.dim, args.topics, args.noise, rng)
+        queries = _queries(centres, args.queries, args.phrases, args.noise, rng)
+        t0 = time.perf_counter()
+        index = IVFIndex.train(corpus, nlist=args.nlist, pq_m=args.pq_m)
+        build_s = time.perf_counter() - t0
+        exact_qps, exact = _qps(lambda q: top_k_scores(corpus, q, args.top_k, normalized=True), queries)
+        print(f"\nprofiles={n} nlist={index.nlist} build={build_s:.1f}s exact={exact_qps:.1f} qps")
+        print(f"{'nprobe':>8}  {'recall@' + str(args.top_k):>10}  {'qps':>10}  {'speedup':>8}")
+        truth = [{i for i, _ in hits} for hits in exact]
+        for nprobe in args.nprobe:
+            qps, approx = _qps(lambda q: index.search(corpus, q, args.top_k, nprobe=nprobe, rerank=args.rerank), queries)
+            recall = np.mean([len(t & {i for i, _ in a}) / max(1, len(t)) for t, a in zip(truth, approx)])
+            print(f"{nprobe:>8}  {recall:>10.3f}  {qps:>10.1f}  {qps / exact_qps:>7.1f}x")
+        del corpus
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite on synthetic data, with no live OpenAI / Pinecone keys.
+
+For each --profiles size the suite generates (and caches) a synthetic dump
+(synth_profiles.py), starts the local OpenAI / Pinecone stand-ins (fake_upstreams.py)
+with the requested latency, and times these scenarios in a fresh worker process:
+
+  load_profiles    indexer.load_profiles(slim=True) over the whole dump     profiles/s
+  build_document   indexer.build_document per profile                       docs/s
+  embed_pipeline   embed_json_to_vectordb.main(): full sync, then a no-op    profiles/s
+                   delta sync (embed_pipeline_delta)
+  alumni           GET /alumni (full body) and paged GET /alumni?limit=100   req/s
+  search           POST /search: unique queries (cold), then the same        req/s
+                   queries again (warm, served from the caches)
+
+Each scenario reports throughput and p50 / p95 / p99 latency. Results are appended to
+--results (JSON lines) and compared with the previous run of the same scenario and
+settings; a p50 or throughput more than --regression-pct worse is flagged, and
+--fail-on-regression turns that into exit status 1 (for CI).
+
+Usage:
+  cd backend
+  python benchmarks/bench_suite.py                                   # 1k and 10k profiles, integrated embedding
+  python benchmarks/bench_suite.py --profiles 100000 --mode local --scenarios load_profiles build_document alumni
+  python benchmarks/bench_suite.py --mode vector --openai-latency-ms 150 --pinecone-latency-ms 30 --concurrency 16
+
+--mode picks the backend configuration: text (Pinecone integrated embedding, the default
+deployment), vector (OpenAI embeddings + Pinecone vectors) or local (VECTOR_BACKEND=local).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+SCENARIOS = ["load_profiles", "build_document", "embed_pipeline", "alumni", "search"]
+MODES = {
+    "text": {"VECTOR_BACKEND": "pinecone", "PINECONE_USE_INTEGRATED_EMBEDDING": "true"},
+    "vector": {"VECTOR_BACKEND": "pinecone", "PINECONE_USE_INTEGRATED_EMBEDDING": "false"},
+    "local": {"VECTOR_BACKEND": "local", "PINECONE_USE_INTEGRATED_EMBEDDING": "false"},
+}
+QUERY_TEMPLATES = [
+    "I need help with my resume for a {title} role at {company}",
+    "I want to work at {company} as a {title}, who can give me advice?",
+    "career advice for getting into {field} in {city}",
+    "looking for a mentor in {field} who knows {skill}",
+    "how do I prepare for {title} interviews, I know {skill}",
+    "I am interested in {field} and {skill}, can someone review my resume",
+]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def summarize(scenario: str, samples_ms: list[float], throughput: float, unit: str, **extra) -> dict:
+    return {
+        "scenario": scenario,
+        "runs": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+        "throughput": round(throughput, 2),
+        "unit": unit,
+        **extra,
+    }
+
+
+def make_queries(count: int, seed: int) -> list[str]:
+    from synth_profiles import CITIES, COMPANIES, FIELDS, SKILLS, TITLES
+
+    rng = random.Random(seed)
+    queries: list[str] = []
+    seen: set[str] = set()
+    while len(queries) < count:
+        q = rng.choice(QUERY_TEMPLATES).format(
+            title=rng.choice(TITLES).lower(), company=rng.choice(COMPANIES), field=rng.choice(FIELDS),
+            city=rng.choice(CITIES).split(",")[0], skill=rng.choice(SKILLS),
+        )
+        if q not in seen:
+            seen.add(q)
+            queries.append(q)
+    return queries
+
+
+# ---------------------------------------------------------------- worker (one size, one process)
+
+def _timed_calls(fn, items, concurrency: int) -> tuple[list[float], float]:
+    """Call fn(item) for every item with `concurrency` threads; per-call ms and wall-clock seconds."""
+    def one(item):
+        t0 = time.perf_counter()
+        fn(item)
+        return (time.perf_counter() - t0) * 1000
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        samples = [one(item) for item in items]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(one, items))
+    return samples, time.perf_counter() - start
+
+
+def run_worker(args: argparse.Namespace) -> list[dict]:
+    from config import DATA_PATH, MAX_INDEX_PROFILES
+
+    n = MAX_INDEX_PROFILES
+    results = []
+    scenarios = set(args.scenarios)
+
+    if "load_profiles" in scenarios or "build_document" in scenarios:
+        from indexer import build_document, load_profiles
+
+        samples = []
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            profiles = load_profiles(DATA_PATH, limit=n, slim=True)
+            samples.append((time.perf_counter() - t0) * 1000)
+        if "load_profiles" in scenarios:
+            results.append(summarize("load_profiles", samples, n / (percentile(samples, 50) / 1000), "profiles/s"))
+        if "build_document" in scenarios:
+            per_doc, total = _timed_calls(build_document, profiles, 1)
+            results.append(summarize("build_document", per_doc, len(profiles) / total, "docs/s"))
+        del profiles
+
+    needs_index = "search" in scenarios
+    if "embed_pipeline" in scenarios or needs_index:
+        import embed_json_to_vectordb
+
+        runs = {"embed_pipeline": [], "embed_pipeline_delta": []}
+        for _ in range(args.pipeline_repeats if "embed_pipeline" in scenarios else 1):
+            Path(os.environ["SYNC_MANIFEST_PATH"]).unlink(missing_ok=True)
+            for name in runs:  # full sync, then an unchanged (delta) sync
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    status = embed_json_to_vectordb.main()
+                if status != 0:
+                    raise RuntimeError(f"embed_json_to_vectordb.main() exited with {status}")
+                runs[name].append((time.perf_counter() - t0) * 1000)
+        if "embed_pipeline" in scenarios:
+            for name, samples in runs.items():
+                results.append(summarize(name, samples, n / (percentile(samples, 50) / 1000), "profiles/s"))
+
+    if "alumni" in scenarios or "search" in scenarios:
+        from fastapi.testclient import TestClient
+
+        import main
+
+        with TestClient(main.app) as client:
+            if "alumni" in scenarios:
+                def get_full(_):
+                    r = client.get("/alumni")
+                    r.raise_for_status()
+
+                samples, total = _timed_calls(get_full, range(args.repeats), 1)
+                results.append(summarize("alumni", samples, len(samples) / total, "req/s", variant="full"))
+                offsets = [random.Random(i).randrange(0, max(1, n - 100)) for i in range(args.requests)]
+
+                def get_page(offset):
+                    r = client.get("/alumni", params={"offset": offset, "limit": 100})
+                    r.raise_for_status()
+
+                samples, total = _timed_calls(get_page, offsets, args.concurrency)
+                results.append(summarize("alumni_page", samples, len(samples) / total, "req/s"))
+
+            if "search" in scenarios:
+                queries = make_queries(args.requests, args.seed)
+
+                def post_search(query):
+                    r = client.post("/search", json={"query": query})
+                    r.raise_for_status()
+
+                for variant in ("cold", "warm"):
+                    samples, total = _timed_calls(post_search, queries, args.concurrency)
+                    results.append(summarize(f"search_{variant}", samples, len(samples) / total, "req/s"))
+    return results
+
+
+# ---------------------------------------------------------------- driver
+
+def _settings(args: argparse.Namespace, profiles: int) -> dict:
+    return {
+        "profiles": profiles,
+        "mode": args.mode,
+        "openai_latency_ms": args.openai_latency_ms,
+        "pinecone_latency_ms": args.pinecone_latency_ms,
+        "concurrency": args.concurrency,
+    }
+
+
+def _previous(history: list[dict], record: dict) -> dict | None:
+    for old in reversed(history):
+        if old["scenario"] == record["scenario"] and old["settings"] == record["settings"]:
+            return old
+    return None
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return out.stdout.strip()
+    except OSError:
+        return ""
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, nargs="+", default=[1000, 10_000])
+    parser.add_argument("--mode", choices=sorted(MODES), default="text")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--repeats", type=int, default=5, help="runs of whole-dataset scenarios (load, /alumni full body)")
+    parser.add_argument("--pipeline-repeats", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200, help="requests per /search and paged /alumni scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=str(BENCH_DIR / ".data"))
+    parser.add_argument("--results", default=str(BENCH_DIR / "results.jsonl"))
+    parser.add_argument("--regression-pct", type=float, default=15.0)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--worker-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_out:
+        Path(args.worker_out).write_text(json.dumps(run_worker(args)), encoding="utf-8")
+        return 0
+
+    from fake_upstreams import FakeUpstreams, Latency
+    from synth_profiles import write_profiles
+
+    results_path = Path(args.results)
+    history = [json.loads(line) for line in results_path.read_text(encoding="utf-8").splitlines() if line.strip()] if results_path.exists() else []
+    commit = _git_commit()
+    regressions = []
+    upstreams = FakeUpstreams(
+        openai=Latency(args.openai_latency_ms, args.jitter_ms),
+        pinecone=Latency(args.pinecone_latency_ms, args.jitter_ms),
+        seed=args.seed,
+    ).start()
+    try:
+        for n in args.profiles:
+            data_path = Path(args.data_dir) / f"profiles_{n}_s{args.seed}.json"
+            if not data_path.exists():
+                print(f"Generating {n} synthetic profiles -> {data_path}")
+                write_profiles(data_path, n, args.seed)
+            with tempfile.TemporaryDirectory(prefix="fisk-bench-") as tmp:
+                env = {
+                    **os.environ,
+                    **upstreams.env(),
+                    **MODES[args.mode],
+                    "SOURCING_DATA_PATH": str(data_path),
+                    "MAX_INDEX_PROFILES": str(n),
+                    "PINECONE_NAMESPACE": f"bench-{args.mode}-{n}",
+                    "SYNC_MANIFEST_PATH": os.path.join(tmp, "manifest.json"),
+                    "LOCAL_INDEX_DIR": os.path.join(tmp, "local_index"),
+                    "EMBEDDING_CACHE_DIR": "",
+                    "PROFILE_STORE_PATH": "",
+                    "EXPANSION_CACHE_PATH": "",
+                    "PHRASE_CACHE_PATH": "",
+                    "RELOAD_POLL_SECONDS": "0",
+                }
+                out = os.path.join(tmp, "results.json")
+                cmd = [sys.executable, __file__, "--worker-out", out, *sys.argv[1:]]
+                print(f"\n== {n} profiles, mode={args.mode} ==")
+                subprocess.run(cmd, env=env, cwd=BACKEND_DIR, check=True)
+                records = json.loads(Path(out).read_text(encoding="utf-8"))
+
+            print(f"{'scenario':<22} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'throughput':>14}  vs previous")
+            stamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            with open(results_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    record.update(settings=_settings(args, n), timestamp=stamp, commit=commit)
+                    prev = _previous(history, record)
+                    note = ""
+                    if prev is not None:
+                        p50_change = (record["p50_ms"] - prev["p50_ms"]) / prev["p50_ms"] * 100 if prev["p50_ms"] else 0.0
+                        tput_change = (record["throughput"] - prev["throughput"]) / prev["throughput"] * 100 if prev["throughput"] else 0.0
+                        note = f"p50 {p50_change:+.1f}%, throughput {tput_change:+.1f}% ({prev.get('commit') or prev['timestamp']})"
+                        if p50_change > args.regression_pct or tput_change < -args.regression_pct:
+                            note += "  REGRESSION"
+                            regressions.append(f"{record['scenario']} @ {n}")
+                    print(
+                        f"{record['scenario']:<22} {record['p50_ms']:>10.3f} {record['p95_ms']:>10.3f} "
+                        f"{record['p99_ms']:>10.3f} {record['throughput']:>9.1f} {record['unit']:<6} {note}"
+                    )
+                    f.write(json.dumps(record) + "\n")
+                    history.append(record)
+    finally:
+        upstreams.stop()
+
+    print(f"\nUpstream requests served: {upstreams.requests}. Results appended to {results_path}.")
+    if regressions:
+        print(f"Regressions (> {args.regression_pct:g}% worse than the previous run): {', '.join(regressions)}")
+        return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
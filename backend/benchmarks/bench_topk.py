@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Latency of the local top-k kernel (search.top_k_scores) at increasing corpus sizes.
+
+Usage:
+  cd backend
+  python benchmarks/bench_topk.py                       # 10k, 100k, 1M profiles, dim 1536
+  python benchmarks/bench_topk.py --sizes 10000 100000 --dim 1536 --phrases 5 --baseline
+
+--baseline also times the previous implementation (per-phrase renormalization of the
+whole corpus + full argsort) for comparison. A 1M x 1536 float32 corpus needs ~6 GB of RAM;
+use a smaller --dim on small machines.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search import normalize_rows, top_k_scores  # noqa: E402
+
+
+def _baseline(corpus: np.ndarray, queries: np.ndarray, top_k: int) -> list[tuple[int, float]]:
+    """Pre-kernel retrieve_multi: renormalize corpus per phrase, stack, full argsort."""
+    def cos(a, b):
+        a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-8)
+        return np.dot(a_norm, b / (np.linalg.norm(b) + 1e-8))
+
+    scores = np.max(np.stack([cos(corpus, q) for q in queries], axis=1), axis=1)
+    indices = np.argsort(scores)[::-1][:top_k]
+    return [(int(i), float(scores[i])) for i in indices if scores[i] > 0]
+
+
+def _random_corpus(n: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    out = np.empty((n, dim), dtype=np.float32)
+    chunk = 65536
+    for start in range(0, n, chunk):
+        block = rng.standard_normal((min(chunk, n - start), dim), dtype=np.float32)
+        out[start : start + len(block)] = normalize_rows(block)
+    return out
+
+
+def _time(fn, repeats: int) -> list[float]:
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--phrases", type=int, default=5, help="query embeddings per search (expanded phrases)")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--baseline", action="store_true", help="also time the pre-kernel implementation")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"dim={args.dim} phrases={args.phrases} top_k={args.top_k} repeats={args.repeats}")
+    print(f"{'profiles':>10}  {'kernel p50 ms':>14}  {'kernel p95 ms':>14}  {'baseline p50 ms':>16}")
+    for n in args.sizes:
+        corpus = _random_corpus(n, args.dim, rng)
+        queries = rng.standard_normal((args.phrases, args.dim), dtype=np.float32)
+        kernel = _time(lambda: top_k_scores(corpus, queries, args.top_k, normalized=True), args.repeats)
+        base = "-"
+        if args.baseline:
+            if [i for i, _ in _baseline(corpus, queries, args.top_k)] != [
+                i for i, _ in top_k_scores(corpus, queries, args.top_k, normalized=True)
+            ]:
+                print(f"warning: baseline and kernel rankings differ at n={n}", file=sys.stderr)
+            base = f"{statistics.median(_time(lambda: _baseline(corpus, queries, args.top_k), max(1, args.repeats // 3))):.2f}"
+        p95 = sorted(kernel)[max(0, int(round(0.95 * len(kernel))) - 1)]
+        print(f"{n:>10}  {statistics.median(kernel):>14.2f}  {p95:>14.2f}  {base:>16}")
+        del corpus
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
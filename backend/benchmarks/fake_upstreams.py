@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Deterministic local stand-ins for the OpenAI and Pinecone HTTP APIs, for benchmarks.
+
+One threaded HTTP server answers the endpoints the backend calls, so the real SDK
+clients (clients.py) run unmodified against it, connection pooling included:
+
+  OpenAI    POST /v1/embeddings, POST /v1/chat/completions
+            (point the SDK at it with OPENAI_BASE_URL=http://host:port/v1)
+  Pinecone  POST /vectors/upsert, /vectors/delete, /query, /describe_index_stats,
+            /records/namespaces/{ns}/upsert, /records/namespaces/{ns}/search
+            (PINECONE_INDEX_HOST=http://host:port)
+
+Embeddings are hashed bags of words: the same text always gets the same unit vector and
+texts sharing words score higher, so rankings are stable and non-trivial. Record metadata
+is kept and queries honour metadata filters ($eq / $in / $and; list fields match on any
+element). Chat answers
+are phrases picked from the query, or, for queries in `expansions` (recorded by
+query_log.py, see replay.py), the recorded phrases after the recorded expansion time.
+Each API sleeps latency_ms ± jitter_ms per request, and every rate_limit_every-th
+request is answered 429 with a Retry-After, to exercise the limiter and fan-out paths.
+
+Usage (standalone, e.g. for uvicorn or the replay tool):
+  cd backend
+  python benchmarks/fake_upstreams.py --port 8787 --openai-latency-ms 80 --pinecone-latency-ms 20
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = {"i", "a", "an", "the", "to", "and", "or", "of", "in", "on", "for", "with", "my", "me", "am", "is",
+         "are", "be", "as", "at", "want", "need", "some", "help", "from", "really", "having", "hard", "time"}
+
+
+@dataclass
+class Latency:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    rate_limit_every: int = 0  # 0 = never answer 429
+
+    def sleep(self, rng: random.Random) -> None:
+        delay = self.latency_ms + (rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+
+class HashEmbedder:
+    """Unit vector = normalized sum of one fixed random vector per word (seeded by the word's hash)."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._words: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _word(self, word: str) -> np.ndarray:
+        vec = self._words.get(word)
+        if vec is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            with self._lock:
+                self._words[word] = vec
+        return vec
+
+    def embed(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower()) or ["<empty>"]
+        vec = np.sum([self._word(w) for w in words], axis=0)
+        return vec / (np.linalg.norm(vec) + 1e-8)
+
+
+class FakeIndex:
+    """In-memory Pinecone namespace: ids -> rows of a growing float32 matrix, brute-force cosine."""
+
+    def __init__(self):
+        self._ids: list[str] = []
+        self._row: dict[str, int] = {}
+        self._metadata: dict[str, dict] = {}
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, items: list[tuple[str, np.ndarray]], metadata: list[dict | None] | None = None) -> int:
+        with self._lock:
+            for j, (pid, vec) in enumerate(items):
+                self._metadata[pid] = (metadata[j] if metadata else None) or {}
+                vec = np.asarray(vec, dtype=np.float32)
+                vec = vec / (np.linalg.norm(vec) + 1e-8)
+                if self._matrix.shape[1] != len(vec):
+                    self._matrix = np.empty((max(1024, len(items)), len(vec)), dtype=np.float32)
+                    self._ids, self._row, self._size = [], {}, 0
+                row = self._row.get(pid)
+                if row is None:
+                    if self._size == len(self._matrix):
+                        grown = np.empty((len(self._matrix) * 2, self._matrix.shape[1]), dtype=np.float32)
+                        grown[: self._size] = self._matrix[: self._size]
+                        self._matrix = grown
+                    row = self._row[pid] = self._size
+                    self._ids.append(pid)
+                    self._size += 1
+                self._matrix[row] = vec
+        return len(items)
+
+    def delete(self, ids: list[str]) -> None:
+        with self._lock:
+            for pid in ids:
+                row = self._row.pop(pid, None)
+                self._metadata.pop(pid, None)
+                if row is not None:
+                    self._ids[row] = ""  # tombstone; never returned
+
+    def query(self, vec: np.ndarray, top_k: int, filter: dict | None = None) -> list[tuple[str, float]]:
+        with self._lock:
+            matrix, ids = self._matrix[: self._size], self._ids
+            if filter:
+                allowed = np.array([bool(pid) and _matches(self._metadata.get(pid) or {}, filter) for pid in ids[: len(matrix)]], dtype=bool)
+        if not len(matrix) or matrix.shape[1] != len(vec):
+            return []
+        scores = matrix @ (vec / (np.linalg.norm(vec) + 1e-8))
+        if filter:
+            scores = np.where(allowed, scores, -np.inf)
+        k = min(top_k + 8, len(scores))
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k :]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(ids[i], float(scores[i])) for i in top if ids[i] and scores[i] > -np.inf][:top_k]
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+
+def _matches(metadata: dict, filter: dict) -> bool:
+    """Pinecone metadata filter semantics for the operators the backend sends."""
+    for field, cond in filter.items():
+        if field == "$and":
+            if not all(_matches(metadata, c) for c in cond):
+                return False
+            continue
+        value = metadata.get(field)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        if "$eq" in cond and cond["$eq"] not in values:
+            return False
+        if "$in" in cond and not any(v in cond["$in"] for v in values):
+            return False
+    return True
+
+
+def expansion_phrases(query: str) -> list[str]:
+    """3-5 deterministic search phrases from a help request (content words and adjacent pairs)."""
+    words = [w for w in _WORD.findall(query.lower()) if w not in _STOP]
+    phrases = list(dict.fromkeys([" ".join(words[i : i + 2]) for i in range(0, len(words), 2)] + words))[:5]
+    for filler in ("career advice", "mentoring", "networking"):
+        if len(phrases) >= 3:
+            break
+        if filler not in phrases:
+            phrases.append(filler)
+    return phrases
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address) -> None:
+        # Clients hang up on slow answers (deadlines, load shedding); that is expected here
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class FakeUpstreams:
+    """Runs the stand-in server on a background thread. Use as a context manager or call start()/stop()."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        openai: Latency | None = None,
+        pinecone: Latency | None = None,
+        openai_dim: int = 1536,
+        pinecone_dim: int = 1024,
+        seed: int = 0,
+        expansions: dict[str, tuple[list[str], float | None]] | None = None,
+    ):
+        self.openai_latency = openai or Latency()
+        self.pinecone_latency = pinecone or Latency()
+        self.openai_embedder = HashEmbedder(openai_dim)
+        # Integrated-embedding indexes embed with their own model (e.g. llama-text-embed-v2, 1024 dims)
+        self.pinecone_embedder = HashEmbedder(pinecone_dim)
+        self.namespaces: dict[str, FakeIndex] = {}
+        # Recorded chat answers: query text -> (phrases, expansion time in ms or None)
+        self.expansions = expansions or {}
+        self.requests: dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self) -> dict[str, str]:
+        """Environment that points the backend's SDK clients here."""
+        return {
+            "OPENAI_API_KEY": "sk-fake",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "PINECONE_API_KEY": "pc-fake",
+            "PINECONE_INDEX_HOST": self.url,
+        }
+
+    def namespace(self, name: str) -> FakeIndex:
+        with self._lock:
+            return self.namespaces.setdefault(name, FakeIndex())
+
+    def _count(self, api: str, latency: Latency, delay_ms: float | None = None) -> bool:
+        """Count the request and wait (delay_ms overrides the configured latency); True when it should be answered 429."""
+        with self._lock:
+            n = self.requests[api] = self.requests.get(api, 0) + 1
+            delay_rng = random.Random(self._rng.random())
+        if delay_ms is None:
+            latency.sleep(delay_rng)
+        elif delay_ms > 0:
+            time.sleep(delay_ms / 1000.0)
+        return bool(latency.rate_limit_every) and n % latency.rate_limit_every == 0
+
+    def start(self) -> "FakeUpstreams":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeUpstreams":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def _handler(up: FakeUpstreams) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+        def log_message(self, format, *args):  # noqa: A002 - quiet
+            pass
+
+        def _send(self, status: int, body: dict | None = None, headers: dict | None = None) -> None:
+            data = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _throttled(self) -> None:
+            self._send(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}}, {"Retry-After": "0.05"})
+
+        def do_GET(self):
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path = self.path.split("?", 1)[0]
+            if path.startswith("/v1/"):
+                body = json.loads(raw or b"{}")
+                if up._count("openai", up.openai_latency, self._recorded_delay(path, body)):
+                    return self._throttled()
+                if path == "/v1/embeddings":
+                    return self._embeddings(body)
+                if path == "/v1/chat/completions":
+                    return self._chat(body)
+                return self._send(404, {"error": {"message": f"unknown path {path}"}})
+            if up._count("pinecone", up.pinecone_latency):
+                return self._throttled()
+            m = re.fullmatch(r"/records/namespaces/([^/]+)/(upsert|search)", path)
+            if m and m.group(2) == "upsert":
+                # NDJSON body: one {"_id": ..., "<text field>": ..., <metadata fields>} per line.
+                # String fields are embedded; list fields (facet values) are metadata.
+                items, metadata = [], []
+                for line in raw.decode().splitlines():
+                    if line.strip():
+                        record = json.loads(line)
+                        fields = {k: v for k, v in record.items() if k not in ("_id", "id")}
+                        text = " ".join(v for v in fields.values() if isinstance(v, str))
+                        items.append((str(record.get("_id") or record.get("id")), up.pinecone_embedder.embed(text)))
+                        metadata.append({k: v for k, v in fields.items() if not isinstance(v, str)})
+                up.namespace(m.group(1)).upsert(items, metadata)
+                return self._send(201, None)
+            body = json.loads(raw or b"{}")
+            if m:
+                query = body.get("query") or {}
+                text = " ".join(str(v) for v in (query.get("inputs") or {}).values())
+                hits = up.namespace(m.group(1)).query(
+                    up.pinecone_embedder.embed(text), int(query.get("top_k") or 10), query.get("filter")
+                )
+                return self._send(200, {
+                    "result": {"hits": [{"_id": pid, "_score": score, "fields": {}} for pid, score in hits]},
+                    "usage": {"read_units": 1, "embed_total_tokens": len(text.split())},
+                })
+            ns = body.get("namespace") or ""
+            if path == "/vectors/upsert":
+                vectors = body.get("vectors") or []
+                count = up.namespace(ns).upsert([(v["id"], v["values"]) for v in vectors], [v.get("metadata") for v in vectors])
+                return self._send(200, {"upsertedCount": count})
+            if path == "/vectors/delete":
+                up.namespace(ns).delete(body.get("ids") or [])
+                return self._send(200, {})
+            if path == "/query":
+                hits = up.namespace(ns).query(
+                    np.asarray(body.get("vector") or [], dtype=np.float32), int(body.get("topK") or 10), body.get("filter")
+                )
+                return self._send(200, {
+                    "matches": [{"id": pid, "score": score, "values": []} for pid, score in hits],
+                    "namespace": ns,
+                    "usage": {"readUnits": 1},
+                })
+            if path == "/describe_index_stats":
+                namespaces = {name: {"vectorCount": len(idx)} for name, idx in up.namespaces.items()}
+                return self._send(200, {
+                    "namespaces": namespaces,
+                    "dimension": up.pinecone_embedder.dim,
+                    "indexFullness": 0.0,
+                    "totalVectorCount": sum(len(idx) for idx in up.namespaces.values()),
+                })
+            return self._send(404, {"error": f"unknown path {path}"})
+
+        def _recorded_delay(self, path: str, body: dict) -> float | None:
+            if path != "/v1/chat/completions" or not up.expansions:
+                return None
+            recorded = up.expansions.get(_user_message(body).strip())
+            return recorded[1] if recorded else None
+
+        def _embeddings(self, body: dict) -> None:
+            inputs = body.get("input") or []
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            # The SDK asks for base64 (packed float32) by default; JSON floats only if requested
+            as_base64 = body.get("encoding_format") == "base64"
+            data = []
+            for i, text in enumerate(inputs):
+                vec = up.openai_embedder.embed(text).astype(np.float32)
+                embedding = base64.b64encode(vec.tobytes()).decode() if as_base64 else vec.tolist()
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+            tokens = sum(len(str(t).split()) for t in inputs)
+            self._send(200, {
+                "object": "list",
+                "data": data,
+                "model": body.get("model") or "text-embedding-3-small",
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            })
+
+        def _chat(self, body: dict) -> None:
+            user = _user_message(body)
+            if (body.get("response_format") or {}).get("type") == "json_object":
+                # Batched expansion (query_expand.expand_queries): {"1": "query", ...} -> {"1": [phrases], ...}
+                try:
+                    requests = json.loads(user)
+                except json.JSONDecodeError:
+                    requests = {}
+                content = json.dumps({k: self._phrases(str(v)) for k, v in requests.items()})
+            else:
+                content = "\n".join(self._phrases(user))
+            self._send(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model") or "gpt-4o-mini",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": len(user.split()), "completion_tokens": len(content.split()), "total_tokens": 0},
+            })
+
+        def _phrases(self, query: str) -> list[str]:
+            recorded = up.expansions.get(query.strip())
+            return recorded[0] if recorded else expansion_phrases(query)
+
+    return Handler
+
+
+def _user_message(body: dict) -> str:
+    messages = body.get("messages") or []
+    return next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request per API with 429")
+    args = parser.parse_args()
+    up = FakeUpstreams(
+        args.host,
+        args.port,
+        openai=Latency(args.openai_latency_ms, args.jitter_ms, args.rate_limit_every),
+        pinecone=Latency(args.pinecone_latency_ms, args.jitter_ms, args.rate_limit_every),
+    )
+    print(f"Fake OpenAI + Pinecone on {up.url}. Point the backend at it with:")
+    for key, value in up.env().items():
+        print(f"  export {key}={value}")
+    try:
+        up._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Replay captured /search traffic (query_log.py, QUERY_LOG_PATH) against the app.
+
+Queries are sent in their recorded order, either with the recorded gaps between them
+(scaled by --speed, long idle gaps capped at --max-gap-s) or as Poisson arrivals at
+--rate per second. At most --concurrency requests are in flight. Arrivals that find
+every slot busy wait for one, and that wait counts towards latency: latency is measured
+from the scheduled arrival, service time from when the request was actually sent.
+
+Targets:
+  in-process (default)  the app is imported and served with FastAPI's TestClient, with
+                        OpenAI / Pinecone replaced by fake_upstreams.py. With
+                        --upstreams recorded (default) the chat stand-in answers each query
+                        with its recorded LLM phrases after its recorded expansion time.
+                        With --upstreams fake it makes phrases up. Embeddings and vector
+                        queries are always faked, with --openai-latency-ms /
+                        --pinecone-latency-ms. The index is built from SOURCING_DATA_PATH first.
+  --url URL             a running server, with whatever upstreams it is configured with
+                        (e.g. fake_upstreams.py started standalone).
+
+Reports throughput, latency and service-time percentiles next to the recorded ones, the
+agreement of returned ids with the recorded hits (top 10), and the cache hit rates from /health.
+
+Usage:
+  cd backend
+  python benchmarks/replay.py logs/search.jsonl* --concurrency 32 --speed 2
+  python benchmarks/replay.py logs/search.jsonl --rate 50 --duration 60 --upstreams fake --pinecone-latency-ms 20
+  python benchmarks/replay.py logs/search.jsonl --url http://localhost:8000 --rate 20
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_suite import MODES, percentile  # noqa: E402
+
+
+def read_log(paths: list[str]) -> list[dict]:
+    """All entries from the given files (current and rotated), oldest first."""
+    entries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by rotation or a crash
+                if entry.get("query"):
+                    entries.append(entry)
+    entries.sort(key=lambda e: e.get("ts") or 0)
+    return entries
+
+
+def schedule(entries: list[dict], rate: float, speed: float, max_gap: float, rng: random.Random) -> list[float]:
+    """Arrival offsets in seconds from the start of the run."""
+    offsets, t = [], 0.0
+    for i, entry in enumerate(entries):
+        if i:
+            if rate > 0:
+                t += rng.expovariate(rate)
+            else:
+                gap = (entry.get("ts") or 0) - (entries[i - 1].get("ts") or 0)
+                t += min(max(gap, 0.0), max_gap) / speed
+        offsets.append(t)
+    return offsets
+
+
+def _overlap(returned: list[str], recorded: list[str], k: int = 10) -> float | None:
+    a, b = set(returned[:k]), set(recorded[:k])
+    return len(a & b) / len(a | b) if a or b else None
+
+
+class Replayer:
+    def __init__(self, client, endpoint: str | None, concurrency: int):
+        self.client = client
+        self.endpoint = endpoint
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="replay")
+        self.results: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _one(self, entry: dict, scheduled: float) -> None:
+        endpoint = self.endpoint or entry.get("endpoint") or "/search"
+        sent = time.perf_counter()
+        ok, ids = True, []
+        try:
+            body = {"query": entry["query"], **({"filters": entry["filters"]} if entry.get("filters") else {})}
+            r = self.client.post(endpoint, json=body)
+            ok = r.status_code == 200
+            if ok and endpoint == "/search/stream":
+                done = [json.loads(line) for line in r.text.splitlines() if line.strip()][-1]
+                ok = done.get("event") == "done"
+                ids = [a["id"] for a in done.get("alumni") or []]
+            elif ok:
+                ids = [a["id"] for a in r.json().get("alumni") or []]
+        except Exception:
+            ok = False
+        end = time.perf_counter()
+        result = {
+            "ok": ok,
+            "latency_ms": (end - scheduled) * 1000,
+            "service_ms": (end - sent) * 1000,
+            "agreement": _overlap(ids, [h[0] for h in entry.get("hits") or []]) if ok else None,
+        }
+        with self._lock:
+            self.results.append(result)
+
+    def run(self, entries: list[dict], offsets: list[float]) -> float:
+        start = time.perf_counter()
+        futures = []
+        for entry, offset in zip(entries, offsets):
+            delay = start + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(self.pool.submit(self._one, entry, start + offset))
+        for future in futures:
+            future.result()
+        self.pool.shutdown()
+        return time.perf_counter() - start
+
+
+def _in_process_client(args: argparse.Namespace, entries: list[dict], stack: contextlib.ExitStack):
+    """Start the stand-ins, point the app at them, build the index and open a TestClient."""
+    from fake_upstreams import FakeUpstreams, Latency
+
+    expansions = {}
+    if args.upstreams == "recorded":
+        for entry in entries:
+            # Fallback expansions are local phrases, not what the LLM said; the stand-in makes those up
+            if entry.get("phrases") and entry.get("expansion") in (None, "llm", "cache"):
+                expansions[entry["query"].strip()] = (entry["phrases"], (entry.get("timings_ms") or {}).get("expand"))
+    upstreams = FakeUpstreams(
+        openai=Latency(args.openai_latency_ms, args.jitter_ms),
+        pinecone=Latency(args.pinecone_latency_ms, args.jitter_ms),
+        expansions=expansions,
+    ).start()
+    stack.callback(upstreams.stop)
+    tmp = stack.enter_context(tempfile.TemporaryDirectory(prefix="fisk-replay-"))
+    os.environ.update({
+        **upstreams.env(),
+        **MODES[args.mode],
+        "PINECONE_NAMESPACE": "replay",
+        "SYNC_MANIFEST_PATH": os.path.join(tmp, "manifest.json"),
+        "LOCAL_INDEX_DIR": os.path.join(tmp, "local_index"),
+        "EMBEDDING_CACHE_DIR": "",
+        "PROFILE_STORE_PATH": "",
+        "EXPANSION_CACHE_PATH": "",
+        "PHRASE_CACHE_PATH": "",
+        "QUERY_LOG_PATH": "",
+        "RELOAD_POLL_SECONDS": "0",
+    })
+    import embed_json_to_vectordb
+    from fastapi.testclient import TestClient
+
+    print("Indexing profiles into the stand-in index...")
+    with contextlib.redirect_stdout(io.StringIO()):
+        if embed_json_to_vectordb.main() != 0:
+            raise SystemExit("Indexing failed (check SOURCING_DATA_PATH)")
+    import main
+
+    return stack.enter_context(TestClient(main.app))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("logs", nargs="+", help="query log files (current and rotated)")
+    parser.add_argument("--url", help="replay against a running server instead of in-process")
+    parser.add_argument("--endpoint", help="send every query here (default: the endpoint it was recorded on)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=0.0, help="Poisson arrivals per second (0 = recorded gaps)")
+    parser.add_argument("--speed", type=float, default=1.0, help="divide recorded gaps by this")
+    parser.add_argument("--max-gap-s", type=float, default=5.0, help="cap on a single recorded idle gap")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many queries (0 = all)")
+    parser.add_argument("--duration", type=float, default=0.0, help="loop over the log until this many seconds of arrivals")
+    parser.add_argument("--upstreams", choices=["recorded", "fake"], default="recorded")
+    parser.add_argument("--mode", choices=sorted(MODES), default="text")
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the summary as JSON here")
+    args = parser.parse_args()
+
+    recorded = read_log(args.logs)
+    if not recorded:
+        print("No entries in the given logs.", file=sys.stderr)
+        return 1
+    entries = recorded[: args.limit] if args.limit else list(recorded)
+    rng = random.Random(args.seed)
+    offsets = schedule(entries, args.rate, args.speed, args.max_gap_s, rng)
+    if args.duration:
+        # Repeat the log (keeping its shape) until the arrivals cover the requested duration
+        period = offsets[-1] + (1.0 / args.rate if args.rate else min(args.max_gap_s, 1.0) / args.speed)
+        base, base_offsets = entries, offsets
+        entries, offsets = [], []
+        shift = 0.0
+        while shift < args.duration:
+            entries += [e for e, o in zip(base, base_offsets) if shift + o < args.duration]
+            offsets += [shift + o for o in base_offsets if shift + o < args.duration]
+            shift += period
+
+    with contextlib.ExitStack() as stack:
+        if args.url:
+            import httpx
+
+            client = stack.enter_context(httpx.Client(
+                base_url=args.url.rstrip("/"),
+                timeout=60.0,
+                limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+            ))
+        else:
+            client = _in_process_client(args, entries, stack)
+        print(f"Replaying {len(entries)} queries (concurrency {args.concurrency}, "
+              f"{f'{args.rate:g}/s Poisson' if args.rate else f'recorded gaps / {args.speed:g}'})...")
+        replayer = Replayer(client, args.endpoint, args.concurrency)
+        elapsed = replayer.run(entries, offsets)
+        try:
+            caches = client.get("/health").json().get("caches") or {}
+        except Exception:
+            caches = {}
+
+    results = replayer.results
+    ok = [r for r in results if r["ok"]]
+    agreement = [r["agreement"] for r in ok if r["agreement"] is not None]
+    recorded_ms = [e["total_ms"] for e in entries if e.get("total_ms") is not None]
+    sources: dict[str, int] = {}
+    for e in entries:
+        sources[e.get("source") or "unknown"] = sources.get(e.get("source") or "unknown", 0) + 1
+
+    def pcts(values: list[float]) -> dict:
+        return {f"p{p}": round(percentile(values, p), 2) for p in (50, 95, 99)} if values else {}
+
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency_ms": pcts([r["latency_ms"] for r in ok]),
+        "service_ms": pcts([r["service_ms"] for r in ok]),
+        "recorded_ms": pcts(recorded_ms),
+        "recorded_sources": sources,
+        "hit_agreement_top10": round(sum(agreement) / len(agreement), 4) if agreement else None,
+        "cache_hit_rates": {name: stats.get("hit_rate") for name, stats in caches.items()},
+    }
+    print(f"{summary['requests']} requests in {summary['seconds']} s ({summary['throughput_rps']} req/s), {summary['errors']} errors")
+    for name in ("latency_ms", "service_ms", "recorded_ms"):
+        if summary[name]:
+            print(f"  {name:<12} " + "  ".join(f"{k} {v:>9.2f}" for k, v in summary[name].items()))
+    print(f"  recorded sources {sources}")
+    print(f"  hit agreement with recording (top 10): {summary['hit_agreement_top10']}")
+    print(f"  cache hit rates: {summary['cache_hit_rates']}")
+    if args.out:
+        Path(args.out).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
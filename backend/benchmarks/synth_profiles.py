@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Synthetic LinkedIn-shaped alumni profiles for benchmarks.
+
+Profiles carry every field build_document, slim_profile and profile_to_sourced read
+(about, headline, topSkills "a • b", location.parsed.text / linkedinText,
+currentPosition[].companyName, experience[] position/company/description,
+profilePicture.url) with realistic variety: company, title and skill popularity is
+skewed like real alumni data, so the keyword index and caches see repeated entities.
+Output is deterministic for a given seed and streamed, so 1M profiles fit in memory.
+
+Usage:
+  cd backend
+  python benchmarks/synth_profiles.py --count 100000 --out benchmarks/.data/profiles_100000.json
+"""
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Iterator
+
+FIRST_NAMES = [
+    "Aaliyah", "Amara", "Andre", "Brandon", "Brianna", "Caleb", "Camille", "Chloe", "Darius", "Destiny",
+    "Elijah", "Gabrielle", "Imani", "Isaiah", "Jada", "Jalen", "Jasmine", "Jordan", "Kayla", "Kendall",
+    "Malik", "Marcus", "Maya", "Morgan", "Naomi", "Nia", "Olivia", "Quincy", "Simone", "Taylor",
+    "Terrence", "Trinity", "Tyler", "Xavier", "Zoe", "Ayanna", "Devin", "Ebony", "Jamal", "Kiara",
+]
+LAST_NAMES = [
+    "Adams", "Baker", "Banks", "Bell", "Brooks", "Brown", "Carter", "Coleman", "Davis", "Dixon",
+    "Edwards", "Ellis", "Franklin", "Freeman", "Gray", "Greene", "Hall", "Harris", "Hayes", "Jackson",
+    "James", "Jenkins", "Johnson", "Jones", "King", "Lewis", "Mitchell", "Moore", "Parker", "Robinson",
+    "Scott", "Simmons", "Thomas", "Thompson", "Turner", "Walker", "Washington", "Watson", "White", "Williams",
+]
+COMPANIES = [
+    "Microsoft", "Google", "Amazon", "Apple", "Meta", "Deloitte", "Accenture", "PwC", "EY", "KPMG",
+    "Goldman Sachs", "JPMorgan Chase", "Morgan Stanley", "Bank of America", "Wells Fargo", "Salesforce",
+    "IBM", "Oracle", "Intel", "Cisco", "Nike", "Procter & Gamble", "Johnson & Johnson", "Pfizer",
+    "Vanderbilt University Medical Center", "HCA Healthcare", "Nissan", "FedEx", "Target", "Walmart",
+    "Teach For America", "Fisk University", "Tennessee State Government", "U.S. Department of State",
+    "Bain & Company", "McKinsey & Company", "Boston Consulting Group", "Netflix", "Spotify", "Uber",
+]
+TITLES = [
+    "Software Engineer", "Senior Software Engineer", "Data Analyst", "Data Scientist", "Product Manager",
+    "Consultant", "Senior Consultant", "Management Consultant", "Financial Analyst", "Investment Banking Analyst",
+    "Associate Attorney", "Law Clerk", "Paralegal", "Registered Nurse", "Physician", "Research Scientist",
+    "Marketing Manager", "Brand Manager", "HR Business Partner", "Recruiter", "Teacher", "Professor",
+    "Policy Analyst", "Accountant", "Auditor", "UX Designer", "Operations Manager", "Project Manager",
+    "Business Analyst", "Cybersecurity Analyst", "Cloud Engineer", "Sales Associate", "Account Executive",
+]
+SKILLS = [
+    "Python", "SQL", "Java", "JavaScript", "React", "Machine Learning", "Data Analysis", "Tableau", "Excel",
+    "Financial Modeling", "Public Speaking", "Leadership", "Project Management", "Agile", "Litigation",
+    "Legal Research", "Contract Law", "Patient Care", "Clinical Research", "Marketing Strategy", "SEO",
+    "Recruiting", "Curriculum Development", "Policy Analysis", "Accounting", "Auditing", "Figma",
+    "User Research", "AWS", "Azure", "Cybersecurity", "Salesforce", "Negotiation", "Mentoring", "Resume Writing",
+]
+CITIES = [
+    "Nashville, Tennessee, United States", "Atlanta, Georgia, United States", "New York, New York, United States",
+    "Washington, District of Columbia, United States", "Chicago, Illinois, United States",
+    "Houston, Texas, United States", "Dallas, Texas, United States", "Los Angeles, California, United States",
+    "San Francisco, California, United States", "Seattle, Washington, United States",
+    "Charlotte, North Carolina, United States", "Memphis, Tennessee, United States",
+    "Detroit, Michigan, United States", "Boston, Massachusetts, United States", "Philadelphia, Pennsylvania, United States",
+]
+ABOUT_OPENERS = [
+    "Fisk University alum passionate about {skill} and {skill2}.",
+    "I help teams at {company} turn {skill} into results.",
+    "Proud Fisk graduate working as a {title}.",
+    "Experienced {title} with a background in {skill}.",
+    "Happy to mentor students interested in {field}.",
+]
+ABOUT_DETAILS = [
+    "Previously worked at {company} on {skill} projects.",
+    "Always open to reviewing resumes and talking about careers in {field}.",
+    "Enjoy mentoring first-generation college students.",
+    "Focused on {skill}, {skill2} and building inclusive teams.",
+    "Reach out if you are exploring {field} or applying to {company}.",
+]
+DESCRIPTIONS = [
+    "Led {skill} initiatives across a team of {n} people.",
+    "Built and maintained {skill} workflows for internal clients.",
+    "Partnered with stakeholders to deliver {field} projects on time.",
+    "Improved {skill} processes, reducing turnaround by {n}%.",
+    "Mentored interns and new hires on {skill} and {skill2}.",
+    "",
+]
+FIELDS = [
+    "software engineering", "data science", "consulting", "finance", "law", "healthcare", "marketing",
+    "education", "public policy", "accounting", "product management", "cybersecurity",
+]
+
+
+_ZIPF_S = 0.8
+_cum_weights: dict[int, list[float]] = {}
+
+
+def _skewed(rng: random.Random, items: list[str]) -> str:
+    """Zipf pick: a few companies / titles / skills are far more common than the rest."""
+    cum = _cum_weights.get(len(items))
+    if cum is None:
+        total, cum = 0.0, []
+        for rank in range(1, len(items) + 1):
+            total += rank ** -_ZIPF_S
+            cum.append(total)
+        _cum_weights[len(items)] = cum
+    return rng.choices(items, cum_weights=cum)[0]
+
+
+def make_profile(i: int, rng: random.Random) -> dict:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    skills = list(dict.fromkeys(_skewed(rng, SKILLS) for _ in range(rng.randint(2, 5))))
+    history = [(_skewed(rng, TITLES), _skewed(rng, COMPANIES)) for _ in range(rng.randint(1, 5))]
+    title, company = history[0]
+    field = rng.choice(FIELDS)
+
+    def fill(template: str) -> str:
+        return template.format(
+            skill=rng.choice(skills), skill2=rng.choice(SKILLS), company=rng.choice(history)[1],
+            title=title, field=field, n=rng.randint(3, 40),
+        )
+
+    about = " ".join(fill(t) for t in [rng.choice(ABOUT_OPENERS)] + rng.sample(ABOUT_DETAILS, rng.randint(0, 3)))
+    city = rng.choice(CITIES)
+    return {
+        "id": f"synth-{i:07d}",
+        "firstName": first,
+        "lastName": last,
+        "headline": f"{title} at {company}" if rng.random() > 0.05 else "--",
+        "about": about if rng.random() > 0.15 else "",
+        "linkedinUrl": f"https://www.linkedin.com/in/{first.lower()}-{last.lower()}-{i}",
+        "topSkills": " • ".join(skills),
+        "location": {"parsed": {"text": city}, "linkedinText": city.rsplit(",", 1)[0]},
+        "currentPosition": [{"companyName": company}],
+        "experience": [
+            {"position": t, "companyName": c, "description": fill(rng.choice(DESCRIPTIONS))}
+            for t, c in history
+        ],
+        "profilePicture": {"url": f"https://media.example.com/photos/{i}.jpg"} if rng.random() > 0.3 else {},
+        "photo": "",
+    }
+
+
+def generate_profiles(count: int, seed: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(count):
+        yield make_profile(i, rng)
+
+
+def write_profiles(path: str | Path, count: int, seed: int = 0) -> Path:
+    """Write a JSON array of count profiles (one per line), via a temp file so readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, profile in enumerate(generate_profiles(count, seed)):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(profile, ensure_ascii=False))
+        f.write("\n]\n")
+    tmp.replace(path)
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    path = write_profiles(args.out, args.count, args.seed)
+    print(f"Wrote {args.count} profiles to {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Small in-process caches shared by the search path.
+
+LRUCache is a thread-safe, size-bounded LRU with an optional TTL and hit/miss
+counters. Persistence is left to the owner (e.g. query_expand appends entries to a
+JSON-lines file and replays it with load()), since each cache stores different values.
+
+SingleFlight coalesces concurrent calls for the same key: the first caller runs the
+function and the others block until it finishes and share its result (or exception).
+do() covers the blocking case; callers that produce their result incrementally (a
+generator) lead with join() / finish() and follow with wait().
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float | None = None, name: str = ""):
+        self.maxsize = maxsize
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.name = name
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or self._expired(entry[0], now):
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get(), without counting a hit or miss or refreshing the entry."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or self._expired(entry[0], time.time()):
+            return default
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, created: float | None = None) -> None:
+        created = time.time() if created is None else created
+        if self.maxsize <= 0 or self._expired(created, time.time()):
+            return
+        with self._lock:
+            self._data[key] = (created, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self) -> Iterator[tuple[Hashable, Any, float]]:
+        """Snapshot of live (key, value, created) entries, oldest first."""
+        now = time.time()
+        with self._lock:
+            entries = list(self._data.items())
+        return ((k, v, created) for k, (created, v) in entries if not self._expired(created, now))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+class LeaderGone(Exception):
+    """The call a follower waited on ended without a result or error; the follower may lead a new one."""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "abandoned")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.abandoned = False
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() once per key at a time; concurrent callers with the same key wait for that run."""
+        while True:
+            call, leader = self.join(key)
+            if leader:
+                break
+            try:
+                return self.wait(call)
+            except LeaderGone:
+                continue
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result)
+        return result
+
+    def join(self, key: Hashable) -> tuple[_Call, bool]:
+        """The call in flight for key and whether the caller leads it (and must finish() it)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                return call, True
+            self.coalesced += 1
+            return call, False
+
+    def wait(self, call: _Call) -> Any:
+        """Block until the leader finishes; its result, or its exception re-raised."""
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        if call.abandoned:
+            raise LeaderGone()
+        return call.result
+
+    def finish(
+        self, key: Hashable, call: _Call, result: Any = None, error: BaseException | None = None, abandoned: bool = False
+    ) -> None:
+        """Publish the leader's outcome and release the key. abandoned: no outcome (e.g. the stream
+        was closed part-way); waiters get LeaderGone and retry."""
+        call.result, call.error, call.abandoned = result, error, abandoned
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
@@ -0,0 +1,119 @@
+"""
+Process-wide OpenAI and Pinecone clients.
+
+Created once (main.lifespan calls init_clients, scripts create them lazily on first use)
+and reused by every request, so TLS handshakes and client setup are paid once per
+pooled connection instead of once per phrase. OpenAI traffic goes through a keep-alive
+httpx pool sized by HTTP_POOL_MAXSIZE; connection_stats() reports how many requests
+were served vs. how many new connections had to be opened. For Pinecone it only counts
+get_index() calls vs. clients created: the SDK's transport (urllib3 or httpx, depending
+on the version) keeps its own pool and exposes no hook for its connection opens.
+"""
+import threading
+
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+from pinecone import Pinecone
+
+from config import (
+    OPENAI_API_KEY,
+    PINECONE_API_KEY,
+    PINECONE_INDEX_NAME,
+    PINECONE_INDEX_HOST,
+    HTTP_POOL_MAXSIZE,
+    HTTP_KEEPALIVE_SECONDS,
+)
+
+_lock = threading.Lock()
+_openai: OpenAI | None = None
+_http_client: httpx.Client | None = None
+_pinecone: Pinecone | None = None
+_index = None
+_stats = {
+    "openai_requests": 0,
+    "openai_connections_opened": 0,
+    "pinecone_get_index_calls": 0,
+    "pinecone_clients_created": 0,
+}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _stats[key] += 1
+
+
+def _on_trace(event_name: str, info: dict) -> None:
+    # httpcore emits connect_tcp only when the pool has no idle keep-alive connection to reuse
+    if event_name == "connection.connect_tcp.complete":
+        _count("openai_connections_opened")
+
+
+def _on_request(request) -> None:
+    _count("openai_requests")
+    request.extensions["trace"] = _on_trace
+
+
+def get_openai() -> OpenAI:
+    """Shared OpenAI client (created on first use)."""
+    global _openai, _http_client
+    if _openai is None:
+        with _lock:
+            if _openai is None:
+                _http_client = DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_POOL_MAXSIZE,
+                        max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                        keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+                    ),
+                    event_hooks={"request": [_on_request]},
+                )
+                _openai = OpenAI(api_key=OPENAI_API_KEY, http_client=_http_client)
+    return _openai
+
+
+def get_index():
+    """Shared Pinecone index handle (created on first use). Use host if set (required for some integrated-embedding indexes)."""
+    global _pinecone, _index
+    _count("pinecone_get_index_calls")
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _pinecone = Pinecone(api_key=PINECONE_API_KEY)
+                if PINECONE_INDEX_HOST:
+                    _index = _pinecone.Index(host=PINECONE_INDEX_HOST, pool_threads=HTTP_POOL_MAXSIZE)
+                else:
+                    _index = _pinecone.Index(PINECONE_INDEX_NAME, pool_threads=HTTP_POOL_MAXSIZE)
+                _stats["pinecone_clients_created"] += 1
+    return _index
+
+
+def init_clients() -> None:
+    """Create the clients configured for this process up front (called from main.lifespan)."""
+    if OPENAI_API_KEY:
+        get_openai()
+    if PINECONE_API_KEY:
+        get_index()
+
+
+def close_clients() -> None:
+    """Close pooled connections (called on shutdown)."""
+    global _openai, _http_client, _pinecone, _index
+    with _lock:
+        if _openai is not None:
+            _openai.close()
+        for obj in (_index, _pinecone):
+            close = getattr(obj, "close", None)
+            if close is not None:
+                close()
+        _openai = _http_client = _pinecone = _index = None
+
+
+def connection_stats() -> dict:
+    """OpenAI requests served vs. connections opened; Pinecone get_index() calls vs. clients created."""
+    with _lock:
+        stats = dict(_stats)
+    requests = stats["openai_requests"]
+    stats["openai_connection_reuse_ratio"] = (
+        round(1 - stats["openai_connections_opened"] / requests, 4) if requests else None
+    )
+    return stats
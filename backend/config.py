@@ -18,6 +18,48 @@ DATA_PATH = os.getenv(
 EMBEDDING_MODEL = "text-embedding-3-small"
 EMBEDDING_DIM = 1536  # text-embedding-3-small
 TOP_K = 20
+# Query expansion (query_expand.py): chat model and a cache of normalized query -> phrases.
+# EXPANSION_CACHE_PATH (JSON lines) keeps expansions across restarts; empty = memory only.
+EXPANSION_MODEL = os.getenv("EXPANSION_MODEL", "gpt-4o-mini")
+EXPANSION_CACHE_SIZE = int(os.getenv("EXPANSION_CACHE_SIZE", "10000"))
+EXPANSION_CACHE_TTL_SECONDS = float(os.getenv("EXPANSION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+EXPANSION_CACHE_PATH = os.getenv("EXPANSION_CACHE_PATH", "")
+# /search waits at most EXPANSION_BUDGET_MS for the LLM, then expands locally from the profile vocabulary
+# (0 = no budget). The late LLM answer is still cached. EXPANSION_TIMEOUT_SECONDS bounds the call itself.
+EXPANSION_BUDGET_MS = float(os.getenv("EXPANSION_BUDGET_MS", "1000"))
+EXPANSION_TIMEOUT_SECONDS = float(os.getenv("EXPANSION_TIMEOUT_SECONDS", "20"))
+# Request-path LLM calls run on EXPANSION_LLM_WORKERS threads; at most EXPANSION_LLM_MAX_PENDING
+# (running or queued) at once, beyond that queries are expanded locally straight away
+EXPANSION_LLM_WORKERS = int(os.getenv("EXPANSION_LLM_WORKERS", "16"))
+EXPANSION_LLM_MAX_PENDING = int(os.getenv("EXPANSION_LLM_MAX_PENDING", "64"))
+# llm: always ask the LLM; auto: short phrase-like queries (at most EXPANSION_SHORT_QUERY_WORDS words,
+# not a question or sentence) are expanded locally; local: never call the LLM on the request path
+EXPANSION_MODE = os.getenv("EXPANSION_MODE", "llm").strip().lower()
+EXPANSION_SHORT_QUERY_WORDS = int(os.getenv("EXPANSION_SHORT_QUERY_WORDS", "4"))
+# POST /search/batch: queries expanded per LLM call, and the most queries accepted per request
+EXPANSION_BATCH_SIZE = int(os.getenv("EXPANSION_BATCH_SIZE", "20"))
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv("SEARCH_BATCH_MAX_QUERIES", "1000"))
+# Opt-in /search traffic capture for replay (query_log.py): JSON lines at QUERY_LOG_PATH (empty = off),
+# rotated at QUERY_LOG_MAX_BYTES keeping QUERY_LOG_BACKUPS files; QUERY_LOG_SAMPLE_RATE of requests are logged
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "")
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", "5"))
+QUERY_LOG_SAMPLE_RATE = float(os.getenv("QUERY_LOG_SAMPLE_RATE", "1.0"))
+# Query phrase -> embedding cache (query_embed.py); PHRASE_CACHE_PATH (.npz) persists it across restarts
+PHRASE_CACHE_SIZE = int(os.getenv("PHRASE_CACHE_SIZE", "50000"))
+PHRASE_CACHE_PATH = os.getenv("PHRASE_CACHE_PATH", "")
+# Query phrase embedding micro-batching: cache misses from concurrent requests are collected for up to
+# EMBED_BATCH_WINDOW_MS (or EMBED_BATCH_MAX phrases) and sent as one embeddings call; 0 ms = no batching
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "3"))
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "256"))
+# Whole /search response cache keyed on (dataset generation, normalized query); 0 entries disables
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2000"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+# On-disk embedding cache for indexing (hash(model, document) -> vector); empty string disables
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "embedding_cache"),
+)
 
 # ChromaDB: either persistent disk (local/Railway volume) or Chroma Cloud
 CHROMA_PERSIST_DIR = os.getenv(
@@ -34,6 +76,9 @@ CHROMA_TOKEN = os.getenv("CHROMA_TOKEN", "")
 CHROMA_COLLECTION_NAME = os.getenv("CHROMA_COLLECTION_NAME", "fisk_alumni")
 # Cap profiles indexed (used for both Pinecone and Chroma)
 MAX_INDEX_PROFILES = int(os.getenv("MAX_INDEX_PROFILES", "500"))
+# Prebuilt binary profile/card store (`python profile_store.py`), mmapped and shared by all workers.
+# Used when it exists and matches DATA_PATH; otherwise each worker parses the JSON.
+PROFILE_STORE_PATH = os.getenv("PROFILE_STORE_PATH", "")
 
 # Pinecone: when set, use Pinecone for vector search (no Chroma)
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "")
@@ -45,8 +90,83 @@ PINECONE_NAMESPACE = os.getenv("PINECONE_NAMESPACE", "alumni")
 PINECONE_USE_INTEGRATED_EMBEDDING = os.getenv("PINECONE_USE_INTEGRATED_EMBEDDING", "true").lower() in ("1", "true", "yes")
 # Index field map key for text to embed (must match Pinecone index config, e.g. "text")
 PINECONE_TEXT_FIELD = os.getenv("PINECONE_TEXT_FIELD", "text")
-# Delay (seconds) between upsert batches for integrated embedding to avoid 429 (e.g. 250k TPM limit)
-PINECONE_UPSERT_BATCH_DELAY = float(os.getenv("PINECONE_UPSERT_BATCH_DELAY", "20"))
+# Ingestion rate limits: token budgets (estimated tokens/min) shared by concurrent upsert/embed batches.
+# The limiters back off on 429 / Retry-After and recover gradually, so set these to the provider's real TPM.
+PINECONE_EMBED_TPM = int(os.getenv("PINECONE_EMBED_TPM", "250000"))
+PINECONE_UPSERT_CONCURRENCY = int(os.getenv("PINECONE_UPSERT_CONCURRENCY", "4"))
+PINECONE_UPSERT_BATCH_TOKENS = int(os.getenv("PINECONE_UPSERT_BATCH_TOKENS", "20000"))
+OPENAI_EMBED_TPM = int(os.getenv("OPENAI_EMBED_TPM", "1000000"))
+OPENAI_EMBED_CONCURRENCY = int(os.getenv("OPENAI_EMBED_CONCURRENCY", "4"))
+OPENAI_EMBED_BATCH_TOKENS = int(os.getenv("OPENAI_EMBED_BATCH_TOKENS", "100000"))
+# /search fan-out: per-phrase vector queries run concurrently on a bounded pool; phrases that have
+# not answered within the deadline are dropped from the merge (the first answer is always awaited)
+SEARCH_FANOUT_WORKERS = int(os.getenv("SEARCH_FANOUT_WORKERS", "16"))
+SEARCH_DEADLINE_MS = float(os.getenv("SEARCH_DEADLINE_MS", "1500"))
+# ...but if no phrase has answered by the hard deadline the fan-out gives up and counts as a failure
+SEARCH_HARD_DEADLINE_MS = float(os.getenv("SEARCH_HARD_DEADLINE_MS", "5000"))
+# Upstream protection (resilience.py): requests using each upstream at once (bulkhead) and how long a
+# request waits for a free slot; the circuit opens after BREAKER_FAILURES consecutive failures and lets
+# a probe through after BREAKER_RESET_SECONDS. Refused /search requests are answered from the keyword index.
+PINECONE_MAX_CONCURRENT_REQUESTS = int(os.getenv("PINECONE_MAX_CONCURRENT_REQUESTS", "32"))
+OPENAI_MAX_CONCURRENT_REQUESTS = int(os.getenv("OPENAI_MAX_CONCURRENT_REQUESTS", "32"))
+BULKHEAD_WAIT_MS = float(os.getenv("BULKHEAD_WAIT_MS", "250"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Load shedding: /search* requests in flight (waiting for a worker thread or running) beyond this
+# are rejected at once with 503 and Retry-After: SHED_RETRY_AFTER_SECONDS (0 = no limit)
+SEARCH_MAX_INFLIGHT = int(os.getenv("SEARCH_MAX_INFLIGHT", "128"))
+SHED_RETRY_AFTER_SECONDS = int(os.getenv("SHED_RETRY_AFTER_SECONDS", "2"))
+# Local record of what embed_json_to_vectordb.py has upserted (enables delta sync and resume)
+SYNC_MANIFEST_PATH = os.getenv(
+    "SYNC_MANIFEST_PATH",
+    os.path.join(os.path.dirname(__file__), "sync_manifest.json"),
+)
+
+# Hot reload of the alumni data: POST /admin/reload with header X-Admin-Token (endpoint disabled when
+# ADMIN_TOKEN is empty), and/or poll DATA_PATH (+ profile store / local index) mtimes every N seconds (0 = off)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+RELOAD_POLL_SECONDS = float(os.getenv("RELOAD_POLL_SECONDS", "0"))
+# Polling waits until the files have been unchanged for RELOAD_SETTLE_SECONDS, so a reload does not pick up
+# half of an ingestion run. With RELOAD_MARKER_PATH set, only that file is watched: the pipeline writes
+# (or touches) it after everything else, and no settling is needed.
+RELOAD_SETTLE_SECONDS = float(os.getenv("RELOAD_SETTLE_SECONDS", "10"))
+RELOAD_MARKER_PATH = os.getenv("RELOAD_MARKER_PATH", "")
+
+# Vector backend for /search: "pinecone" (default) or "local" (in-process scoring against an
+# on-disk embedding matrix written by embed_json_to_vectordb.py; needs OPENAI_API_KEY for query embeddings)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+LOCAL_INDEX_DIR = os.getenv(
+    "LOCAL_INDEX_DIR",
+    os.path.join(os.path.dirname(__file__), "local_index"),
+)
+
+# In-memory BM25 keyword index (keyword_index.py), built with each dataset snapshot. Keyword hits are
+# fused with vector hits by reciprocal-rank fusion (RRF_K); with KEYWORD_FAST_PATH a query that is exactly
+# a known company name is answered from the keyword index alone (no LLM, embedding or Pinecone call), unless
+# more than KEYWORD_FAST_PATH_MAX_SHARE of the profiles mention it
+KEYWORD_INDEX = os.getenv("KEYWORD_INDEX", "true").lower() in ("1", "true", "yes")
+KEYWORD_FAST_PATH = os.getenv("KEYWORD_FAST_PATH", "true").lower() in ("1", "true", "yes")
+KEYWORD_FAST_PATH_MAX_SHARE = float(os.getenv("KEYWORD_FAST_PATH_MAX_SHARE", "0.1"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Facet filters (facets.py) on /alumni and /search. With PINECONE_FILTER_PUSHDOWN the filter is also sent to
+# Pinecone as a metadata filter, so every returned match qualifies (needs records upserted with facet metadata
+# by embed_json_to_vectordb.py); either way hits are re-checked against the facet index
+PINECONE_FILTER_PUSHDOWN = os.getenv("PINECONE_FILTER_PUSHDOWN", "true").lower() in ("1", "true", "yes")
+FACET_VALUES_LIMIT = int(os.getenv("FACET_VALUES_LIMIT", "50"))
+
+# Approximate nearest-neighbour index for VECTOR_BACKEND=local (ann_index.py), written next to the matrix
+# when it has at least ANN_MIN_PROFILES rows. ANN_NLIST inverted lists (0 = 4*sqrt(n)); each query probes
+# ANN_NPROBE of them (higher = better recall, slower). ANN_PQ_M > 0 stores product-quantized codes with
+# that many subspaces and re-scores the best ANN_RERANK candidates exactly.
+ANN_MIN_PROFILES = int(os.getenv("ANN_MIN_PROFILES", "50000"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_PQ_M = int(os.getenv("ANN_PQ_M", "0"))
+ANN_RERANK = int(os.getenv("ANN_RERANK", "200"))
+
+# Shared HTTP clients (clients.py): keep-alive pool size per upstream and idle connection lifetime
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
 
 # CORS: comma-separated origins (e.g. https://fisk-ten.vercel.app); localhost is always allowed in dev
 _CORS_DEFAULT = "http://localhost:3000,http://127.0.0.1:3000,https://fisk-ten.vercel.app"
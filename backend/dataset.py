@@ -0,0 +1,173 @@
+"""
+Immutable snapshot of everything the API serves from the alumni data.
+
+A Dataset bundles the profile store, the pre-encoded /alumni body, the BM25 keyword
+index, the company / location / skill facet index, the company / title / skill vocabulary
+used by local query expansion and (for VECTOR_BACKEND=local) the embedding matrix,
+tagged with a generation number.
+main.py holds one current snapshot and replaces it wholesale on reload, so a request
+that grabbed a snapshot keeps using a consistent set of structures until it finishes.
+Caches derived from the data key on the generation.
+
+With a current profile store the facet and keyword indexes come from the store file too
+(index_tables(), written by profile_store.py), so loading a snapshot decodes no profiles.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from config import (
+    DATA_PATH,
+    EMBEDDING_MODEL,
+    MAX_INDEX_PROFILES,
+    VECTOR_BACKEND,
+    LOCAL_INDEX_DIR,
+    PROFILE_STORE_PATH,
+    KEYWORD_INDEX,
+    RELOAD_MARKER_PATH,
+)
+from ann_index import ANN_FILE, IVFIndex, load_ann_index
+from facets import FacetIndex
+from indexer import load_profiles
+from keyword_index import KeywordIndex, entity_vocabulary
+from local_store import EMBEDDINGS_FILE, IDS_FILE, load_local_index
+from profile_store import MemoryProfileStore, ProfileStore
+
+_log = logging.getLogger("fiskconnect.dataset")
+
+
+@dataclass
+class Dataset:
+    generation: int
+    store: ProfileStore | MemoryProfileStore
+    # Full /alumni response; a view into the shared store map when the store file is used
+    alumni_body: bytes | memoryview
+    # Local vector backend: row ids and read-only memmap of the embedding matrix
+    local_ids: list[str] = field(default_factory=list)
+    local_embeddings: np.ndarray | None = None
+    ann: IVFIndex | None = None
+    # Embedding-matrix row of each store row (-1 where the local index lacks the profile)
+    local_rows: np.ndarray | None = None
+    facets: FacetIndex | None = None
+    keywords: KeywordIndex | None = None
+    # Normalized company / title / skill keys (query_expand.local_expand)
+    vocabulary: set[str] = field(default_factory=set)
+    sources: dict[str, int] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.time)
+
+    # Why the JSON was parsed instead of mapping PROFILE_STORE_PATH (None when the store is used or not configured)
+    store_fallback: str | None = None
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def cards_body(cards_json: bytes, extra: bytes = b"") -> bytes:
+    return b'{"alumni":[' + cards_json + b"]" + extra + b"}"
+
+
+def source_mtimes() -> dict[str, int]:
+    """mtime_ns of every file a Dataset is built from, or of RELOAD_MARKER_PATH alone when set (missing files are left out)."""
+    if RELOAD_MARKER_PATH:
+        paths = [RELOAD_MARKER_PATH]
+    else:
+        paths = [DATA_PATH]
+        if PROFILE_STORE_PATH:
+            paths.append(PROFILE_STORE_PATH)
+        if VECTOR_BACKEND == "local":
+            paths += [os.path.join(LOCAL_INDEX_DIR, name) for name in (EMBEDDINGS_FILE, IDS_FILE, ANN_FILE)]
+    out = {}
+    for path in paths:
+        try:
+            out[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return out
+
+
+def _open_store() -> tuple[ProfileStore | MemoryProfileStore, str | None]:
+    """
+    Map the prebuilt store when it matches DATA_PATH; otherwise parse the JSON in this worker.
+    Returns (store, fallback reason), logging a warning whenever a configured store is not used.
+    """
+    if not PROFILE_STORE_PATH:
+        fallback = None
+    elif not os.path.exists(PROFILE_STORE_PATH):
+        fallback = "missing"
+    else:
+        store = ProfileStore(PROFILE_STORE_PATH)
+        if store.is_current(DATA_PATH, MAX_INDEX_PROFILES):
+            return store, None
+        store.close()
+        fallback = "stale"
+    if fallback:
+        _log.warning(
+            "Profile store %s is %s for %s; parsing the JSON in this worker. Rebuild it with profile_store.py.",
+            PROFILE_STORE_PATH, fallback, DATA_PATH,
+        )
+    # Streams the dump, stops at the cap and keeps only the fields cards/documents need
+    return MemoryProfileStore(load_profiles(DATA_PATH, limit=MAX_INDEX_PROFILES, slim=True)), fallback
+
+
+def index_tables(profiles: list[dict]) -> dict:
+    """Facet and keyword index tables for profile_store.build_store, named "facets.*" and "keywords.*"."""
+    facets = FacetIndex.build(profiles)
+    keywords = KeywordIndex.build(profiles, ids=facets.ids)
+    tables = {f"facets.{name}": value for name, value in facets.to_tables().items()}
+    tables.update({f"keywords.{name}": value for name, value in keywords.to_tables().items()})
+    return tables
+
+
+def _indexes(store: ProfileStore | MemoryProfileStore) -> tuple[FacetIndex, KeywordIndex | None, set[str]]:
+    """Facet index, keyword index (if KEYWORD_INDEX) and expansion vocabulary: mapped from the store, else built."""
+    if isinstance(store, ProfileStore) and store.has_table("facets.ids") and store.has_table("keywords.terms"):
+        facets = FacetIndex.from_tables(store.tables("facets"))
+        if KEYWORD_INDEX:
+            keywords = KeywordIndex.from_tables(facets.ids, store.tables("keywords"))
+            return facets, keywords, keywords.entities
+        return facets, None, set(store.table("keywords.entities"))
+    if isinstance(store, ProfileStore):
+        _log.warning("Profile store %s has no prebuilt indexes; building them from every profile. Rebuild it with profile_store.py.", store.path)
+    facets = FacetIndex.build(store.profiles())
+    if KEYWORD_INDEX:
+        keywords = KeywordIndex.build(store.profiles(), ids=facets.ids)
+        return facets, keywords, keywords.entities
+    return facets, None, entity_vocabulary(store.profiles())
+
+
+def load_dataset(generation: int) -> Dataset:
+    """Build a complete snapshot (blocking; run off the event loop for reloads)."""
+    sources = source_mtimes()
+    local_ids: list[str] = []
+    local_embeddings = None
+    ann = None
+    if VECTOR_BACKEND == "local":
+        local_ids, local_embeddings, model = load_local_index(LOCAL_INDEX_DIR)
+        if model and model != EMBEDDING_MODEL:
+            raise ValueError(f"Local index was built with {model}, but EMBEDDING_MODEL is {EMBEDDING_MODEL}")
+        ann = load_ann_index(LOCAL_INDEX_DIR, local_ids)
+    store, store_fallback = _open_store()
+    if not len(store):
+        raise RuntimeError("No profiles loaded from data file")
+    facets, keywords, vocabulary = _indexes(store)
+    local_rows = None
+    if VECTOR_BACKEND == "local":
+        position = {pid: i for i, pid in enumerate(local_ids)}
+        local_rows = np.fromiter((position.get(pid, -1) for pid in facets.ids), dtype=np.int64, count=len(facets))
+    return Dataset(
+        generation=generation,
+        store=store,
+        alumni_body=store.alumni_body(),
+        local_ids=local_ids,
+        local_embeddings=local_embeddings,
+        ann=ann,
+        local_rows=local_rows,
+        facets=facets,
+        keywords=keywords,
+        vocabulary=vocabulary,
+        sources=sources,
+        store_fallback=store_fallback,
+    )
@@ -1,43 +1,92 @@
 #!/usr/bin/env python3
 """
-Standalone script to load the LinkedIn alumni JSON and upsert into Pinecone.
+Standalone script to load the LinkedIn alumni JSON and upsert into Pinecone
+(or, with VECTOR_BACKEND=local, write the on-disk embedding matrix used by /search).
 Run from the backend directory. ChromaDB is not used (code kept in repo only).
 
+Pinecone runs are incremental: a local manifest (sync_manifest.py) records which
+profile documents are already in the namespace, so only adds / changes / deletes
+are sent, and an interrupted run resumes from its last committed batch.
+Delete the manifest file to force a full re-upload.
+
+Each record also carries its facet values (company, location, skill) as metadata so
+/search filters can be pushed down to Pinecone. The metadata is part of the synced hash,
+so a profile whose facets change is re-upserted even if its document did not.
+
 Usage:
   cd backend
   export PINECONE_API_KEY=your_key
   python embed_json_to_vectordb.py
 
+With VECTOR_BACKEND=local, an ANN index (ann_index.py) is also written once the matrix
+has ANN_MIN_PROFILES rows; new rows are added to it incrementally. Pass --retrain-ann
+to re-cluster from scratch.
+
 Optional env:
   SOURCING_DATA_PATH     - path to JSON
   MAX_INDEX_PROFILES     - cap number of profiles (default 500)
   PINECONE_INDEX         - Pinecone index name (default fisk)
   PINECONE_NAMESPACE     - namespace (default alumni)
   PINECONE_USE_INTEGRATED_EMBEDDING - true (default) or false
-  OPENAI_API_KEY         - required only if PINECONE_USE_INTEGRATED_EMBEDDING=false
+  OPENAI_API_KEY         - required only if PINECONE_USE_INTEGRATED_EMBEDDING=false or VECTOR_BACKEND=local
+  VECTOR_BACKEND         - pinecone (default) or local
+  LOCAL_INDEX_DIR        - output directory for the local index (default backend/local_index)
+  EMBEDDING_CACHE_DIR    - on-disk OpenAI embedding cache (default backend/embedding_cache; empty disables)
+  SYNC_MANIFEST_PATH     - delta-sync manifest (default backend/sync_manifest.json)
 """
+import json
 import sys
 
-from openai import OpenAI
-
+from clients import get_openai
 from config import (
     DATA_PATH,
     OPENAI_API_KEY,
     MAX_INDEX_PROFILES,
     PINECONE_API_KEY,
+    PINECONE_INDEX_NAME,
+    PINECONE_INDEX_HOST,
+    PINECONE_NAMESPACE,
+    PINECONE_TEXT_FIELD,
     PINECONE_USE_INTEGRATED_EMBEDDING,
+    EMBEDDING_MODEL,
+    VECTOR_BACKEND,
+    LOCAL_INDEX_DIR,
+    SYNC_MANIFEST_PATH,
 )
-from indexer import load_profiles, build_document, embed_texts
-from pinecone_store import add_to_pinecone, add_to_pinecone_text
+from ann_index import update_ann_index
+from embedding_cache import open_embedding_cache
+from facets import facet_metadata
+from indexer import load_profiles, build_document, embed_texts, build_index
+from pinecone_store import add_to_pinecone, add_to_pinecone_text, delete_from_pinecone
+from sync_manifest import SyncManifest, document_hash
+
+
+def build_local() -> int:
+    if not OPENAI_API_KEY:
+        print("Error: OPENAI_API_KEY required for the local vector backend.", file=sys.stderr)
+        return 1
+    print(f"Embedding profiles from {DATA_PATH} with OpenAI (cap {MAX_INDEX_PROFILES})...")
+    profiles, embeddings = build_index(DATA_PATH, index_dir=LOCAL_INDEX_DIR)
+    print(f"Done. Wrote {len(profiles)} x {embeddings.shape[1] if len(embeddings) else 0} matrix to {LOCAL_INDEX_DIR}.")
+    ann = update_ann_index(LOCAL_INDEX_DIR, retrain="--retrain-ann" in sys.argv)
+    if ann is not None:
+        print(f"ANN index: {len(ann)} rows in {ann.nlist} lists (trained on {ann.trained_rows}).")
+    return 0
 
 
 def main() -> int:
+    if VECTOR_BACKEND == "local":
+        return build_local()
     if not PINECONE_API_KEY:
         print("Error: PINECONE_API_KEY is required (this script uses Pinecone only).", file=sys.stderr)
         return 1
+    if not PINECONE_USE_INTEGRATED_EMBEDDING and not OPENAI_API_KEY:
+        print("Error: OPENAI_API_KEY required for Pinecone vector mode.", file=sys.stderr)
+        return 1
 
     print(f"Loading profiles from {DATA_PATH}...")
-    all_profiles = load_profiles(DATA_PATH)
+    # One past the cap so we can tell whether the file was truncated
+    all_profiles = load_profiles(DATA_PATH, limit=MAX_INDEX_PROFILES + 1)
     if not all_profiles:
         print("Error: No profiles found in data file.", file=sys.stderr)
         return 1
@@ -48,21 +97,55 @@ def main() -> int:
     print(f"Building documents for {n} profiles...")
     documents = [build_document(p) for p in profiles]
     ids = [str(p.get("id") or i) for i, p in enumerate(profiles)]
+    metadata = [facet_metadata(p) for p in profiles]
+    hashes = {
+        pid: document_hash(doc + "\0" + json.dumps(meta, sort_keys=True))
+        for pid, doc, meta in zip(ids, documents, metadata)
+    }
+
+    manifest = SyncManifest(
+        SYNC_MANIFEST_PATH,
+        target={
+            "index": PINECONE_INDEX_HOST or PINECONE_INDEX_NAME,
+            "namespace": PINECONE_NAMESPACE,
+            "mode": f"text:{PINECONE_TEXT_FIELD}" if PINECONE_USE_INTEGRATED_EMBEDDING else f"vector:{EMBEDDING_MODEL}",
+        },
+    )
+    if manifest.status == "interrupted":
+        print("Resuming interrupted sync from last committed batch.")
+    plan = manifest.plan(hashes)
+    print(
+        f"Delta: {len(plan.adds)} new, {len(plan.changes)} changed, "
+        f"{len(plan.deletes)} deleted, {plan.unchanged} unchanged."
+    )
+    if plan.deletes:
+        print(f"Deleting {len(plan.deletes)} records from Pinecone...")
+        delete_from_pinecone(plan.deletes, on_batch=lambda batch: manifest.commit(deleted=batch))
+
+    # Only the delta is embedded/upserted; each accepted batch is committed to the manifest
+    position = {pid: i for i, pid in enumerate(ids)}
+    upsert_ids = plan.upserts
+    upsert_docs = [documents[position[pid]] for pid in upsert_ids]
+    upsert_meta = [metadata[position[pid]] for pid in upsert_ids]
+
+    def commit_batch(batch_ids: list[str]) -> None:
+        manifest.commit(upserted={pid: hashes[pid] for pid in batch_ids})
 
-    if PINECONE_USE_INTEGRATED_EMBEDDING:
-        print("Upserting into Pinecone (integrated embedding)...")
-        add_to_pinecone_text(ids, documents)
-    else:
-        if not OPENAI_API_KEY:
-            print("Error: OPENAI_API_KEY required for Pinecone vector mode.", file=sys.stderr)
-            return 1
+    if upsert_ids and PINECONE_USE_INTEGRATED_EMBEDDING:
+        print(f"Upserting {len(upsert_ids)} records into Pinecone (integrated embedding)...")
+        add_to_pinecone_text(upsert_ids, upsert_docs, on_batch=commit_batch, metadata=upsert_meta)
+    elif upsert_ids:
+        cache = open_embedding_cache()
+        if cache is not None:
+            cached = len(upsert_docs) - len(cache.get_many(upsert_docs)[1])
+            print(f"Embedding cache: {cached}/{len(upsert_docs)} documents already embedded.")
         print("Embedding with OpenAI (batches of 100)...")
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        embeddings = embed_texts(client, documents)
-        print("Upserting into Pinecone...")
-        add_to_pinecone(ids, embeddings.tolist())
+        embeddings = embed_texts(get_openai(), upsert_docs, cache=cache)
+        print(f"Upserting {len(upsert_ids)} vectors into Pinecone...")
+        add_to_pinecone(upsert_ids, embeddings.tolist(), on_batch=commit_batch, metadata=upsert_meta)
 
-    print(f"Done. Indexed {n} alumni in Pinecone.")
+    manifest.compact()
+    print(f"Done. {n} alumni in Pinecone ({len(upsert_ids)} upserted, {len(plan.deletes)} deleted).")
     return 0
 
 
@@ -0,0 +1,150 @@
+"""
+Content-addressed on-disk cache of document embeddings for the indexer.
+
+Key = sha256(model, document text). Per model, the cache directory holds:
+- vectors.f32: append-only raw float32 rows (dim from meta.json), read through a memmap
+- index.tsv: append-only "key<TAB>row" lines mapping a document hash to its row
+- meta.json: model and embedding dimension
+
+Rows are appended before their index lines, so an interrupted run can only leave
+unreferenced rows behind, never an index entry pointing at a missing vector. A crash
+mid-write can leave a partial row or index line at the end; opening the cache cuts
+both files back to their last complete entry, so later appends stay aligned.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_MODEL
+
+VECTORS_FILE = "vectors.f32"
+INDEX_FILE = "index.tsv"
+META_FILE = "meta.json"
+
+
+def document_key(model: str, text: str) -> str:
+    """Stable content hash for (model, text)."""
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    """Persistent hash -> float32 vector store for one embedding model."""
+
+    def __init__(self, cache_dir: str, model: str = EMBEDDING_MODEL):
+        self.model = model
+        self.path = Path(cache_dir) / re.sub(r"[^A-Za-z0-9._-]", "_", model)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim: int | None = None
+        meta_path = self.path / META_FILE
+        if meta_path.exists():
+            self.dim = int(json.loads(meta_path.read_text(encoding="utf-8"))["dim"])
+        self._rows: dict[str, int] = {}
+        self._matrix: np.ndarray | None = None
+        self._lock = threading.Lock()  # put_many runs from concurrent embedding batches
+        self._load()
+
+    def _n_rows(self) -> int:
+        vec_path = self.path / VECTORS_FILE
+        if not self.dim or not vec_path.exists():
+            return 0
+        return vec_path.stat().st_size // (4 * self.dim)
+
+    def _load(self) -> None:
+        n_rows = self._n_rows()
+        if n_rows or self.dim:
+            _truncate(self.path / VECTORS_FILE, n_rows * 4 * (self.dim or 0))
+        index_path = self.path / INDEX_FILE
+        if index_path.exists():
+            data = index_path.read_bytes()
+            _truncate(index_path, data.rfind(b"\n") + 1)
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, row = line.rstrip("\n").partition("\t")
+                    if row.isdigit() and int(row) < n_rows:
+                        self._rows[key] = int(row)
+        self._remap(n_rows)
+
+    def _remap(self, n_rows: int) -> None:
+        self._matrix = None
+        if n_rows:
+            self._matrix = np.memmap(self.path / VECTORS_FILE, dtype=np.float32, mode="r", shape=(n_rows, self.dim))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_many(self, texts: list[str]) -> tuple[list[np.ndarray | None], list[int]]:
+        """Look up texts. Returns (vectors with None for misses, indices of misses)."""
+        vectors: list[np.ndarray | None] = []
+        misses: list[int] = []
+        for i, text in enumerate(texts):
+            row = self._rows.get(document_key(self.model, text))
+            if row is None or self._matrix is None:
+                vectors.append(None)
+                misses.append(i)
+            else:
+                vectors.append(np.array(self._matrix[row]))
+        return vectors, misses
+
+    def put_many(self, texts: list[str], vectors: np.ndarray) -> None:
+        """Append vectors for texts (already-cached texts are skipped)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) != len(vectors):
+            raise ValueError(f"texts ({len(texts)}) and vectors ({len(vectors)}) length mismatch")
+        if not len(texts):
+            return
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            (self.path / META_FILE).write_text(json.dumps({"model": self.model, "dim": self.dim}), encoding="utf-8")
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dim {vectors.shape[1]} does not match cache dim {self.dim}")
+
+        with self._lock:
+            new_keys: list[str] = []
+            new_rows: list[int] = []
+            seen: set[str] = set()
+            for i, text in enumerate(texts):
+                key = document_key(self.model, text)
+                if key in self._rows or key in seen:
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                new_rows.append(i)
+            if not new_keys:
+                return
+
+            start = self._n_rows()
+            with open(self.path / VECTORS_FILE, "ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+            with open(self.path / INDEX_FILE, "a", encoding="utf-8") as f:
+                f.writelines(f"{key}\t{start + j}\n" for j, key in enumerate(new_keys))
+            for j, key in enumerate(new_keys):
+                self._rows[key] = start + j
+            self._remap(start + len(new_keys))
+
+
+def _truncate(path: Path, size: int) -> None:
+    """Cut a torn tail off an append-only file (no-op when it is already that size or missing)."""
+    try:
+        if path.stat().st_size <= size:
+            return
+    except FileNotFoundError:
+        return
+    with open(path, "r+b") as f:
+        f.truncate(size)
+        os.fsync(f.fileno())
+
+
+def open_embedding_cache(model: str = EMBEDDING_MODEL) -> EmbeddingCache | None:
+    """Cache for model under EMBEDDING_CACHE_DIR, or None when caching is disabled."""
+    if not EMBEDDING_CACHE_DIR:
+        return None
+    return EmbeddingCache(EMBEDDING_CACHE_DIR, model)
@@ -0,0 +1,248 @@
+"""
+Facet indexes for filtering alumni by current company, location and skill.
+
+Built once per dataset snapshot from currentPosition[].companyName, location.parsed.text
+(or linkedinText) and topSkills. Locations are also indexed by each comma-separated part,
+so "Tennessee" matches "Nashville, Tennessee, United States". Values are matched
+case-insensitively.
+
+Postings are stored CSR-style per facet, like keyword_index: rows[offsets[v]:offsets[v+1]]
+are the ascending dataset rows having value v. A filter ORs the values given for one facet
+and ANDs the facets. Each intersection binary-searches the smaller row array in the larger
+one (np.searchsorted), so a filter costs about O(matches · log n) and never scans every profile.
+The transposed table (each row's values) lets facet counts over a filtered set cost O(matches) too.
+to_tables() / from_tables() round-trip the index through the profile store file, so workers
+map the arrays instead of rebuilding them from every profile.
+
+facet_metadata() gives the same values as Pinecone metadata. embed_json_to_vectordb.py
+upserts them, so filters can be pushed down to the index (pinecone_filter()).
+"""
+from array import array
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+
+from profile_store import profile_id
+
+FACETS = ("company", "location", "skill")
+
+
+def normalize_value(value: str) -> str:
+    return " ".join(value.casefold().split())
+
+
+def _location_values(text: str) -> list[str]:
+    parts = [p.strip() for p in text.split(",") if p.strip()]
+    return [text] + parts if len(parts) > 1 else parts
+
+
+def profile_values(profile: dict) -> dict[str, list[str]]:
+    """Display values of every facet for one profile (deduplicated, in profile order)."""
+    companies = [cp.get("companyName") for cp in profile.get("currentPosition") or []]
+    loc = profile.get("location") or {}
+    location = ((loc.get("parsed") or {}).get("text") or loc.get("linkedinText") or "").strip()
+    skills = profile.get("topSkills")
+    if isinstance(skills, str):
+        skills = skills.split("•")
+    values = {
+        "company": [c.strip() for c in companies if isinstance(c, str) and c.strip()],
+        "location": _location_values(location) if location else [],
+        "skill": [s.strip() for s in skills or [] if isinstance(s, str) and s.strip()],
+    }
+    return {facet: list(dict.fromkeys(v)) for facet, v in values.items()}
+
+
+def facet_metadata(profile: dict) -> dict[str, list[str]]:
+    """Normalized facet values for Pinecone record metadata (facets without values are left out)."""
+    out = {}
+    for facet, values in profile_values(profile).items():
+        normalized = list(dict.fromkeys(normalize_value(v) for v in values))
+        if normalized:
+            out[facet] = normalized
+    return out
+
+
+def pinecone_filter(filters: dict[str, list[str]]) -> dict | None:
+    """Pinecone metadata filter for the same semantics as FacetIndex.match (any value per facet, all facets)."""
+    clauses = {
+        facet: {"$in": list(dict.fromkeys(normalize_value(v) for v in values))}
+        for facet, values in filters.items()
+        if values
+    }
+    return clauses or None
+
+
+@dataclass(frozen=True, eq=False)
+class FacetFilter:
+    """A filter resolved against one FacetIndex: normalized values per facet and the ascending matching rows."""
+
+    values: dict[str, tuple[str, ...]]
+    rows: np.ndarray
+
+    @property
+    def key(self) -> tuple:
+        """Hashable, order-independent form of the filter (for cache keys and ETags)."""
+        return tuple(sorted(self.values.items()))
+
+    def contains(self, row: int | None) -> bool:
+        if row is None or not len(self.rows):
+            return False
+        i = int(np.searchsorted(self.rows, row))
+        return i < len(self.rows) and int(self.rows[i]) == row
+
+    def pinecone(self) -> dict:
+        return pinecone_filter({facet: list(values) for facet, values in self.values.items()})
+
+
+class _Facet:
+    def __init__(self, keys: dict[str, int], labels: list[str], offsets: np.ndarray, rows: np.ndarray, row_offsets: np.ndarray, row_values: np.ndarray):
+        self.keys = keys
+        self.labels = labels
+        self.offsets = offsets
+        self.rows = rows
+        # Transposed: row_values[row_offsets[r]:row_offsets[r+1]] are the values of row r
+        self.row_offsets = row_offsets
+        self.row_values = row_values
+
+    def postings(self, value: str) -> np.ndarray:
+        v = self.keys.get(normalize_value(value))
+        if v is None:
+            return self.rows[:0]
+        return self.rows[self.offsets[v] : self.offsets[v + 1]]
+
+    def union(self, values: list[str]) -> np.ndarray:
+        arrays = [self.postings(v) for v in dict.fromkeys(values)]
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def values_of(self, rows: np.ndarray) -> np.ndarray:
+        """Value ids of all the given rows, concatenated (vectorized CSR gather)."""
+        starts = self.row_offsets[rows]
+        lengths = self.row_offsets[rows + 1] - starts
+        ends = np.cumsum(lengths)
+        idx = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+        return self.row_values[idx]
+
+
+def _intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Sorted unique rows in both sorted unique arrays: the smaller one binary-searched in the larger."""
+    small, large = (a, b) if len(a) <= len(b) else (b, a)
+    if not len(small) or not len(large):
+        return small[:0]
+    pos = np.searchsorted(large, small)
+    pos[pos == len(large)] = 0
+    return small[large[pos] == small]
+
+
+class FacetIndex:
+    def __init__(self, ids: list[str], facets: dict[str, _Facet]):
+        self.ids = ids
+        self.facets = facets
+
+    @classmethod
+    def build(cls, profiles: Iterable[dict]) -> "FacetIndex":
+        """Index profiles in row order (rows match the profile store and keyword index)."""
+        ids: list[str] = []
+        keys: dict[str, dict[str, int]] = {f: {} for f in FACETS}
+        labels: dict[str, list[str]] = {f: [] for f in FACETS}
+        # (value, row) pairs per facet in typed arrays, grouped by value afterwards
+        p_value = {f: array("i") for f in FACETS}
+        p_row = {f: array("i") for f in FACETS}
+        for row, profile in enumerate(profiles):
+            ids.append(profile_id(profile, row))
+            for facet, values in profile_values(profile).items():
+                seen = set()
+                for value in values:
+                    key = normalize_value(value)
+                    v = keys[facet].get(key)
+                    if v is None:
+                        v = keys[facet][key] = len(labels[facet])
+                        labels[facet].append(value)
+                    if v not in seen:
+                        seen.add(v)
+                        p_value[facet].append(v)
+                        p_row[facet].append(row)
+        facets = {}
+        for facet in FACETS:
+            value_arr = np.frombuffer(p_value[facet], dtype=np.int32)
+            row_arr = np.frombuffer(p_row[facet], dtype=np.int32)
+            # Stable sort keeps rows ascending within each value
+            order = np.argsort(value_arr, kind="stable")
+            offsets = np.zeros(len(labels[facet]) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(value_arr, minlength=len(labels[facet])), out=offsets[1:])
+            # Pairs were appended in row order, so they already are the transposed table
+            row_offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(row_arr, minlength=len(ids)), out=row_offsets[1:])
+            facets[facet] = _Facet(keys[facet], labels[facet], offsets, row_arr[order], row_offsets, value_arr.copy())
+        return cls(ids, facets)
+
+    @classmethod
+    def from_tables(cls, tables: dict) -> "FacetIndex":
+        """Rebuild from to_tables() output; the arrays are used as given (e.g. views of the store map)."""
+        facets = {}
+        for facet in FACETS:
+            keys = tables[f"{facet}.keys"]
+            facets[facet] = _Facet(
+                {k: v for v, k in enumerate(keys)},
+                tables[f"{facet}.labels"],
+                tables[f"{facet}.offsets"],
+                tables[f"{facet}.rows"],
+                tables[f"{facet}.row_offsets"],
+                tables[f"{facet}.row_values"],
+            )
+        return cls(tables["ids"], facets)
+
+    def to_tables(self) -> dict:
+        """Arrays and string lists that from_tables() rebuilds the index from."""
+        tables: dict = {"ids": self.ids}
+        for facet, f in self.facets.items():
+            tables.update({
+                f"{facet}.keys": list(f.keys),
+                f"{facet}.labels": f.labels,
+                f"{facet}.offsets": f.offsets,
+                f"{facet}.rows": f.rows,
+                f"{facet}.row_offsets": f.row_offsets,
+                f"{facet}.row_values": f.row_values,
+            })
+        return tables
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def select(self, filters: dict[str, list[str]]) -> FacetFilter | None:
+        """Resolve a filter (facet -> accepted values; blank values ignored), or None when it filters nothing."""
+        values = {}
+        for facet in FACETS:
+            normalized = sorted({normalize_value(v) for v in filters.get(facet) or [] if v and v.strip()})
+            if normalized:
+                values[facet] = tuple(normalized)
+        if not values:
+            return None
+        return FacetFilter(values, self.match(values))
+
+    def match(self, filters: dict[str, list[str]]) -> np.ndarray | None:
+        """Ascending rows passing every facet filter (any of its values), or None when nothing is filtered."""
+        unions = [self.facets[facet].union(values) for facet, values in filters.items() if values]
+        if not unions:
+            return None
+        unions.sort(key=len)
+        result = unions[0]
+        for rows in unions[1:]:
+            if not len(result):
+                break
+            result = _intersect(result, rows)
+        return result
+
+    def counts(self, facet: str, limit: int = 50, rows: np.ndarray | None = None) -> list[tuple[str, int]]:
+        """Most common values of a facet as (display value, count), over all rows or just the given ones."""
+        f = self.facets[facet]
+        if rows is None:
+            counts = np.diff(f.offsets)
+        else:
+            values, counts = np.unique(f.values_of(rows), return_counts=True)
+            top = np.argsort(-counts, kind="stable")[:limit]
+            return [(f.labels[values[i]], int(counts[i])) for i in top]
+        top = np.argsort(-counts, kind="stable")[:limit]
+        return [(f.labels[v], int(counts[v])) for v in top if counts[v] > 0]
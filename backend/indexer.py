@@ -1,15 +1,34 @@
 """
 Load LinkedIn JSON and build one searchable document per profile.
+Profiles are parsed incrementally (iter_profiles), so loading stops at the cap, and can
+be slimmed to just the fields the API and build_document read (slim_profile).
 Embed documents with OpenAI and store in memory for semantic search.
+Unchanged documents are served from the on-disk embedding cache (embedding_cache.py).
 """
 import json
+import sys
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
 
 from openai import OpenAI
 import numpy as np
 
-from config import DATA_PATH, EMBEDDING_MODEL, OPENAI_API_KEY
+from config import (
+    DATA_PATH,
+    EMBEDDING_MODEL,
+    OPENAI_API_KEY,
+    MAX_INDEX_PROFILES,
+    OPENAI_EMBED_TPM,
+    OPENAI_EMBED_CONCURRENCY,
+    OPENAI_EMBED_BATCH_TOKENS,
+)
+from clients import get_openai
+from embedding_cache import EmbeddingCache, open_embedding_cache
+from local_store import save_local_index
+from rate_limit import TokenBucket, estimate_tokens, run_batches, token_batches
+
+# Shared by every embedding batch in this process; adapts to OpenAI 429 / Retry-After
+_embed_limiter = TokenBucket(OPENAI_EMBED_TPM)
 
 
 def _get(obj: Any, *keys: str, default: str = "") -> str:
@@ -62,38 +81,175 @@ def build_document(profile: dict) -> str:
     return "\n".join(p for p in parts if p).strip() or " "
 
 
-def load_profiles(data_path: str) -> list[dict]:
+_READ_CHUNK = 1 << 20
+_WS = " \t\r\n"
+
+
+def iter_profiles(data_path: str) -> Iterator[dict]:
+    """
+    Yield profiles one at a time from a JSON array file without loading the whole dump.
+    A file whose top level is not an array yields nothing (same as load_profiles).
+    """
     path = Path(data_path)
     if not path.exists():
         raise FileNotFoundError(f"Data file not found: {path}")
+    decoder = json.JSONDecoder()
     with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return data if isinstance(data, list) else []
-
-
-def embed_texts(client: OpenAI, texts: list[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
-    """Embed a list of texts with OpenAI. Returns (n, dim) numpy array."""
-    out = []
-    batch_size = 100
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i : i + batch_size]
-        resp = client.embeddings.create(input=batch, model=model)
-        for e in resp.data:
-            out.append(e.embedding)
-    return np.array(out, dtype=np.float32)
-
-
-def build_index(data_path: str | None = None) -> tuple[list[dict], np.ndarray]:
+        buf = f.read(_READ_CHUNK)
+        pos = len(buf) - len(buf.lstrip(_WS + "\ufeff"))
+        if not buf[pos:pos + 1] == "[":
+            return
+        pos += 1
+        eof = False
+        while True:
+            # Skip separators; refill when the buffer runs dry
+            while True:
+                while pos < len(buf) and (buf[pos] in _WS or buf[pos] == ","):
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(_READ_CHUNK), 0
+                eof = not buf
+            if pos >= len(buf) or buf[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(_READ_CHUNK)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            pos = end
+            if isinstance(obj, dict):
+                yield obj
+
+
+def _slim_text(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) and len(value) <= 64 else value
+
+
+def slim_profile(profile: dict) -> dict:
+    """
+    Copy of a profile with only the fields profile_to_sourced and build_document read.
+    Short repeated strings (companies, titles, locations) are interned so they are stored once.
+    """
+    loc = profile.get("location") or {}
+    parsed = loc.get("parsed") or {}
+    picture = profile.get("profilePicture") or {}
+    return {
+        "id": profile.get("id"),
+        "firstName": profile.get("firstName"),
+        "lastName": profile.get("lastName"),
+        "headline": _slim_text(profile.get("headline")),
+        "about": profile.get("about"),
+        "linkedinUrl": profile.get("linkedinUrl"),
+        "topSkills": _slim_text(profile.get("topSkills")),
+        "location": {
+            "parsed": {"text": _slim_text(parsed.get("text"))},
+            "linkedinText": _slim_text(loc.get("linkedinText")),
+        },
+        "currentPosition": [
+            {"companyName": _slim_text(cp.get("companyName"))} for cp in profile.get("currentPosition") or []
+        ],
+        "experience": [
+            {
+                "position": _slim_text(exp.get("position")),
+                "companyName": _slim_text(exp.get("companyName")),
+                "description": exp.get("description"),
+            }
+            for exp in profile.get("experience") or []
+        ],
+        "profilePicture": {"url": picture.get("url")} if isinstance(picture, dict) else picture,
+        "photo": profile.get("photo"),
+    }
+
+
+def load_profiles(data_path: str, limit: int | None = None, slim: bool = False) -> list[dict]:
+    """Load up to limit profiles (streaming; stops reading at the cap), optionally slimmed."""
+    profiles = []
+    if limit is not None and limit <= 0:
+        return profiles
+    for profile in iter_profiles(data_path):
+        profiles.append(slim_profile(profile) if slim else profile)
+        if limit is not None and len(profiles) >= limit:
+            break
+    return profiles
+
+
+def embed_texts(
+    client: OpenAI,
+    texts: list[str],
+    model: str = EMBEDDING_MODEL,
+    cache: EmbeddingCache | None = None,
+) -> np.ndarray:
+    """
+    Embed a list of texts with OpenAI. Returns (n, dim) numpy array.
+    With a cache, only texts not already cached for this model are sent to the API, and
+    each API batch is written to the cache as it completes, so an interrupted run keeps
+    what it already paid for.
+    """
+    if cache is None:
+        return _embed_batches(client, texts, model)
+    vectors, misses = cache.get_many(texts)
+    if misses:
+        # Identical documents (e.g. empty profiles) are embedded once
+        unique = list(dict.fromkeys(texts[i] for i in misses))
+        embedded = _embed_batches(client, unique, model, on_batch=cache.put_many)
+        by_text = dict(zip(unique, embedded))
+        for i in misses:
+            vectors[i] = by_text[texts[i]]
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack(vectors).astype(np.float32, copy=False)
+
+
+def _embed_batches(
+    client: OpenAI,
+    texts: list[str],
+    model: str,
+    on_batch: Callable[[list[str], list[list[float]]], None] | None = None,
+) -> np.ndarray:
+    """
+    Embed in token-budgeted batches (max 100 texts), several in flight under the shared limiter.
+    on_batch(texts, embeddings) runs as each batch completes.
+    """
+    batches = [
+        [texts[i] for i in idx]
+        for idx in token_batches(texts, estimate_tokens, OPENAI_EMBED_BATCH_TOKENS, 100)
+    ]
+    results = run_batches(
+        batches,
+        lambda batch: [e.embedding for e in client.embeddings.create(input=batch, model=model).data],
+        limiter=_embed_limiter,
+        cost=lambda batch: sum(estimate_tokens(t) for t in batch),
+        concurrency=OPENAI_EMBED_CONCURRENCY,
+        on_done=on_batch,
+        upstream="openai",
+    )
+    return np.array([emb for batch in results for emb in batch], dtype=np.float32)
+
+
+def build_index(
+    data_path: str | None = None,
+    index_dir: str | None = None,
+    max_profiles: int = MAX_INDEX_PROFILES,
+) -> tuple[list[dict], np.ndarray]:
     """
-    Load profiles, build documents, embed with OpenAI.
+    Load profiles (capped to max_profiles), build documents, embed with OpenAI.
     Returns (profiles_list, embeddings_array) where embeddings_array[i] is the embedding for profiles_list[i].
+    If index_dir is set, also writes the embeddings + id table there for the local vector backend.
     """
     path = data_path or DATA_PATH
-    profiles = load_profiles(path)
+    profiles = load_profiles(path, limit=max_profiles)
     if not OPENAI_API_KEY:
         raise ValueError("OPENAI_API_KEY environment variable is required for indexing")
 
     documents = [build_document(p) for p in profiles]
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    embeddings = embed_texts(client, documents)
+    embeddings = embed_texts(get_openai(), documents, cache=open_embedding_cache())
+    if index_dir:
+        # Same id scheme as main.py's _profiles_by_id so hits resolve to profiles
+        ids = [str(p.get("id") or i) for i, p in enumerate(profiles)]
+        save_local_index(index_dir, ids, embeddings, EMBEDDING_MODEL)
     return profiles, embeddings
@@ -0,0 +1,24 @@
+"""
+JSON bytes encoding for precomputed API payloads (/alumni body, cards, stream events) and
+the profile store. Uses orjson when installed; the stdlib fallback produces the same
+compact UTF-8 output.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+
+    def dumps(obj: Any) -> bytes:
+        """Fast JSON encoding for precomputed API payloads."""
+        return orjson.dumps(obj)
+
+    def loads(data: bytes) -> Any:
+        return orjson.loads(data)
+except ImportError:
+    def dumps(obj: Any) -> bytes:
+        """JSON encoding for precomputed API payloads (install orjson for speed)."""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data: bytes) -> Any:
+        return json.loads(data)
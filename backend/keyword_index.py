@@ -0,0 +1,220 @@
+"""
+BM25 keyword index over indexer.build_document text, held in memory next to the profiles.
+
+Postings are stored CSR-style: for term t, doc_rows[offsets[t]:offsets[t+1]] are the rows
+containing it and weights[...] their precomputed BM25 contribution (idf and length
+normalization folded in at build time), so a query is a few array slices plus a bincount.
+
+Exact field values (company names, skills, job titles) are kept as an entity set, used as
+the vocabulary of the local query expander. A query that is exactly a company name
+("Deloitte", "Salesforce") is answered from the index alone, unless that company is so
+common in the data that its name says little (see exact_match). Titles and skills
+("Manager", "Python") are too generic for that and always take the full pipeline.
+Otherwise keyword and vector hits are combined with reciprocal-rank fusion (rrf_fuse).
+"""
+import re
+from array import array
+from collections import Counter
+from typing import Iterable
+
+import numpy as np
+
+from indexer import build_document
+from profile_store import profile_id
+from search import top_k_indices
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[^\W_][\w+#]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its me my of on or our that the this to was we with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords ("c++" and "c#" stay whole)."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _entity_key(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def profile_companies(profile: dict) -> Iterable[str]:
+    """Current and past company names: the field values worth an exact-match fast path."""
+    for cp in profile.get("currentPosition") or []:
+        if cp.get("companyName"):
+            yield cp["companyName"]
+    for exp in profile.get("experience") or []:
+        if exp.get("companyName"):
+            yield exp["companyName"]
+
+
+def profile_entities(profile: dict) -> Iterable[str]:
+    """Known field values: companies, titles, skills."""
+    yield from profile_companies(profile)
+    for exp in profile.get("experience") or []:
+        if exp.get("position"):
+            yield exp["position"]
+    skills = profile.get("topSkills")
+    if isinstance(skills, str):
+        yield from (s for s in skills.split("•") if s.strip())
+
+
+def entity_vocabulary(profiles: Iterable[dict]) -> set[str]:
+    """Normalized company / skill / title keys (tokenized, space-joined) of the given profiles."""
+    return {k for profile in profiles for k in map(_entity_key, profile_entities(profile)) if k}
+
+
+class KeywordIndex:
+    def __init__(self, ids: list[str], terms: dict[str, int], offsets: np.ndarray, doc_rows: np.ndarray, weights: np.ndarray, entities: set[str], companies: set[str]):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_rows = doc_rows
+        self.weights = weights
+        self.entities = entities
+        self.companies = companies
+
+    @classmethod
+    def build(cls, profiles: Iterable[dict], ids: list[str] | None = None) -> "KeywordIndex":
+        """Index profiles in row order; ids default to profile_store.profile_id."""
+        terms: dict[str, int] = {}
+        entities: set[str] = set()
+        companies: set[str] = set()
+        row_ids: list[str] = []
+        # Flat (term, row, tf) triples in typed arrays: 12 bytes per posting while building
+        p_term, p_row, p_tf = array("i"), array("i"), array("i")
+        lengths = array("i")
+        for row, profile in enumerate(profiles):
+            row_ids.append(ids[row] if ids is not None else profile_id(profile, row))
+            counts = Counter(tokenize(build_document(profile)))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                p_term.append(terms.setdefault(term, len(terms)))
+                p_row.append(row)
+                p_tf.append(tf)
+            entities.update(k for k in map(_entity_key, profile_entities(profile)) if k)
+            companies.update(k for k in map(_entity_key, profile_companies(profile)) if k)
+
+        n = len(row_ids)
+        term_arr = np.frombuffer(p_term, dtype=np.int32)
+        # Stable sort keeps rows ascending within each term's postings
+        order = np.argsort(term_arr, kind="stable")
+        df = np.bincount(term_arr, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+        doc_rows = np.frombuffer(p_row, dtype=np.int32)[order]
+        tf = np.frombuffer(p_tf, dtype=np.int32)[order].astype(np.float32)
+        doc_len = np.frombuffer(lengths, dtype=np.int32).astype(np.float32)
+        avgdl = float(doc_len.mean()) if n else 1.0
+        idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[doc_rows] / max(avgdl, 1e-6))
+        weights = (idf[term_arr[order]] * tf * (BM25_K1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(row_ids, terms, offsets, doc_rows, weights, entities, companies)
+
+    @classmethod
+    def from_tables(cls, ids: list[str], tables: dict) -> "KeywordIndex":
+        """Rebuild from to_tables() output; the arrays are used as given (e.g. views of the store map)."""
+        terms = {t: i for i, t in enumerate(tables["terms"])}
+        return cls(
+            ids, terms, tables["offsets"], tables["doc_rows"], tables["weights"], set(tables["entities"]), set(tables["companies"])
+        )
+
+    def to_tables(self) -> dict:
+        """Postings, weights and string tables that from_tables() rebuilds the index from (ids are stored elsewhere)."""
+        return {
+            "terms": list(self.terms),
+            "offsets": self.offsets,
+            "doc_rows": self.doc_rows,
+            "weights": self.weights,
+            "entities": sorted(self.entities),
+            "companies": sorted(self.companies),
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _score(self, tokens: list[str], require_all: bool) -> tuple[np.ndarray, np.ndarray]:
+        """(rows, scores) of documents matching the tokens (any, or all when require_all)."""
+        empty = np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        tids = [self.terms.get(t) for t in dict.fromkeys(tokens)]
+        if require_all and (not tids or None in tids):
+            return empty
+        spans = [(self.offsets[t], self.offsets[t + 1]) for t in tids if t is not None]
+        if not spans:
+            return empty
+        if len(spans) == 1:
+            a, b = spans[0]
+            return self.doc_rows[a:b], self.weights[a:b]
+        rows = np.concatenate([self.doc_rows[a:b] for a, b in spans])
+        weights = np.concatenate([self.weights[a:b] for a, b in spans])
+        uniq, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+        if require_all:
+            keep = np.bincount(inverse) == len(spans)
+            uniq, scores = uniq[keep], scores[keep]
+        return uniq, scores
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray, n_results: int, allowed: np.ndarray | None = None) -> list[tuple[str, float]]:
+        if allowed is not None:
+            keep = _member(rows, allowed)
+            rows, scores = rows[keep], scores[keep]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top_k_indices(scores, n_results)]
+
+    def search(self, query: str, n_results: int, allowed: np.ndarray | None = None) -> list[tuple[str, float]]:
+        """
+        BM25 top-n over documents containing any query term. Returns [(id, score)].
+        allowed (ascending rows, e.g. from facets.FacetIndex.match) restricts the candidates.
+        """
+        return self._hits(*self._score(tokenize(query), require_all=False), n_results, allowed)
+
+    def exact_match(
+        self, query: str, n_results: int, allowed: np.ndarray | None = None, max_share: float = 1.0
+    ) -> list[tuple[str, float]] | None:
+        """
+        High-confidence fast path: if the query is exactly a known company name, return the
+        documents containing all its terms ranked by BM25; otherwise None. A company found in
+        more than max_share of all documents (e.g. the alumni's own university) is not
+        specific enough and gives None too, as does, with allowed rows, matching none of them.
+        """
+        key = _entity_key(query)
+        if not key or key not in self.companies:
+            return None
+        rows, scores = self._score(key.split(), require_all=True)
+        if len(rows) > max_share * len(self.ids):
+            return None
+        hits = self._hits(rows, scores, n_results, allowed) if len(rows) else None
+        return hits or None
+
+
+def _member(rows: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+    """Mask of rows present in the ascending array allowed (binary search, no dense mask)."""
+    if not len(allowed):
+        return np.zeros(len(rows), dtype=bool)
+    pos = np.searchsorted(allowed, rows)
+    pos[pos == len(allowed)] = 0
+    return allowed[pos] == rows
+
+
+def rrf_fuse(ranked_lists: list[list[tuple[str, float]]], n_results: int, k: int = 60) -> list[tuple[str, float]]:
+    """
+    Reciprocal-rank fusion: score(id) = sum over lists of 1 / (k + rank). Only ranks matter,
+    so BM25 and cosine scores need no calibration. Scores are scaled so an id ranked first
+    in every list gets 1.0; an id found by only one of two lists gets at most 0.5. They rank
+    ids within one fusion and say nothing about similarity across queries.
+    """
+    lists = [hits for hits in ranked_lists if hits]
+    fused: dict[str, float] = {}
+    for hits in lists:
+        seen = set()
+        for rank, (pid, _) in enumerate(hits, start=1):
+            if pid in seen:
+                continue
+            seen.add(pid)
+            fused[pid] = fused.get(pid, 0.0) + 1.0 / (k + rank)
+    best = len(lists) / (k + 1) if lists else 1.0
+    ordered = sorted(fused, key=fused.__getitem__, reverse=True)[:n_results]
+    return [(pid, fused[pid] / best) for pid in ordered]
@@ -0,0 +1,101 @@
+"""
+Local on-disk vector store for alumni embeddings (no network).
+
+The index is a directory written by indexer.build_index:
+- embeddings.npy: (n, dim) float32 matrix, L2-normalized at write time; row i is the embedding for ids[i]
+- ids.json: profile id per row, plus the embedding model used
+
+At startup the matrix is opened read-only with np.load(mmap_mode="r"), so several
+uvicorn workers share one page-cached copy instead of each loading their own.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from search import normalize_rows, top_k_per_query, top_k_scores
+
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.json"
+
+
+def save_local_index(
+    index_dir: str,
+    ids: list[str],
+    embeddings: np.ndarray,
+    model: str,
+) -> None:
+    """Write embeddings + id table to index_dir (replacing any previous index)."""
+    if len(ids) != len(embeddings):
+        raise ValueError(f"ids ({len(ids)}) and embeddings ({len(embeddings)}) length mismatch")
+    path = Path(index_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    # Write to temp names and rename so a running server never maps a half-written file
+    tmp_emb = path / (EMBEDDINGS_FILE + ".tmp")
+    with open(tmp_emb, "wb") as f:
+        np.save(f, np.ascontiguousarray(normalize_rows(embeddings)))
+    tmp_ids = path / (IDS_FILE + ".tmp")
+    tmp_ids.write_text(json.dumps({"model": model, "ids": ids}), encoding="utf-8")
+    tmp_emb.replace(path / EMBEDDINGS_FILE)
+    tmp_ids.replace(path / IDS_FILE)
+
+
+def load_local_index(index_dir: str) -> tuple[list[str], np.ndarray, str]:
+    """Map a local index read-only. Returns (ids, embeddings memmap, model)."""
+    path = Path(index_dir)
+    emb_path = path / EMBEDDINGS_FILE
+    ids_path = path / IDS_FILE
+    if not emb_path.exists() or not ids_path.exists():
+        raise FileNotFoundError(f"Local index not found in {path} (run embed_json_to_vectordb.py)")
+    meta = json.loads(ids_path.read_text(encoding="utf-8"))
+    ids = [str(i) for i in meta.get("ids") or []]
+    embeddings = np.load(emb_path, mmap_mode="r")
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(ids):
+        raise ValueError(f"Local index in {path} is inconsistent: {embeddings.shape} vs {len(ids)} ids")
+    return ids, embeddings, meta.get("model") or ""
+
+
+def search_local_multi(
+    ids: list[str],
+    embeddings: np.ndarray,
+    query_embeddings: np.ndarray | list[list[float]],
+    n_results: int = 20,
+    ann=None,
+    rows: np.ndarray | None = None,
+) -> list[tuple[str, float]]:
+    """
+    Score every query embedding against the local matrix, merge by id (max score), return top n_results.
+    With an ann_index.IVFIndex only the rows in each query's probed lists are scored.
+    With rows (matrix rows allowed by a facet filter) exactly those rows are scored, without the ANN.
+    """
+    if len(query_embeddings) == 0 or not ids:
+        return []
+    if rows is not None:
+        hits = top_k_scores(embeddings[rows], query_embeddings, top_k=n_results, normalized=True)
+        return [(ids[rows[i]], score) for i, score in hits]
+    if ann is not None:
+        hits = ann.search(embeddings, query_embeddings, top_k=n_results)
+    else:
+        hits = top_k_scores(embeddings, query_embeddings, top_k=n_results, normalized=True)
+    return [(ids[i], score) for i, score in hits]
+
+
+def search_local_each(
+    ids: list[str],
+    embeddings: np.ndarray,
+    query_embeddings: np.ndarray,
+    n_results: int = 20,
+    ann=None,
+    rows: np.ndarray | None = None,
+) -> list[list[tuple[str, float]]]:
+    """Top n_results per query embedding (not merged), e.g. for scoring many unique phrases at once."""
+    if not ids:
+        return [[] for _ in range(len(query_embeddings))]
+    if rows is not None:
+        per_query = top_k_per_query(embeddings[rows], query_embeddings, top_k=n_results, normalized=True)
+        return [[(ids[rows[i]], score) for i, score in hits] for hits in per_query]
+    if ann is not None:
+        per_query = [ann.search(embeddings, q, top_k=n_results) for q in query_embeddings]
+    else:
+        per_query = top_k_per_query(embeddings, query_embeddings, top_k=n_results, normalized=True)
+    return [[(ids[i], score) for i, score in hits] for hits in per_query]
@@ -1,60 +1,182 @@
 """
 FastAPI app for LinkedIn-powered alumni search.
-Uses Pinecone only for vector search; serves full alumni list from JSON for Directory.
+Uses Pinecone for vector search by default, or an in-process memory-mapped embedding
+matrix when VECTOR_BACKEND=local; serves full alumni list from JSON for Directory.
 (ChromaDB code is kept in the repo but not connected.)
 """
+import asyncio
+import hashlib
+import hmac
+import logging
+import math
+import time
+import weakref
+from collections.abc import Generator, Iterator
 from contextlib import asynccontextmanager
+from functools import partial
 
-from fastapi import FastAPI, HTTPException
+import numpy as np
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from openai import OpenAI
 
 from config import (
     OPENAI_API_KEY,
-    DATA_PATH,
-    EMBEDDING_MODEL,
     TOP_K,
-    MAX_INDEX_PROFILES,
     PINECONE_API_KEY,
     PINECONE_USE_INTEGRATED_EMBEDDING,
     CORS_ORIGINS,
+    VECTOR_BACKEND,
+    ADMIN_TOKEN,
+    RELOAD_POLL_SECONDS,
+    RELOAD_SETTLE_SECONDS,
+    RELOAD_MARKER_PATH,
+    KEYWORD_FAST_PATH,
+    KEYWORD_FAST_PATH_MAX_SHARE,
+    RRF_K,
+    PINECONE_FILTER_PUSHDOWN,
+    FACET_VALUES_LIMIT,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL_SECONDS,
+    SEARCH_BATCH_MAX_QUERIES,
+    SEARCH_MAX_INFLIGHT,
+    SHED_RETRY_AFTER_SECONDS,
+    EMBED_BATCH_MAX,
+)
+from cache import LeaderGone, LRUCache, SingleFlight
+from clients import init_clients, close_clients, connection_stats
+from dataset import Dataset, cards_body, load_dataset, source_mtimes
+from facets import FACETS, FacetFilter
+from keyword_index import rrf_fuse
+import query_log
+from metrics import (
+    REQUEST_SECONDS,
+    SEARCH_DEGRADED,
+    SEARCH_SHED,
+    register_collector,
+    render as render_metrics,
+    server_timing,
+    stage,
+    start_request,
 )
-from indexer import load_profiles
+from resilience import UpstreamUnavailable, upstream_stats
+from local_store import search_local_each, search_local_multi
+from jsonutil import dumps
 from search import profile_to_sourced
-from query_expand import expand_query
+from query_expand import expand_within_budget, expand_queries, normalize_query, load_cache as load_expansion_cache, cache_stats as expansion_cache_stats
+from query_embed import (
+    embed_phrases,
+    load_cache as load_phrase_cache,
+    save_cache as save_phrase_cache,
+    cache_stats as phrase_cache_stats,
+)
 from pinecone_store import (
     search_pinecone,
     search_pinecone_multi,
     search_pinecone_by_text,
     search_pinecone_multi_text,
+    iter_fan_out,
+    is_partial,
+    merge_max,
+    top_hits,
 )
 
-# Loaded at startup: list of profile dicts and id -> profile for lookup
-_profiles: list[dict] = []
-_profiles_by_id: dict[str, dict] = {}
+_log = logging.getLogger("fiskconnect.api")
+
+# Current data snapshot (profiles, /alumni body, local vectors). Replaced atomically by reloads;
+# request handlers read it once and use that snapshot throughout.
+_dataset: Dataset | None = None
+_reload_lock = asyncio.Lock()
+_reload_status: dict = {"reloads": 0, "last_error": None}
+
+# Finished /search results by (dataset generation, normalized query, facet filter); a reload changes the generation,
+# so results from the old data are never served and simply age out
+_search_cache = LRUCache(SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS, name="search")
+_search_flight = SingleFlight()
+# Degraded reason for answers missing some phrases' vector hits (dropped at the deadline or failed)
+_PARTIAL = "pinecone:partial"
+# /search* requests admitted and not yet answered (only touched on the event loop, in _shed_load)
+_search_inflight = 0
+
+
+async def reload_dataset() -> Dataset:
+    """
+    Build the next snapshot off the event loop, then swap it in. Old snapshot stays valid for in-flight
+    requests; its profile store is closed once the last of them lets go of it.
+    """
+    global _dataset
+    async with _reload_lock:
+        generation = (_dataset.generation if _dataset else 0) + 1
+        try:
+            dataset = await asyncio.to_thread(load_dataset, generation)
+        except Exception as e:
+            _reload_status["last_error"] = f"{type(e).__name__}: {e}"
+            raise
+        previous, _dataset = _dataset, dataset
+        if previous is not None:
+            weakref.finalize(previous, previous.store.close)
+        _reload_status["reloads"] += 1
+        _reload_status["last_error"] = None
+        return dataset
+
+
+async def _watch_sources() -> None:
+    """
+    Reload when DATA_PATH (or the profile store / local index) changes on disk, once the files have
+    been unchanged for RELOAD_SETTLE_SECONDS; with RELOAD_MARKER_PATH, as soon as the marker changes.
+    """
+    failed: dict | None = None
+    pending: dict | None = None
+    changed_at = 0.0
+    while True:
+        await asyncio.sleep(RELOAD_POLL_SECONDS)
+        # Only the sources: holding the snapshot here would keep it (and its store) open between polls
+        loaded = _dataset.sources if _dataset is not None else None
+        sources = source_mtimes()
+        if loaded is None or sources == loaded or sources == failed:
+            pending = None
+            continue
+        if not RELOAD_MARKER_PATH:
+            if sources != pending:
+                pending, changed_at = sources, time.monotonic()
+            if time.monotonic() - changed_at < RELOAD_SETTLE_SECONDS:
+                continue
+        pending = None
+        try:
+            await reload_dataset()
+            failed = None
+        except Exception as e:
+            # Keep serving the previous snapshot; retried once the files change again
+            failed = sources
+            _log.warning("Dataset reload failed: %s", e)
 
 
 @asynccontextmanager
 async def lifespan(app):
-    global _profiles, _profiles_by_id
+    global _dataset
     try:
-        if not PINECONE_API_KEY:
-            raise ValueError("PINECONE_API_KEY is required (this app uses Pinecone only)")
-
-        all_profiles = load_profiles(DATA_PATH)
-        if not all_profiles:
-            raise RuntimeError("No profiles loaded from data file")
-        _profiles = all_profiles[:MAX_INDEX_PROFILES]
-        _profiles_by_id = {str(p.get("id") or i): p for i, p in enumerate(_profiles)}
+        if VECTOR_BACKEND != "local" and not PINECONE_API_KEY:
+            raise ValueError("PINECONE_API_KEY is required (VECTOR_BACKEND=pinecone)")
+        _dataset = load_dataset(generation=1)
         # Pinecone index is populated separately (run embed_json_to_vectordb.py). Startup does not block on upsert.
+        init_clients()
+        load_expansion_cache()
+        load_phrase_cache()
+        query_log.start()
     except FileNotFoundError as e:
         raise RuntimeError(f"Index build failed: {e}") from e
     except ValueError as e:
         raise RuntimeError(f"Index build failed: {e}") from e
+    watcher = asyncio.create_task(_watch_sources()) if RELOAD_POLL_SECONDS > 0 else None
     yield
-    _profiles = []
-    _profiles_by_id = {}
+    if watcher is not None:
+        watcher.cancel()
+    save_phrase_cache()
+    query_log.stop()
+    close_clients()
+    _dataset = None
 
 
 app = FastAPI(
@@ -63,6 +185,30 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+@app.middleware("http")
+async def _shed_load(request: Request, call_next):
+    """
+    Turn away search requests beyond SEARCH_MAX_INFLIGHT with 503 + Retry-After instead of
+    queueing them for a worker thread. Registered before CORS so rejections still carry CORS headers.
+    Streams count until their headers are sent.
+    """
+    global _search_inflight
+    if SEARCH_MAX_INFLIGHT <= 0 or not request.url.path.startswith("/search"):
+        return await call_next(request)
+    if _search_inflight >= SEARCH_MAX_INFLIGHT:
+        SEARCH_SHED.inc()
+        return JSONResponse(
+            {"detail": "Too many searches in progress; retry shortly"},
+            status_code=503,
+            headers={"Retry-After": str(SHED_RETRY_AFTER_SECONDS)},
+        )
+    _search_inflight += 1
+    try:
+        return await call_next(request)
+    finally:
+        _search_inflight -= 1
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
@@ -73,60 +219,679 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def _record_timing(request: Request, call_next):
+    """Request latency histogram, plus a Server-Timing header listing the search stages that ran."""
+    timings = start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(
+        elapsed, method=request.method, path=getattr(route, "path", "unmatched"), status=response.status_code
+    )
+    if timings:
+        response.headers["Server-Timing"] = server_timing(timings + [("total", elapsed)])
+    return response
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def _upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    """An upstream the request needs is refused or failing, and there was no local answer: 503 + Retry-After."""
+    return JSONResponse(
+        {"detail": f"Search temporarily unavailable: {exc}"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+class SearchFilters(BaseModel):
+    """Facet filters: a profile matches when it has any listed value of every facet given (case-insensitive)."""
+
+    company: list[str] = []
+    location: list[str] = []
+    skill: list[str] = []
+
+
 class SearchRequest(BaseModel):
     query: str
+    filters: SearchFilters | None = None
 
 
 class SearchResponse(BaseModel):
     alumni: list[dict]
 
 
+class BatchSearchRequest(BaseModel):
+    queries: list[str]
+
+
+class BatchSearchResult(BaseModel):
+    query: str
+    alumni: list[dict]
+
+
+class BatchSearchResponse(BaseModel):
+    results: list[BatchSearchResult]
+
+
 @app.get("/health")
 def health():
-    return {"status": "ok", "profiles_indexed": len(_profiles)}
+    dataset = _dataset
+    return {
+        "status": "ok",
+        "profiles_indexed": len(dataset) if dataset is not None else 0,
+        "dataset": {
+            "generation": dataset.generation if dataset is not None else 0,
+            "loaded_at": dataset.loaded_at if dataset is not None else None,
+            "store_fallback": dataset.store_fallback if dataset is not None else None,
+            **_reload_status,
+        },
+        "connections": connection_stats(),
+        "caches": _cache_stats(),
+        "upstreams": upstream_stats(),
+        "search_inflight": _search_inflight,
+    }
+
+
+def _cache_stats() -> dict:
+    return {
+        "search": {**_search_cache.stats(), "coalesced": _search_flight.coalesced},
+        "expansion": expansion_cache_stats(),
+        "phrase_embedding": phrase_cache_stats(),
+    }
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: stage/request latency histograms, upstream 429s and the /health counters."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _health_samples():
+    """The /health numbers as metric samples (read at scrape time)."""
+    dataset = _dataset
+    yield "profiles_indexed", "Profiles in the current dataset snapshot", {}, len(dataset) if dataset is not None else 0
+    yield "dataset_generation", "Generation of the current dataset snapshot", {}, dataset.generation if dataset is not None else 0
+    yield "dataset_reloads_total", "Dataset reloads since startup", {}, _reload_status["reloads"]
+    caches = _cache_stats()
+    for name, stats in caches.items():
+        labels = {"cache": name}
+        yield "cache_entries", "Entries held by each cache", labels, stats["size"]
+        yield "cache_hits_total", "Cache hits", labels, stats["hits"]
+        yield "cache_misses_total", "Cache misses", labels, stats["misses"]
+        yield "cache_hit_rate", "Cache hits / lookups since startup", labels, stats["hit_rate"]
+    yield "search_coalesced_total", "/search and /search/stream calls that waited on an identical query in flight", {}, caches["search"]["coalesced"]
+    batching = caches["phrase_embedding"]["batching"]
+    yield "embed_batch_requests_total", "Phrase embedding requests sent through the micro-batcher", {}, batching["requests"]
+    yield "embed_batch_api_calls_total", "Embedding API calls made by the micro-batcher", {}, batching["api_calls"]
+    for name, stats in upstream_stats().items():
+        labels = {"upstream": name}
+        circuit, bulkhead = stats["circuit"], stats["bulkhead"]
+        yield "upstream_circuit_open", "1 while the circuit is open, 0.5 half-open, 0 closed", labels, {"closed": 0, "half_open": 0.5, "open": 1}[circuit["state"]]
+        yield "upstream_circuit_opened_total", "Times the circuit opened", labels, circuit["opened"]
+        yield "upstream_circuit_rejected_total", "Calls refused while the circuit was open", labels, circuit["rejected"]
+        yield "upstream_in_flight", "Requests holding a bulkhead slot", labels, bulkhead["in_flight"]
+        yield "upstream_bulkhead_rejected_total", "Requests that found no free bulkhead slot in time", labels, bulkhead["rejected"]
+    yield "search_in_flight", "Search requests admitted and not yet answered", {}, _search_inflight
+    for key, value in connection_stats().items():
+        name = key if key.endswith("_ratio") else f"{key}_total"
+        yield name, f"Upstream client counter {key}", {}, value
+
+
+register_collector(_health_samples)
+
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: str = Header("")):
+    """Rebuild the dataset from DATA_PATH and swap it in without downtime (requires ADMIN_TOKEN)."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    try:
+        dataset = await reload_dataset()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Reload failed; still serving previous data: {e}") from e
+    return {"generation": dataset.generation, "profiles_indexed": len(dataset)}
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
 
 
 @app.get("/alumni", response_model=SearchResponse)
-def list_alumni():
-    """Return all alumni from the JSON (for Directory tab). No Supabase."""
-    results = [profile_to_sourced(p, 1.0) for p in _profiles]
-    return SearchResponse(alumni=results)
+def list_alumni(
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int | None = Query(None, ge=1, le=1000),
+    company: list[str] = Query([]),
+    location: list[str] = Query([]),
+    skill: list[str] = Query([]),
+):
+    """
+    Return alumni from the JSON (for Directory tab). No Supabase.
+    Cards are pre-encoded at startup. Without limit the full list is returned; with
+    offset/limit the page also carries "total" and "nextOffset" (null on the last page).
+    company / location / skill (repeatable) keep alumni having any given value of each
+    facet; pages and "total" then count the matches only, in directory order.
+    Responses carry an ETag; a matching If-None-Match gets 304 with no body.
+    """
+    dataset = _dataset
+    if dataset is None:
+        raise HTTPException(status_code=503, detail="Alumni data not loaded")
+    scope = _scope(dataset, {"company": company, "location": location, "skill": skill})
+    etag_base = dataset.store.etag + (f"-f{_filter_tag(scope)}" if scope is not None else "")
+    paged = limit is not None
+    etag = f'"{etag_base}-{offset}-{limit}"' if paged else f'"{etag_base}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if not paged and scope is None:
+        return Response(content=dataset.alumni_body, media_type="application/json", headers=headers)
+    total = len(dataset) if scope is None else len(scope.rows)
+    end = total if limit is None else min(offset + limit, total)
+    if not paged:
+        body = cards_body(dataset.store.cards_json_rows(scope.rows))
+        return Response(content=body, media_type="application/json", headers=headers)
+    next_offset = end if end < total else None
+    extra = b',"total":' + str(total).encode() + b',"nextOffset":' + dumps(next_offset)
+    if offset >= end:
+        cards = b""
+    elif scope is None:
+        cards = dataset.store.cards_json(offset, end)
+    else:
+        cards = dataset.store.cards_json_rows(scope.rows[offset:end])
+    return Response(content=cards_body(cards, extra), media_type="application/json", headers=headers)
+
+
+@app.get("/alumni/facets")
+def alumni_facets(
+    request: Request,
+    limit: int = Query(FACET_VALUES_LIMIT, ge=1, le=1000),
+    company: list[str] = Query([]),
+    location: list[str] = Query([]),
+    skill: list[str] = Query([]),
+):
+    """
+    Most common values of each facet with their profile counts, for building filter menus.
+    With company / location / skill filters the counts are over the matching alumni only.
+    """
+    dataset = _dataset
+    if dataset is None or dataset.facets is None:
+        raise HTTPException(status_code=503, detail="Alumni data not loaded")
+    scope = _scope(dataset, {"company": company, "location": location, "skill": skill})
+    etag = f'"{dataset.store.etag}-facets-{limit}' + (f"-f{_filter_tag(scope)}" if scope is not None else "") + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    rows = scope.rows if scope is not None else None
+    body = {
+        "total": len(dataset) if scope is None else len(scope.rows),
+        "facets": {
+            facet: [{"value": value, "count": count} for value, count in dataset.facets.counts(facet, limit, rows)]
+            for facet in FACETS
+        },
+    }
+    return Response(content=dumps(body), media_type="application/json", headers=headers)
+
+
+def _scope(dataset: Dataset, filters: dict[str, list[str]] | None) -> FacetFilter | None:
+    """Resolve request filters against the snapshot's facet index (None when nothing is filtered)."""
+    if not filters or dataset.facets is None:
+        return None
+    return dataset.facets.select(filters)
+
+
+def _filter_tag(scope: FacetFilter) -> str:
+    return hashlib.sha1(dumps(scope.key)).hexdigest()[:12]
 
 
 @app.post("/search", response_model=SearchResponse)
-def search(req: SearchRequest):
+def search(req: SearchRequest, response: Response):
     """
     Help-seeking search: refactor query into search phrases, retrieve from vector DB
     (RAG-style chunks = one per alumni), merge and return top alumni as JSON for cards.
+    Degraded answers (local expansion, or keyword index only while an upstream is
+    unavailable) carry an X-Search-Degraded header and are not cached.
+    Optional filters (company / location / skill) restrict every retrieval stage to the
+    matching alumni; they are pushed down to Pinecone as a metadata filter.
     """
     if not req.query or not req.query.strip():
         return SearchResponse(alumni=[])
 
-    if not _profiles_by_id:
+    dataset = _dataset
+    if dataset is None:
+        raise HTTPException(status_code=503, detail="Search index not ready")
+    query = req.query.strip()
+    scope = _scope(dataset, req.filters.model_dump() if req.filters else None)
+    # Identical queries share one result: cached, or coalesced onto the pipeline run already in flight
+    key = _search_key(dataset, query, scope)
+    entry = query_log.begin("/search", query, key[1], dataset.generation, dict(scope.values) if scope else None)
+    alumni = _search_cache.get(key)
+    if alumni is not None:
+        query_log.finish(entry, alumni, source="cache")
+    else:
+        alumni, degraded = _search_flight.do(key, lambda: _search_and_cache(dataset, query, key, entry, scope))
+        query_log.finish(entry, alumni, source="coalesced", degraded=degraded)
+        if degraded:
+            response.headers["X-Search-Degraded"] = degraded
+    return SearchResponse(alumni=alumni)
+
+
+def _search_key(dataset: Dataset, query: str, scope: FacetFilter | None = None) -> tuple:
+    return (dataset.generation, normalize_query(query), scope.key if scope is not None else ())
+
+
+def _search_and_cache(
+    dataset: Dataset, query: str, key: tuple, entry: dict | None = None, scope: FacetFilter | None = None
+) -> tuple[list[dict], str | None]:
+    # A run that finished between the caller's cache miss and this one taking the lead
+    cached = _search_cache.peek(key)
+    if cached is not None:
+        if entry is not None:
+            entry["source"] = "cache"
+        return cached, None
+    alumni, degraded = _run_search(dataset, query, entry, scope)
+    if not degraded:
+        _search_cache.set(key, alumni)
+    return alumni, degraded
+
+
+def _run_search(
+    dataset: Dataset, query: str, entry: dict | None = None, scope: FacetFilter | None = None
+) -> tuple[list[dict], str | None]:
+    """
+    expand -> embed -> vector query (+ BM25 fusion) for one query against one dataset snapshot.
+    Returns (alumni, degraded). degraded is None for a full answer. It is "expansion" when
+    the phrases came from the local fallback expander, "<upstream>:<reason>" when vector
+    retrieval was unavailable and only the keyword index answered, and "pinecone:partial"
+    when some phrases' queries were dropped at the deadline or failed. Degraded answers are
+    not cached, so the next identical query gets the full pipeline again.
+    A query_log entry, if given, is told which path answered and the expanded phrases.
+    With a facet scope only its rows can be returned.
+    """
+    exact = _fast_path(dataset, query, scope)
+    if exact is not None:
+        if entry is not None:
+            entry["source"] = "fast_path"
+        return exact, None
+
+    if VECTOR_BACKEND == "local" and dataset.local_embeddings is None:
         raise HTTPException(status_code=503, detail="Search index not ready")
 
     # Refactor help request into 3–5 short search phrases (e.g. "Microsoft", "resume", "software engineering")
-    phrases = expand_query(req.query.strip())
+    with stage("expand"):
+        phrases, expansion = expand_within_budget(query, dataset.vocabulary)
+    if entry is not None:
+        entry.update(source="pipeline", phrases=phrases, expansion=expansion)
+    degraded = "expansion" if expansion == "fallback" else None
     if not phrases:
-        return SearchResponse(alumni=[])
+        return [], degraded
+
+    outcome: dict = {}
+    try:
+        hits = _vector_hits(dataset, phrases, scope, outcome)
+    except UpstreamUnavailable as e:
+        hits, degraded = _without_vectors(dataset, e), f"{e.upstream}:{e.reason}"
+    if is_partial(outcome):
+        degraded = degraded or _PARTIAL
+    return _to_sourced(dataset, _fuse_keywords(dataset, phrases, hits, scope)), degraded
+
+
+def _vector_hits(
+    dataset: Dataset, phrases: list[str], scope: FacetFilter | None = None, outcome: dict | None = None
+) -> list[tuple[str, float]]:
+    """RAG: get chunks (one per alumni) per phrase, merge by profile id (max score). outcome: see iter_fan_out."""
+    if VECTOR_BACKEND != "local" and PINECONE_USE_INTEGRATED_EMBEDDING:
+        with stage("vector"):
+            hits = search_pinecone_multi_text(phrases, n_results=TOP_K, filter=_pinecone_filter(scope), outcome=outcome)
+        return _in_scope(dataset, hits, scope)
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+    with stage("embed"):
+        query_embeddings = embed_phrases(phrases)
+    with stage("vector"):
+        if VECTOR_BACKEND == "local":
+            return search_local_multi(
+                dataset.local_ids,
+                dataset.local_embeddings,
+                query_embeddings,
+                n_results=TOP_K,
+                ann=dataset.ann,
+                rows=_local_rows(dataset, scope),
+            )
+        hits = search_pinecone_multi(
+            [q.tolist() for q in query_embeddings], n_results=TOP_K, filter=_pinecone_filter(scope), outcome=outcome
+        )
+    return _in_scope(dataset, hits, scope)
+
+
+def _pinecone_filter(scope: FacetFilter | None) -> dict | None:
+    return scope.pinecone() if scope is not None and PINECONE_FILTER_PUSHDOWN else None
+
+
+def _local_rows(dataset: Dataset, scope: FacetFilter | None) -> np.ndarray | None:
+    """Embedding-matrix rows of the scope's profiles (those missing from the local index are skipped)."""
+    if scope is None or dataset.local_rows is None:
+        return None
+    rows = dataset.local_rows[scope.rows]
+    return rows[rows >= 0]
+
+
+def _in_scope(dataset: Dataset, hits: list[tuple[str, float]], scope: FacetFilter | None) -> list[tuple[str, float]]:
+    """Drop hits outside the scope (Pinecone without pushdown, or records upserted before they had metadata)."""
+    if scope is None:
+        return hits
+    return [(pid, score) for pid, score in hits if scope.contains(dataset.store.row_of(pid))]
+
+
+def _without_vectors(dataset: Dataset, error: UpstreamUnavailable) -> list[tuple[str, float]]:
+    """Degraded mode: no vector hits, so _fuse_keywords ranks by the keyword index alone (503 if there is none)."""
+    if dataset.keywords is None:
+        raise error
+    SEARCH_DEGRADED.inc(upstream=error.upstream, reason=error.reason)
+    _log.info("Search degraded to keyword index: %s", error)
+    return []
 
-    # RAG: get chunks (one per alumni) per phrase, merge by profile id (max score) via Pinecone
-    if PINECONE_USE_INTEGRATED_EMBEDDING:
-        hits = search_pinecone_multi_text(phrases, n_results=TOP_K)
+
+def _fast_path(dataset: Dataset, query: str, scope: FacetFilter | None = None) -> list[dict] | None:
+    """
+    The query names a known, specific company exactly ("Deloitte") -> keyword index only.
+    A scope matching no alumni answers [] without running anything.
+    """
+    if scope is not None and not len(scope.rows):
+        return []
+    if not KEYWORD_FAST_PATH or dataset.keywords is None:
+        return None
+    with stage("keyword"):
+        exact = dataset.keywords.exact_match(
+            query, TOP_K, allowed=scope.rows if scope is not None else None, max_share=KEYWORD_FAST_PATH_MAX_SHARE
+        )
+    if not exact:
+        return None
+    top = exact[0][1]
+    return _to_sourced(dataset, [(pid, score / top) for pid, score in exact])
+
+
+def _fuse_keywords(
+    dataset: Dataset, phrases: list[str], hits: list[tuple[str, float]], scope: FacetFilter | None = None
+) -> list[tuple[str, float]]:
+    """Hybrid: fuse vector hits with BM25 hits for the same phrases by reciprocal rank."""
+    if dataset.keywords is None:
+        return hits
+    with stage("keyword"):
+        keyword_hits = dataset.keywords.search(" ".join(phrases), n_results=TOP_K, allowed=scope.rows if scope is not None else None)
+        return rrf_fuse([hits, keyword_hits], n_results=TOP_K, k=RRF_K)
+
+
+def _to_sourced(dataset: Dataset, hits: list[tuple[str, float]]) -> list[dict]:
+    results = []
+    with stage("hydrate"):
+        for pid, score in hits:
+            profile = dataset.store.get(pid)
+            if profile:
+                results.append(profile_to_sourced(profile, score))
+    return results
+
+
+@app.post("/search/stream")
+def search_stream(req: SearchRequest, accept: str = Header("")):
+    """
+    /search, streamed as each stage finishes (NDJSON; SSE when Accept: text/event-stream).
+    Events: "phrases" once expanded; "update" per phrase merged, carrying the cards not sent
+    before and the current ranking; "done" with the final ordered list, identical to /search.
+    Cached and exact-match queries go straight to "done". Failures after the stream has
+    started arrive as an "error" event.
+    """
+    sse = "text/event-stream" in accept
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    if not req.query or not req.query.strip():
+        return StreamingResponse(_encode_events(iter([("done", {"alumni": []})]), sse), media_type=media_type)
+
+    dataset = _dataset
+    if dataset is None:
+        raise HTTPException(status_code=503, detail="Search index not ready")
+    query = req.query.strip()
+    scope = _scope(dataset, req.filters.model_dump() if req.filters else None)
+    key = _search_key(dataset, query, scope)
+    entry = query_log.begin("/search/stream", query, key[1], dataset.generation, dict(scope.values) if scope else None)
+    alumni = _search_cache.get(key)
+    source = "cache"
+    if alumni is None:
+        alumni = _fast_path(dataset, query, scope)
+        source = "fast_path"
+        if alumni is not None:
+            _search_cache.set(key, alumni)
+    if alumni is not None:
+        query_log.finish(entry, alumni, source=source)
+        events = iter([("done", {"alumni": alumni})])
     else:
-        if not OPENAI_API_KEY:
+        if VECTOR_BACKEND == "local" and dataset.local_embeddings is None:
+            raise HTTPException(status_code=503, detail="Search index not ready")
+        if not (VECTOR_BACKEND != "local" and PINECONE_USE_INTEGRATED_EMBEDDING) and not OPENAI_API_KEY:
             raise HTTPException(status_code=503, detail="OpenAI API key not configured")
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        resp = client.embeddings.create(input=phrases, model=EMBEDDING_MODEL)
-        query_embeddings = [e.embedding for e in resp.data]
-        if len(query_embeddings) == 1:
-            hits = search_pinecone(query_embeddings[0], n_results=TOP_K)
+        events = _stream_search_once(dataset, query, key, entry, scope)
+    # X-Accel-Buffering: keep reverse proxies (nginx) from holding events back until the end
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(_encode_events(events, sse), media_type=media_type, headers=headers)
+
+
+def _stream_search_once(
+    dataset: Dataset, query: str, key: tuple, entry: dict | None = None, scope: FacetFilter | None = None
+) -> Iterator[tuple[str, dict]]:
+    """
+    _stream_search under the same single-flight key as /search: while an identical query is
+    in flight (streamed or not) this waits for it and sends only "done"; otherwise it leads,
+    and concurrent /search calls wait for the stream's result. The flight is claimed on the
+    first event, so a response that is never iterated holds nothing.
+    """
+    while True:
+        call, leader = _search_flight.join(key)
+        if leader:
+            break
+        try:
+            alumni, degraded = _search_flight.wait(call)
+        except LeaderGone:
+            continue
+        query_log.finish(entry, alumni, source="coalesced", degraded=degraded)
+        yield "done", {"alumni": alumni, **({"degraded": degraded} if degraded else {})}
+        return
+    try:
+        alumni = _search_cache.peek(key)
+        degraded = None
+        if alumni is not None:
+            query_log.finish(entry, alumni, source="cache")
         else:
-            hits = search_pinecone_multi(query_embeddings, n_results=TOP_K)
+            alumni, degraded = yield from _stream_search(dataset, query, key, entry, scope)
+    except GeneratorExit:
+        # Client went away part-way: waiters run the query themselves
+        _search_flight.finish(key, call, abandoned=True)
+        raise
+    except BaseException as e:
+        _search_flight.finish(key, call, error=e)
+        raise
+    _search_flight.finish(key, call, (alumni, degraded))
+    yield "done", {"alumni": alumni, **({"degraded": degraded} if degraded else {})}
 
-    results = []
-    for pid, score in hits:
-        profile = _profiles_by_id.get(pid)
-        if profile:
-            results.append(profile_to_sourced(profile, score))
-    return SearchResponse(alumni=results)
+
+def _stream_search(
+    dataset: Dataset, query: str, key: tuple, entry: dict | None = None, scope: FacetFilter | None = None
+) -> Generator[tuple[str, dict], None, tuple[list[dict], str | None]]:
+    """
+    _run_search as a sequence of events: the max-score pool is re-ranked after every phrase.
+    Returns (alumni, degraded); the caller sends "done".
+    """
+    with stage("expand"):
+        phrases, expansion = expand_within_budget(query, dataset.vocabulary)
+    if entry is not None:
+        entry.update(source="pipeline", phrases=phrases, expansion=expansion)
+    yield "phrases", {"phrases": phrases}
+    degraded = "expansion" if expansion == "fallback" else None
+    best: dict[str, float] = {}
+    sent: set[str] = set()
+    outcome: dict = {}
+    try:
+        for hits in _iter_phrase_hits(dataset, phrases, scope, outcome):
+            merge_max(best, hits)
+            ranking = top_hits(best, TOP_K)
+            cards = []
+            for pid, score in ranking:
+                if pid in sent:
+                    continue
+                sent.add(pid)
+                profile = dataset.store.get(pid)
+                if profile:
+                    cards.append(profile_to_sourced(profile, score))
+            yield "update", {
+                "alumni": cards,
+                "ranking": [{"id": pid, "relevanceScore": round(score, 4)} for pid, score in ranking],
+            }
+    except UpstreamUnavailable as e:
+        _without_vectors(dataset, e)
+        degraded = f"{e.upstream}:{e.reason}"
+    if is_partial(outcome):
+        degraded = degraded or _PARTIAL
+    alumni = _to_sourced(dataset, _fuse_keywords(dataset, phrases, top_hits(best, TOP_K), scope)) if phrases else []
+    if not degraded:
+        _search_cache.set(key, alumni)
+    query_log.finish(entry, alumni, degraded=degraded)
+    return alumni, degraded
+
+
+def _iter_phrase_hits(
+    dataset: Dataset, phrases: list[str], scope: FacetFilter | None = None, outcome: dict | None = None
+) -> Iterator[list[tuple[str, float]]]:
+    """Each phrase's vector hits, in the order they come back. outcome: see iter_fan_out."""
+    if not phrases:
+        return
+    pinecone_filter = _pinecone_filter(scope)
+    if VECTOR_BACKEND != "local" and PINECONE_USE_INTEGRATED_EMBEDDING:
+        query_fn = partial(search_pinecone_by_text, filter=pinecone_filter)
+        for _, hits in iter_fan_out(query_fn, phrases, TOP_K * 2, outcome=outcome):
+            yield _in_scope(dataset, hits, scope)
+        return
+    with stage("embed"):
+        query_embeddings = embed_phrases(phrases)
+    if VECTOR_BACKEND == "local":
+        # One pass over the matrix scores every phrase; nothing to gain by splitting it
+        with stage("vector"):
+            per_phrase = search_local_each(
+                dataset.local_ids,
+                dataset.local_embeddings,
+                query_embeddings,
+                n_results=TOP_K,
+                ann=dataset.ann,
+                rows=_local_rows(dataset, scope),
+            )
+        yield from per_phrase
+        return
+    query_fn = partial(search_pinecone, filter=pinecone_filter)
+    for _, hits in iter_fan_out(query_fn, [q.tolist() for q in query_embeddings], TOP_K * 2, outcome=outcome):
+        yield _in_scope(dataset, hits, scope)
+
+
+def _encode_events(events: Iterator[tuple[str, dict]], sse: bool) -> Iterator[bytes]:
+    try:
+        for event, data in events:
+            yield _encode_event(event, data, sse)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            detail = e.detail
+            _log.warning("Streaming search failed: %s", detail)
+        else:
+            detail = "Search failed"
+            _log.exception("Streaming search failed")
+        yield _encode_event("error", {"detail": detail}, sse)
+
+
+def _encode_event(event: str, data: dict, sse: bool) -> bytes:
+    if sse:
+        return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+    return dumps({"event": event, **data}) + b"\n"
+
+
+@app.post("/search/batch", response_model=BatchSearchResponse)
+def search_batch(req: BatchSearchRequest):
+    """
+    Many searches in one call (e.g. nightly matching jobs). Queries are expanded several per
+    LLM call, and every distinct phrase across the batch is embedded and queried once;
+    each query's results are then merged from its phrases' hits exactly as /search does.
+    """
+    if len(req.queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {SEARCH_BATCH_MAX_QUERIES} queries per batch")
+    dataset = _dataset
+    if dataset is None:
+        raise HTTPException(status_code=503, detail="Search index not ready")
+
+    queries = [(q or "").strip() for q in req.queries]
+    alumni: list[list[dict] | None] = [None] * len(queries)
+    todo: dict[tuple, list[int]] = {}  # cache key -> positions still to compute
+    for i, query in enumerate(queries):
+        if not query:
+            alumni[i] = []
+            continue
+        key = _search_key(dataset, query)
+        cached = _search_cache.get(key)
+        if cached is None and key not in todo:
+            cached = _fast_path(dataset, query)
+            if cached is not None:
+                _search_cache.set(key, cached)
+        if cached is not None:
+            alumni[i] = cached
+        else:
+            todo.setdefault(key, []).append(i)
+
+    if todo:
+        if VECTOR_BACKEND == "local" and dataset.local_embeddings is None:
+            raise HTTPException(status_code=503, detail="Search index not ready")
+        keys = list(todo)
+        with stage("expand"):
+            fallback: set[int] = set()
+            expansions = expand_queries([queries[todo[key][0]] for key in keys], dataset.vocabulary, fallback)
+        unique = list(dict.fromkeys(p for phrases in expansions for p in phrases))
+        phrase_hits = _hits_per_phrase(dataset, unique)
+        for n, (key, phrases) in enumerate(zip(keys, expansions)):
+            best: dict[str, float] = {}
+            for phrase in phrases:
+                merge_max(best, phrase_hits.get(phrase, []))
+            result = _to_sourced(dataset, _fuse_keywords(dataset, phrases, top_hits(best, TOP_K))) if phrases else []
+            # Locally expanded, or a phrase whose query failed has no hits: don't cache the weaker answer
+            if n not in fallback and all(phrase in phrase_hits for phrase in phrases):
+                _search_cache.set(key, result)
+            for i in todo[key]:
+                alumni[i] = result
+
+    return BatchSearchResponse(
+        results=[BatchSearchResult(query=q, alumni=a or []) for q, a in zip(req.queries, alumni)]
+    )
+
+
+def _hits_per_phrase(dataset: Dataset, phrases: list[str]) -> dict[str, list[tuple[str, float]]]:
+    """
+    Vector hits for each distinct phrase: one embedding per phrase, one index query per phrase.
+    Pinecone is asked for TOP_K * 2 per phrase, like /search, so the merged ranking matches.
+    """
+    if not phrases:
+        return {}
+    if VECTOR_BACKEND != "local" and PINECONE_USE_INTEGRATED_EMBEDDING:
+        with stage("vector"):
+            return {phrases[i]: hits for i, hits in iter_fan_out(search_pinecone_by_text, phrases, TOP_K * 2, deadline_ms=None)}
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+    with stage("embed"):
+        embeddings = np.concatenate(
+            [embed_phrases(phrases[i : i + EMBED_BATCH_MAX]) for i in range(0, len(phrases), EMBED_BATCH_MAX)]
+        )
+    with stage("vector"):
+        if VECTOR_BACKEND == "local":
+            per_phrase = search_local_each(
+                dataset.local_ids, dataset.local_embeddings, embeddings, n_results=TOP_K, ann=dataset.ann
+            )
+            return dict(zip(phrases, per_phrase))
+        vectors = [e.tolist() for e in embeddings]
+        return {phrases[i]: hits for i, hits in iter_fan_out(search_pinecone, vectors, TOP_K * 2, deadline_ms=None)}
@@ -0,0 +1,183 @@
+"""
+In-process latency and counter metrics, exported in the Prometheus text format.
+
+Counter and Histogram are thread-safe and keyed by label values. stage(name) times one
+step of a request: it feeds the search_stage_seconds histogram and, while a request is being
+served (main's middleware calls start_request()), the per-request timings that become
+the Server-Timing header. Gauges that already live elsewhere (cache stats, profile
+counts) are read at scrape time through register_collector() instead of being copied;
+samples named *_total are exported as counters, the rest as gauges.
+
+Each uvicorn worker keeps its own numbers; scrape every worker or run one.
+"""
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator
+
+# Seconds; covers cache hits (sub-millisecond) up to slow LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: list["_Metric"] = []
+_collectors: list[Callable[[], Iterable[tuple[str, str, dict, float]]]] = []
+# Stage durations (name, seconds) for the request in progress, or None outside a request
+_request_timings: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_timings", default=None)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _label_str(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{self._label_str(key)} {_num(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {}  # key -> [per-bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            values = {k: list(v) for k, v in self._values.items()}
+        for key, entry in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = self._label_str(key, f'le="{_num(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = self._label_str(key, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {entry[-1]}"
+            yield f"{self.name}_sum{self._label_str(key)} {_num(entry[-2])}"
+            yield f"{self.name}_count{self._label_str(key)} {entry[-1]}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    value = float(value)
+    if math.isnan(value) or math.isinf(value):
+        return "NaN" if math.isnan(value) else ("+Inf" if value > 0 else "-Inf")
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+STAGE_SECONDS = Histogram("search_stage_seconds", "Time spent in each search stage", ("stage",))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "path", "status"))
+VECTOR_QUERY_SECONDS = Histogram("vector_query_seconds", "Latency of one phrase's vector query", ("backend",))
+VECTOR_QUERY_ERRORS = Counter("vector_query_errors_total", "Phrase vector queries that failed", ("backend", "reason"))
+RATE_LIMITED = Counter("upstream_rate_limited_total", "HTTP 429 responses from upstream APIs", ("upstream", "operation"))
+SEARCH_SHED = Counter("search_shed_total", "Search requests rejected with 503 because too many were in flight")
+SEARCH_DEGRADED = Counter("search_degraded_total", "Searches answered from the keyword index because an upstream was unavailable", ("upstream", "reason"))
+QUERY_EXPANSIONS = Counter("query_expansions_total", "Request-path query expansions by where the phrases came from", ("source",))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as search stage `name` (histogram + current request's Server-Timing)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def start_request() -> list:
+    """Begin collecting stage timings for the current request (context-local)."""
+    timings: list = []
+    _request_timings.set(timings)
+    return timings
+
+
+def request_timings() -> list | None:
+    """The current request's (stage, seconds) list, or None outside a request."""
+    return _request_timings.get()
+
+
+def server_timing(timings: list) -> str:
+    """Server-Timing header value; repeated stages are summed, in first-seen order."""
+    totals: dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+def register_collector(fn: Callable[[], Iterable[tuple[str, str, dict, float]]]) -> None:
+    """fn() yields (name, help, labels, value) samples, read on every scrape (None values are skipped)."""
+    _collectors.append(fn)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines: list[str] = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    collected: dict[str, tuple[str, list[str]]] = {}
+    for collect in _collectors:
+        for name, help, labels, value in collect():
+            if value is None:
+                continue
+            label_str = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            sample = f"{name}{{{label_str}}} {_num(value)}" if label_str else f"{name} {_num(value)}"
+            collected.setdefault(name, (help, []))[1].append(sample)
+    for name, (help, samples) in collected.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -6,86 +6,126 @@ Supports two modes (see config PINECONE_USE_INTEGRATED_EMBEDDING):
   query by text; Pinecone embeds with the index model (e.g. llama-text-embed-v2).
 - Vector mode: we embed with OpenAI (1536 dim), upsert vectors, query by vector.
   Index must be created without integrated embedding, dimension 1536, metric cosine.
+
+Records carry the facet values (company, location, skill; see facets.facet_metadata) as
+metadata, so searches can pass a Pinecone metadata filter (filter=) to restrict matches.
 """
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import partial
+from typing import Any, Callable, Iterator
 
-from pinecone import Pinecone
-from pinecone.exceptions import PineconeApiException
-
+from clients import get_index
 from config import (
-    PINECONE_API_KEY,
-    PINECONE_INDEX_NAME,
-    PINECONE_INDEX_HOST,
     PINECONE_NAMESPACE,
     PINECONE_TEXT_FIELD,
-    PINECONE_UPSERT_BATCH_DELAY,
+    PINECONE_EMBED_TPM,
+    PINECONE_UPSERT_CONCURRENCY,
+    PINECONE_UPSERT_BATCH_TOKENS,
+    SEARCH_FANOUT_WORKERS,
+    SEARCH_DEADLINE_MS,
+    SEARCH_HARD_DEADLINE_MS,
 )
+from metrics import RATE_LIMITED, VECTOR_QUERY_ERRORS, VECTOR_QUERY_SECONDS
+from rate_limit import TokenBucket, estimate_tokens, is_rate_limited, run_batches, token_batches
+from resilience import PINECONE
 
-
-def get_index():
-    """Return Pinecone index. Use host if set (required for some integrated-embedding indexes)."""
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    if PINECONE_INDEX_HOST:
-        return pc.Index(host=PINECONE_INDEX_HOST)
-    return pc.Index(PINECONE_INDEX_NAME)
+# Shared by all integrated-embedding upserts in this process (Pinecone meters embedding tokens/min)
+_embed_limiter = TokenBucket(PINECONE_EMBED_TPM)
+# Per-phrase search queries run here concurrently (bounded; shared by all requests)
+_query_pool = ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="pinecone-query")
 
 
 def add_to_pinecone(
     ids: list[str],
     embeddings: list[list[float]],
+    on_batch: Callable[[list[str]], None] | None = None,
+    metadata: list[dict] | None = None,
 ) -> None:
-    """Upsert vectors into Pinecone (vector mode: no integrated embedding)."""
+    """
+    Upsert vectors into Pinecone (vector mode: no integrated embedding), with optional metadata per vector.
+    on_batch(ids) is called after each batch is accepted (used to commit sync progress).
+    """
     index = get_index()
     vectors = [
-        {"id": pid, "values": emb}
-        for pid, emb in zip(ids, embeddings, strict=True)
+        {"id": pid, "values": emb, **({"metadata": meta} if meta else {})}
+        for pid, emb, meta in zip(ids, embeddings, metadata or [None] * len(ids), strict=True)
     ]
     batch_size = 100
-    for i in range(0, len(vectors), batch_size):
-        batch = vectors[i : i + batch_size]
-        index.upsert(vectors=batch, namespace=PINECONE_NAMESPACE)
+    batches = [vectors[i : i + batch_size] for i in range(0, len(vectors), batch_size)]
+    run_batches(
+        batches,
+        lambda batch: index.upsert(vectors=batch, namespace=PINECONE_NAMESPACE),
+        concurrency=PINECONE_UPSERT_CONCURRENCY,
+        on_done=(lambda batch, _: on_batch([v["id"] for v in batch])) if on_batch else None,
+        upstream="pinecone",
+    )
 
 
 def add_to_pinecone_text(
     ids: list[str],
     documents: list[str],
+    on_batch: Callable[[list[str]], None] | None = None,
+    metadata: list[dict] | None = None,
 ) -> None:
-    """Upsert records with text field for indexes with integrated embedding (Pinecone embeds)."""
+    """
+    Upsert records with text field for indexes with integrated embedding (Pinecone embeds).
+    metadata entries become extra record fields (only the text field is embedded).
+    on_batch(ids) is called after each batch is accepted (used to commit sync progress).
+    """
     index = get_index()
     records = [
-        {"_id": pid, PINECONE_TEXT_FIELD: doc}
-        for pid, doc in zip(ids, documents, strict=True)
+        {**(meta or {}), "_id": pid, PINECONE_TEXT_FIELD: doc}
+        for pid, doc, meta in zip(ids, documents, metadata or [None] * len(ids), strict=True)
     ]
-    # Stay under 250k tokens/min: use small batches (~24 docs) and delay between batches; retry on 429
-    batch_size = 24
-    max_retries = 5
-    retry_wait = 65  # seconds to wait for TPM window to reset
-    for i in range(0, len(records), batch_size):
-        if i > 0 and PINECONE_UPSERT_BATCH_DELAY > 0:
-            time.sleep(PINECONE_UPSERT_BATCH_DELAY)
-        batch = records[i : i + batch_size]
-        for attempt in range(max_retries):
-            try:
-                index.upsert_records(namespace=PINECONE_NAMESPACE, records=batch)
-                break
-            except PineconeApiException as e:
-                if e.status == 429 and attempt < max_retries - 1:
-                    time.sleep(retry_wait)
-                    continue
-                raise
+    # Batches are sized by estimated embedding tokens (max 96 records, the upsert_records limit) and
+    # paid for from the shared TPM bucket; several run concurrently and 429s slow the bucket down.
+    costs = [estimate_tokens(doc) for doc in documents]
+    batches = [
+        [records[i] for i in idx]
+        for idx in token_batches(costs, lambda c: c, PINECONE_UPSERT_BATCH_TOKENS, 96)
+    ]
+    run_batches(
+        batches,
+        lambda batch: index.upsert_records(namespace=PINECONE_NAMESPACE, records=batch),
+        limiter=_embed_limiter,
+        cost=lambda batch: sum(estimate_tokens(r[PINECONE_TEXT_FIELD]) for r in batch),
+        concurrency=PINECONE_UPSERT_CONCURRENCY,
+        on_done=(lambda batch, _: on_batch([r["_id"] for r in batch])) if on_batch else None,
+        upstream="pinecone",
+    )
+
+
+def delete_from_pinecone(
+    ids: list[str],
+    on_batch: Callable[[list[str]], None] | None = None,
+) -> None:
+    """Delete records by id from the namespace (batches of 1000, the API limit)."""
+    if not ids:
+        return
+    index = get_index()
+    batch_size = 1000
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i : i + batch_size]
+        index.delete(ids=batch, namespace=PINECONE_NAMESPACE)
+        if on_batch:
+            on_batch(batch)
 
 
 def search_pinecone(
     query_embedding: list[float],
     n_results: int = 20,
+    filter: dict | None = None,
 ) -> list[tuple[str, float]]:
-    """Query Pinecone by vector. Returns list of (profile_id, score). Cosine score in [0,1]."""
+    """Query Pinecone by vector, optionally with a metadata filter. Returns list of (profile_id, score). Cosine score in [0,1]."""
     index = get_index()
     res = index.query(
         vector=query_embedding,
         top_k=n_results,
         namespace=PINECONE_NAMESPACE,
         include_metadata=False,
+        **({"filter": filter} if filter else {}),
     )
     out = []
     for match in (res.matches or []):
@@ -98,13 +138,14 @@ def search_pinecone(
 def search_pinecone_by_text(
     query_text: str,
     n_results: int = 20,
+    filter: dict | None = None,
 ) -> list[tuple[str, float]]:
-    """Query by text (integrated-embedding indexes). Returns list of (profile_id, score)."""
+    """Query by text (integrated-embedding indexes), optionally with a metadata filter. Returns list of (profile_id, score)."""
     index = get_index()
-    res = index.search(
-        namespace=PINECONE_NAMESPACE,
-        query={"inputs": {"text": query_text}, "top_k": n_results},
-    )
+    query = {"inputs": {"text": query_text}, "top_k": n_results}
+    if filter:
+        query["filter"] = filter
+    res = index.search(namespace=PINECONE_NAMESPACE, query=query)
     out = []
     # Support both 2025 search_records shape (result.hits with _id/_score) and legacy (matches with id/score)
     hits = getattr(getattr(res, "result", res), "hits", None) or getattr(res, "hits", None) or getattr(res, "matches", []) or []
@@ -116,35 +157,173 @@ def search_pinecone_by_text(
     return out
 
 
+def _timed_query(query_fn: Callable[[Any, int], list[tuple[str, float]]], query: Any, n_results: int):
+    """query_fn(query, n_results), recorded in the per-phrase latency histogram and error counters."""
+    start = time.perf_counter()
+    try:
+        return query_fn(query, n_results)
+    except Exception as e:
+        limited = is_rate_limited(e)
+        if limited:
+            RATE_LIMITED.inc(upstream="pinecone", operation="query")
+        VECTOR_QUERY_ERRORS.inc(backend="pinecone", reason="rate_limited" if limited else type(e).__name__)
+        raise
+    finally:
+        VECTOR_QUERY_SECONDS.observe(time.perf_counter() - start, backend="pinecone")
+
+
+def iter_fan_out(
+    query_fn: Callable[[Any, int], list[tuple[str, float]]],
+    queries: list[Any],
+    n_results: int,
+    deadline_ms: float | None = SEARCH_DEADLINE_MS,
+    hard_deadline_ms: float = SEARCH_HARD_DEADLINE_MS,
+    outcome: dict | None = None,
+) -> Iterator[tuple[int, list[tuple[str, float]]]]:
+    """
+    Run query_fn(query, n_results) for every query concurrently and yield (query_index, hits)
+    as each finishes. Queries still running at the deadline are dropped, unless none has
+    finished yet, in which case the first to finish is awaited until hard_deadline_ms
+    (deadline_ms=None waits for all, however long). A failing query is skipped; if every
+    query fails, the first error is raised. An outcome dict, if given, gets the number of
+    queries "dropped" at the deadline and "failed", so callers can tell a partial result
+    (and e.g. not cache it).
+
+    The whole fan-out is one call through resilience.PINECONE: it needs a bulkhead slot and a
+    closed circuit (else UpstreamUnavailable), and counts as failed when no query answers.
+    The outcome is recorded on the circuit before the first result is yielded, and the slot
+    is held while the queries run, not while the caller consumes the results (a slow
+    /search/stream client does not keep it).
+    """
+    PINECONE.breaker.allow()
+    results = _fan_out(query_fn, queries, n_results, deadline_ms, hard_deadline_ms, outcome if outcome is not None else {})
+    try:
+        with PINECONE.breaker.record():
+            # No result without a raise means there were no queries; one result means success
+            first = next(results, None)
+        if first is None:
+            return
+        yield first
+        yield from results
+    finally:
+        results.close()
+
+
+def is_partial(outcome: dict) -> bool:
+    """True when an iter_fan_out outcome had queries dropped or failing."""
+    return bool(outcome.get("dropped") or outcome.get("failed"))
+
+
+def _fan_out(
+    query_fn: Callable[[Any, int], list[tuple[str, float]]],
+    queries: list[Any],
+    n_results: int,
+    deadline_ms: float | None,
+    hard_deadline_ms: float,
+    outcome: dict,
+) -> Iterator[tuple[int, list[tuple[str, float]]]]:
+    start = time.monotonic()
+    deadline = None if deadline_ms is None else start + deadline_ms / 1000.0
+    hard_deadline = None if deadline_ms is None else start + max(hard_deadline_ms, deadline_ms) / 1000.0
+    PINECONE.bulkhead.acquire()
+    try:
+        pending = {_query_pool.submit(_timed_query, query_fn, q, n_results): i for i, q in enumerate(queries)}
+    except BaseException:
+        PINECONE.bulkhead.release()
+        raise
+    _when_all_done(list(pending), PINECONE.bulkhead.release)
+    done_any = False
+    first_error: BaseException | None = None
+    outcome.update(dropped=0, failed=0)
+    try:
+        while pending:
+            now = time.monotonic()
+            remaining = None if deadline is None else deadline - now
+            if remaining is not None and remaining <= 0 and done_any:
+                VECTOR_QUERY_ERRORS.inc(len(pending), backend="pinecone", reason="deadline")
+                outcome["dropped"] = len(pending)
+                break
+            if hard_deadline is not None and now >= hard_deadline:
+                VECTOR_QUERY_ERRORS.inc(len(pending), backend="pinecone", reason="hard_deadline")
+                raise TimeoutError(f"No Pinecone query answered within {hard_deadline_ms:.0f} ms")
+            if done_any and remaining is not None:
+                timeout = max(remaining, 0)
+            else:
+                timeout = None if hard_deadline is None else hard_deadline - now
+            finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = pending.pop(future)
+                try:
+                    hits = future.result()
+                except Exception as e:
+                    first_error = first_error or e
+                    outcome["failed"] += 1
+                    continue
+                done_any = True
+                yield i, hits
+        if not done_any and first_error is not None:
+            raise first_error
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _when_all_done(futures: list[Future], callback: Callable[[], None]) -> None:
+    """Call callback once every future has finished or been cancelled (at once if there are none)."""
+    if not futures:
+        callback()
+        return
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_: Future) -> None:
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def merge_max(best_score: dict[str, float], hits: list[tuple[str, float]]) -> None:
+    """Fold one phrase's hits into the running max-score pool."""
+    for pid, score in hits:
+        if pid not in best_score or score > best_score[pid]:
+            best_score[pid] = score
+
+
+def top_hits(best_score: dict[str, float], n_results: int) -> list[tuple[str, float]]:
+    sorted_ids = sorted(best_score.keys(), key=lambda x: best_score[x], reverse=True)[:n_results]
+    return [(pid, best_score[pid]) for pid in sorted_ids]
+
+
 def search_pinecone_multi(
     query_embeddings: list[list[float]],
     n_results: int = 20,
+    filter: dict | None = None,
+    outcome: dict | None = None,
 ) -> list[tuple[str, float]]:
-    """Run a query per embedding, merge by id (max score), return top n_results."""
+    """Run a query per embedding concurrently, merge by id (max score), return top n_results (outcome: see iter_fan_out)."""
     if not query_embeddings:
         return []
     best_score: dict[str, float] = {}
-    for qemb in query_embeddings:
-        hits = search_pinecone(qemb, n_results=n_results * 2)
-        for pid, score in hits:
-            if pid not in best_score or score > best_score[pid]:
-                best_score[pid] = score
-    sorted_ids = sorted(best_score.keys(), key=lambda x: best_score[x], reverse=True)[:n_results]
-    return [(pid, best_score[pid]) for pid in sorted_ids]
+    for _, hits in iter_fan_out(partial(search_pinecone, filter=filter), query_embeddings, n_results * 2, outcome=outcome):
+        merge_max(best_score, hits)
+    return top_hits(best_score, n_results)
 
 
 def search_pinecone_multi_text(
     query_texts: list[str],
     n_results: int = 20,
+    filter: dict | None = None,
+    outcome: dict | None = None,
 ) -> list[tuple[str, float]]:
-    """Run a query per text (integrated embedding), merge by id (max score), return top n_results."""
+    """Run a query per text (integrated embedding) concurrently, merge by id (max score), return top n_results (outcome: see iter_fan_out)."""
     if not query_texts:
         return []
     best_score: dict[str, float] = {}
-    for qtext in query_texts:
-        hits = search_pinecone_by_text(qtext, n_results=n_results * 2)
-        for pid, score in hits:
-            if pid not in best_score or score > best_score[pid]:
-                best_score[pid] = score
-    sorted_ids = sorted(best_score.keys(), key=lambda x: best_score[x], reverse=True)[:n_results]
-    return [(pid, best_score[pid]) for pid in sorted_ids]
+    for _, hits in iter_fan_out(partial(search_pinecone_by_text, filter=filter), query_texts, n_results * 2, outcome=outcome):
+        merge_max(best_score, hits)
+    return top_hits(best_score, n_results)
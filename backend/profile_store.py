@@ -0,0 +1,299 @@
+"""
+Profile + card store shared by all uvicorn workers.
+
+build_store() writes the (capped, slimmed) profiles and their precomputed /alumni cards
+into one binary file; ProfileStore mmaps it read-only, so every worker shares the same
+page-cached bytes and startup is near-instant. Records are looked up by id with a
+binary search over a sorted id table and decoded one at a time on demand.
+
+Layout: b"FCSTORE1", uint64 meta length, JSON meta (count, etag, source signature,
+section offsets), then 8-byte aligned sections:
+  sorted_ids   (m,) unique ids, fixed-width bytes, ascending
+  sorted_rows  (m,) int64, row of each sorted id (last row wins for duplicate ids)
+  prof_offsets (n+1,) uint64 into profiles blob
+  card_offsets (n+1,) uint64 into cards blob; cards are stored comma-joined so any
+               row range is directly a JSON array body
+  profiles     JSON-encoded slim profiles
+  alumni_body  the complete /alumni response, {"alumni":[<cards>]}; served as a
+               zero-copy view of the map, so workers share it instead of each copying it
+  cards        JSON-encoded SourcedAlumni cards (relevanceScore 1.0); lies inside
+               alumni_body (the last card's separator slot holds the closing "]")
+  <index>.<name>  tables of the prebuilt facet and keyword indexes (dataset.index_tables):
+               numpy arrays stored raw and mapped in place, string lists as JSON arrays;
+               meta["tables"] gives each table's dtype (or "json")
+
+MemoryProfileStore offers the same interface over a list of profiles (no store file).
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping
+
+import numpy as np
+
+from jsonutil import dumps, loads
+from search import profile_to_sourced
+
+MAGIC = b"FCSTORE1"
+_ALUMNI_PREFIX = b'{"alumni":['
+_ALUMNI_SUFFIX = b"]}"
+
+
+def profile_id(profile: dict, row: int) -> str:
+    """Id used for lookups (same scheme as the vector indexes)."""
+    return str(profile.get("id") or row)
+
+
+def source_signature(data_path: str, max_profiles: int) -> dict:
+    st = os.stat(data_path)
+    return {"path": os.path.abspath(data_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "max_profiles": max_profiles}
+
+
+class MemoryProfileStore:
+    """In-process store built from loaded profiles."""
+
+    def __init__(self, profiles: list[dict]):
+        self._profiles = profiles
+        self._by_id = {profile_id(p, i): i for i, p in enumerate(profiles)}
+        self._cards = [dumps(profile_to_sourced(p, 1.0)) for p in profiles]
+        self.etag = hashlib.sha1(b",".join(self._cards)).hexdigest()[:16]
+        self._body = _ALUMNI_PREFIX + b",".join(self._cards) + _ALUMNI_SUFFIX
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def row_of(self, pid: str) -> int | None:
+        return self._by_id.get(pid)
+
+    def get(self, pid: str) -> dict | None:
+        row = self._by_id.get(pid)
+        return self._profiles[row] if row is not None else None
+
+    def profiles(self) -> Iterator[dict]:
+        return iter(self._profiles)
+
+    def cards_json(self, start: int = 0, end: int | None = None) -> bytes:
+        """Comma-joined card JSON for rows [start, end)."""
+        return b",".join(self._cards[start:end])
+
+    def cards_json_rows(self, rows: Iterable[int]) -> bytes:
+        """Comma-joined card JSON for the given rows, in order."""
+        return b",".join(self._cards[r] for r in rows)
+
+    def alumni_body(self) -> bytes:
+        """The full /alumni response body."""
+        return self._body
+
+    def close(self) -> None:
+        """Nothing to release; matches ProfileStore.close()."""
+
+
+class ProfileStore:
+    """Read-only mmap view of a store file written by build_store()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:8] != MAGIC:
+            raise ValueError(f"{path} is not a profile store")
+        (meta_len,) = struct.unpack_from("<Q", self._mm, 8)
+        self.meta = json.loads(self._mm[16 : 16 + meta_len])
+        self.etag = self.meta["etag"]
+        n = self._n = self.meta["count"]
+        width = self.meta["id_width"]
+        sec = self.meta["sections"]
+
+        def view(name, dtype):
+            return np.frombuffer(self._mm, dtype=dtype, count=sec[name][1] // np.dtype(dtype).itemsize, offset=sec[name][0])
+
+        self._sorted_ids = view("sorted_ids", f"S{width}")
+        self._sorted_rows = view("sorted_rows", np.int64)
+        self._prof_offsets = view("prof_offsets", np.uint64)
+        self._card_offsets = view("card_offsets", np.uint64)
+        self._profiles_base = sec["profiles"][0]
+        self._cards_base = sec["cards"][0]
+        self._body_span = sec.get("alumni_body")
+        self._tables = self.meta.get("tables", {})
+
+    def __len__(self) -> int:
+        return self._n
+
+    def row_of(self, pid: str) -> int | None:
+        key = pid.encode("utf-8")
+        if not len(self._sorted_ids) or len(key) > self._sorted_ids.dtype.itemsize:
+            return None
+        i = int(np.searchsorted(self._sorted_ids, key))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == key:
+            return int(self._sorted_rows[i])
+        return None
+
+    def profile_at(self, row: int) -> dict:
+        a, b = int(self._prof_offsets[row]), int(self._prof_offsets[row + 1])
+        return loads(self._mm[self._profiles_base + a : self._profiles_base + b])
+
+    def get(self, pid: str) -> dict | None:
+        row = self.row_of(pid)
+        return self.profile_at(row) if row is not None else None
+
+    def profiles(self) -> Iterator[dict]:
+        return (self.profile_at(i) for i in range(self._n))
+
+    def cards_json(self, start: int = 0, end: int | None = None) -> bytes:
+        """Comma-joined card JSON for rows [start, end): one contiguous slice of the file."""
+        end = self._n if end is None else min(end, self._n)
+        if start >= end:
+            return b""
+        a = int(self._card_offsets[start])
+        b = int(self._card_offsets[end]) - 1  # drop the separator after the last card
+        return self._mm[self._cards_base + a : self._cards_base + b]
+
+    def cards_json_rows(self, rows: Iterable[int]) -> bytes:
+        """Comma-joined card JSON for the given rows, in order (one slice per card, no decoding)."""
+        base, offsets = self._cards_base, self._card_offsets
+        return b",".join(self._mm[base + int(offsets[r]) : base + int(offsets[r + 1]) - 1] for r in rows)
+
+    def alumni_body(self) -> memoryview | bytes:
+        """The full /alumni response body: a read-only view of the map (no copy per worker)."""
+        if self._body_span is None:  # store written before the body section existed
+            return _ALUMNI_PREFIX + self.cards_json() + _ALUMNI_SUFFIX
+        offset, length = self._body_span
+        return memoryview(self._mm)[offset : offset + length]
+
+    def has_table(self, name: str) -> bool:
+        return name in self._tables
+
+    def table(self, name: str) -> np.ndarray | list | None:
+        """A table written with build_store(tables=...): a read-only view of the map, or a decoded list."""
+        kind = self._tables.get(name)
+        if kind is None:
+            return None
+        offset, length = self.meta["sections"][name]
+        if kind == "json":
+            return loads(self._mm[offset : offset + length])
+        dtype = np.dtype(kind)
+        return np.frombuffer(self._mm, dtype=dtype, count=length // dtype.itemsize, offset=offset)
+
+    def tables(self, prefix: str) -> dict[str, np.ndarray | list]:
+        """Every table named "<prefix>.<name>", keyed by name."""
+        start = prefix + "."
+        return {name[len(start) :]: self.table(name) for name in self._tables if name.startswith(start)}
+
+    def is_current(self, data_path: str, max_profiles: int) -> bool:
+        """True if the store was built from this data file (same size/mtime) and cap."""
+        try:
+            return self.meta.get("source") == source_signature(data_path, max_profiles)
+        except OSError:
+            return False
+
+    def close(self) -> None:
+        # numpy views hold buffer exports; drop them before closing the map
+        self._sorted_ids = self._sorted_rows = self._prof_offsets = self._card_offsets = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # a caller still holds a view; the map is released when it is collected
+        self._file.close()
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def build_store(
+    profiles: list[dict], path: str, source: dict | None = None, tables: Mapping[str, np.ndarray | list] | None = None
+) -> None:
+    """Write profiles, their cards and any extra tables (name -> array or list of strings) to a store file (atomic replace)."""
+    ids = [profile_id(p, i).encode("utf-8") for i, p in enumerate(profiles)]
+    n = len(profiles)
+    width = max((len(i) for i in ids), default=1) or 1
+    # Duplicate ids resolve to the last occurrence, like a dict built over the rows
+    last_row = {pid: row for row, pid in enumerate(ids)}
+    sorted_keys = sorted(last_row)
+    sorted_ids = np.array(sorted_keys, dtype=f"S{width}")
+    sorted_rows = np.array([last_row[k] for k in sorted_keys], dtype=np.int64)
+
+    prof_blobs = [dumps(p) for p in profiles]
+    card_blobs = [dumps(profile_to_sourced(p, 1.0)) for p in profiles]
+    prof_offsets = np.zeros(n + 1, dtype=np.uint64)
+    prof_offsets[1:] = np.cumsum([len(b) for b in prof_blobs], dtype=np.uint64)
+    card_offsets = np.zeros(n + 1, dtype=np.uint64)
+    card_offsets[1:] = np.cumsum([len(b) + 1 for b in card_blobs], dtype=np.uint64)
+    cards = b",".join(card_blobs) + b","  # trailing separator keeps every card's slot len+1
+    # The /alumni body wraps the cards; the last separator slot becomes its closing "]"
+    body = _ALUMNI_PREFIX + cards[:-1] + _ALUMNI_SUFFIX
+
+    sections = [
+        ("sorted_ids", sorted_ids.tobytes()),
+        ("sorted_rows", sorted_rows.tobytes()),
+        ("prof_offsets", prof_offsets.tobytes()),
+        ("card_offsets", card_offsets.tobytes()),
+        ("profiles", b"".join(prof_blobs)),
+        ("alumni_body", body),
+    ]
+    table_kinds = {}
+    for name, value in (tables or {}).items():
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            table_kinds[name] = value.dtype.str
+            sections.append((name, value.tobytes()))
+        else:
+            table_kinds[name] = "json"
+            sections.append((name, dumps(list(value))))
+    meta = {
+        "count": n,
+        "id_width": width,
+        "etag": hashlib.sha1(cards[:-1]).hexdigest()[:16],
+        "source": source,
+        "sections": {},
+        "tables": table_kinds,
+    }
+    # Section offsets depend on the meta length, which depends on the offsets: pad the meta to a fixed size
+    meta_len = 4096 + 96 * (len(sections) + 1)
+    offset = _align(16 + meta_len)
+    for name, blob in sections:
+        meta["sections"][name] = [offset, len(blob)]
+        offset = _align(offset + len(blob))
+    meta["sections"]["cards"] = [meta["sections"]["alumni_body"][0] + len(_ALUMNI_PREFIX), len(cards)]
+    meta_bytes = json.dumps(meta).encode("utf-8")
+    if len(meta_bytes) > meta_len:
+        raise ValueError("Profile store metadata too large")
+
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", meta_len))
+        f.write(meta_bytes.ljust(meta_len, b" "))
+        for name, blob in sections:
+            f.seek(meta["sections"][name][0])
+            f.write(blob)
+        f.truncate(offset)
+    tmp.replace(path)
+
+
+def main() -> int:
+    from config import DATA_PATH, MAX_INDEX_PROFILES, PROFILE_STORE_PATH
+    from dataset import index_tables
+    from indexer import load_profiles
+
+    if not PROFILE_STORE_PATH:
+        print("Error: set PROFILE_STORE_PATH to the store file to write.", file=sys.stderr)
+        return 1
+    print(f"Loading up to {MAX_INDEX_PROFILES} profiles from {DATA_PATH}...")
+    profiles = load_profiles(DATA_PATH, limit=MAX_INDEX_PROFILES, slim=True)
+    build_store(
+        profiles,
+        PROFILE_STORE_PATH,
+        source=source_signature(DATA_PATH, MAX_INDEX_PROFILES),
+        tables=index_tables(profiles),
+    )
+    print(f"Done. Wrote {len(profiles)} profiles to {PROFILE_STORE_PATH} ({os.path.getsize(PROFILE_STORE_PATH)} bytes).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
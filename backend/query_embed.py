@@ -0,0 +1,186 @@
+"""
+Embed expanded query phrases for vector search, with a phrase -> vector cache.
+
+The phrase vocabulary is small and repetitive ("resume", "career advice"), so vectors
+are kept in an LRU as float32 arrays and only unseen phrases go to the embeddings API.
+With PHRASE_CACHE_PATH set the cache is saved as .npz on shutdown and reloaded at startup.
+
+Misses go through EmbeddingBatcher: a dispatcher thread collects the phrases of all
+requests that miss within a few milliseconds, dedupes them and makes one embeddings call,
+then hands each request its own vectors. Under load this turns many 3-5 phrase calls
+into a few large ones. Each API call (not each waiting request) goes through
+resilience.OPENAI (bulkhead + circuit breaker): one failed batch counts as one failure, and
+every request in it gets the UpstreamUnavailable. With the circuit open, misses fail fast
+without joining a batch.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from cache import LRUCache
+from clients import get_openai
+from resilience import OPENAI, UpstreamUnavailable
+from config import (
+    EMBEDDING_MODEL,
+    PHRASE_CACHE_SIZE,
+    PHRASE_CACHE_PATH,
+    EMBED_BATCH_WINDOW_MS,
+    EMBED_BATCH_MAX,
+    OPENAI_EMBED_CONCURRENCY,
+)
+
+_cache = LRUCache(PHRASE_CACHE_SIZE, name="phrase_embedding")
+
+
+def _create_embeddings(phrases: list[str], model: str) -> list[np.ndarray]:
+    resp = get_openai().embeddings.create(input=phrases, model=model)
+    return [np.asarray(e.embedding, dtype=np.float32) for e in resp.data]
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent embedding requests into batched API calls (window_ms <= 0: call directly)."""
+
+    def __init__(self, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_BATCH_MAX, concurrency: int = OPENAI_EMBED_CONCURRENCY):
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.concurrency = max(1, concurrency)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.api_calls = 0
+        self.phrases_sent = 0
+
+    def embed(self, phrases: list[str], model: str) -> list[np.ndarray]:
+        """Vectors for phrases (in order); blocks until the batch containing them returns."""
+        if self.window <= 0:
+            with self._lock:
+                self.requests += 1
+                self.api_calls += 1
+                self.phrases_sent += len(phrases)
+            with OPENAI.call():
+                return _create_embeddings(phrases, model)
+        self._start()
+        future: Future = Future()
+        self._queue.put((phrases, model, future))
+        return future.result()
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                # API calls run on a small pool so the collector keeps gathering the next batch meanwhile
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed-batch")
+                self._thread = threading.Thread(target=self._collect, name="embed-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            by_model: dict[str, list] = {}
+            for item in batch:
+                by_model.setdefault(item[1], []).append(item)
+            for model, items in by_model.items():
+                self._pool.submit(self._send, model, items)
+
+    def _send(self, model: str, items: list) -> None:
+        unique = list(dict.fromkeys(p for phrases, _, _ in items for p in phrases))
+        try:
+            with OPENAI.call():
+                vectors = dict(zip(unique, _create_embeddings(unique, model)))
+        except Exception as e:
+            for _, _, future in items:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.requests += len(items)
+            self.api_calls += 1
+            self.phrases_sent += len(unique)
+        for phrases, _, future in items:
+            future.set_result([vectors[p] for p in phrases])
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "api_calls": self.api_calls,
+            "phrases_sent": self.phrases_sent,
+            "window_ms": self.window * 1000,
+        }
+
+
+_batcher = EmbeddingBatcher()
+
+
+def _key(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+def embed_phrases(phrases: list[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """Return (len(phrases), dim) float32 embeddings; only cache misses are sent to OpenAI."""
+    vectors: list[np.ndarray | None] = [_cache.get((model, _key(p))) for p in phrases]
+    missing = list(dict.fromkeys(phrases[i] for i, v in enumerate(vectors) if v is None))
+    if missing:
+        fresh = {}
+        if OPENAI.breaker.is_open():
+            raise UpstreamUnavailable("openai", "circuit_open")
+        embedded = _batcher.embed(missing, model)
+        for phrase, vec in zip(missing, embedded):
+            _cache.set((model, _key(phrase)), vec)
+            fresh[phrase] = vec
+        vectors = [v if v is not None else fresh[p] for p, v in zip(phrases, vectors)]
+    return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+
+def load_cache(path: str = PHRASE_CACHE_PATH) -> int:
+    """Load a saved cache (entries for other models are kept; keys include the model)."""
+    if not path or not Path(path).exists():
+        return 0
+    with np.load(path, allow_pickle=False) as data:
+        for model, phrase, vec, created in zip(data["models"], data["phrases"], data["vectors"], data["created"]):
+            _cache.set((str(model), str(phrase)), np.array(vec, dtype=np.float32), created=float(created))
+    return len(_cache)
+
+
+def save_cache(path: str = PHRASE_CACHE_PATH) -> None:
+    """Write the cache to path as .npz: model/phrase keys plus one float32 vector matrix."""
+    if not path:
+        return
+    entries = [(k, v, created) for k, v, created in _cache.items()]
+    if not entries:
+        return
+    dims = {v.shape[0] for _, v, _ in entries}
+    if len(dims) > 1:
+        # Mixed models with different dims: keep the most common dim only
+        common = max(dims, key=lambda d: sum(v.shape[0] == d for _, v, _ in entries))
+        entries = [e for e in entries if e[1].shape[0] == common]
+    tmp = Path(path).with_suffix(".tmp.npz")
+    np.savez(
+        tmp,
+        models=np.array([k[0] for k, _, _ in entries]),
+        phrases=np.array([k[1] for k, _, _ in entries]),
+        vectors=np.stack([v for _, v, _ in entries]).astype(np.float32),
+        created=np.array([c for _, _, c in entries], dtype=np.float64),
+    )
+    tmp.replace(path)
+
+
+def cache_stats() -> dict:
+    return {**_cache.stats(), "batching": _batcher.stats()}
@@ -2,10 +2,56 @@
 Refactor a help-seeking query into 3–5 short search phrases for vector retrieval.
 User is asking for help (e.g. resume, company, role); we derive phrases to find
 relevant alumni who can help (companies, topics, roles, skills).
+
+Expansions are cached by normalized query (bounded LRU with TTL), optionally persisted
+to a JSON-lines file so repeated questions skip the LLM even across restarts. The file
+is compacted (deduplicated, expired entries dropped) once it outgrows the cache.
+expand_queries() handles many queries at once, sending EXPANSION_BATCH_SIZE of them per
+LLM call as a JSON object and caching each expansion exactly like expand_query() does.
+If a batched call fails, its queries are expanded singly, and locally when that fails too.
+
+The request path uses expand_within_budget(): it waits at most EXPANSION_BUDGET_MS for
+the LLM and otherwise answers with local_expand(), a deterministic extractor that
+matches the query against the company / title / skill vocabulary of the loaded profiles.
+The LLM call keeps running in the background and caches its answer for the next time.
+EXPANSION_MODE=auto expands short phrase-like queries locally without asking the LLM.
 """
-from openai import OpenAI
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import Collection, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads within one process are still serialized
+    fcntl = None
 
-from config import OPENAI_API_KEY
+from cache import LRUCache
+from clients import get_openai
+from config import (
+    OPENAI_API_KEY,
+    EXPANSION_MODEL,
+    EXPANSION_CACHE_SIZE,
+    EXPANSION_CACHE_TTL_SECONDS,
+    EXPANSION_CACHE_PATH,
+    EXPANSION_BATCH_SIZE,
+    EXPANSION_BUDGET_MS,
+    EXPANSION_TIMEOUT_SECONDS,
+    EXPANSION_LLM_WORKERS,
+    EXPANSION_LLM_MAX_PENDING,
+    EXPANSION_MODE,
+    EXPANSION_SHORT_QUERY_WORDS,
+)
+from keyword_index import tokenize
+from metrics import QUERY_EXPANSIONS
+from resilience import OPENAI, UpstreamUnavailable
 
 SYSTEM = """You are a query refiner for an alumni help-matching system. The user is asking for HELP (e.g. resume advice, job at a company, career in an industry). Your job is to output 3 to 5 short SEARCH PHRASES that will find relevant alumni profiles in a vector database. Each phrase should be 1–4 words.
 
@@ -23,22 +69,355 @@ software engineering
 career advice"""
 
 
+# Same rules, several requests per call. Batch results share the single-query cache keys.
+BATCH_SYSTEM = SYSTEM.split("Output ONLY")[0] + """The user message is a JSON object mapping request ids to help requests. Return ONLY a JSON object mapping every request id to an array of its 3 to 5 phrases, e.g. {"1": ["Microsoft company", "resume", "software engineering"]}."""
+# LLM calls in flight at once for one expand_queries() call
+_BATCH_CONCURRENCY = 4
+
+# Changing the model or prompt changes the key prefix, so stale persisted expansions are ignored
+_KEY_PREFIX = hashlib.sha256(f"{EXPANSION_MODEL}\0{SYSTEM}".encode("utf-8")).hexdigest()[:12]
+_cache = LRUCache(EXPANSION_CACHE_SIZE, ttl=EXPANSION_CACHE_TTL_SECONDS, name="expansion")
+# Appends and compaction of EXPANSION_CACHE_PATH hold _file_lock plus an flock on <path>.lock,
+# since every worker appends to the same file. Once this process has counted more than twice
+# EXPANSION_CACHE_SIZE lines in it, the file is compacted.
+_file_lock = threading.Lock()
+_file_lines = 0
+
+# Budgeted LLM calls run here so a request can stop waiting without cancelling the call;
+# a query already being expanded is not sent again. _inflight holds running and queued calls
+# and is capped at EXPANSION_LLM_MAX_PENDING, so a slow LLM cannot grow an unbounded backlog.
+_llm_pool = ThreadPoolExecutor(max_workers=EXPANSION_LLM_WORKERS, thread_name_prefix="expand")
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# Local expansion. Kinds of help, mapped to the phrases the LLM uses for them
+_HELP_PHRASES = {
+    "resume": "resume", "resumes": "resume", "cv": "resume",
+    "interview": "interview prep", "interviews": "interview prep", "interviewing": "interview prep",
+    "mentor": "mentoring", "mentors": "mentoring", "mentorship": "mentoring", "mentoring": "mentoring",
+    "career": "career advice", "careers": "career advice", "advice": "career advice",
+    "internship": "internship", "internships": "internship", "intern": "internship",
+    "networking": "networking", "referral": "referral", "referrals": "referral",
+    "salary": "salary negotiation", "negotiate": "salary negotiation", "negotiating": "salary negotiation",
+    "graduate": "graduate school", "grad": "graduate school", "phd": "graduate school", "masters": "graduate school",
+}
+# Words about the asking rather than about who could help
+_FILLER = frozenset(
+    "help helping need needs want wants looking look find get getting someone anyone anybody people person who works worked "
+    "can could would should will how what where which when why about into like work working job jobs role roles "
+    "position positions please talk speak chat know apply applying hoping trying any some more best good great "
+    "im i'm am do does did there here their them they".split()
+)
+# Words that make a query a question or sentence rather than a phrase (EXPANSION_MODE=auto)
+_SENTENCE_WORDS = frozenset("i i'm im me my we our how what who where which why can could should would need want looking help".split())
+_MAX_NGRAM = 6
+_MAX_RUN = 4
+
+
+def normalize_query(query: str) -> str:
+    """Cache key form of a query: NFKC, lowercase, collapsed whitespace, no edge punctuation."""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" \t\n.,;:!?\"'()[]")
+
+
+def load_cache(path: str = EXPANSION_CACHE_PATH) -> int:
+    """Replay the persisted expansions into the in-memory cache; returns entries loaded."""
+    global _file_lines
+    if not path or not Path(path).exists():
+        return 0
+    lines = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            lines += 1
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("k", "").startswith(_KEY_PREFIX + ":"):
+                _cache.set(entry["k"], entry["v"], created=entry.get("t"))
+    _file_lines = lines
+    if lines > 2 * max(len(_cache), 1):
+        _compact(path)
+    return len(_cache)
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    """Hold the file lock for path: this process's threads, and other workers sharing the file."""
+    with _file_lock, open(path + ".lock", "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _compact(path: str) -> None:
+    """
+    Rewrite the file with its live entries, newest per key and at most EXPANSION_CACHE_SIZE
+    of them. Reads the file rather than this process's cache, so entries appended by
+    other workers survive; the rewrite goes to a temp file renamed over the original.
+    """
+    global _file_lines
+    with _locked(path):
+        entries: dict[str, tuple[list[str], float]] = {}
+        cutoff = time.time() - EXPANSION_CACHE_TTL_SECONDS if EXPANSION_CACHE_TTL_SECONDS > 0 else None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    k, created = entry.get("k", ""), entry.get("t") or 0.0
+                    if not k.startswith(_KEY_PREFIX + ":") or (cutoff is not None and created < cutoff):
+                        continue
+                    if k not in entries or created >= entries[k][1]:
+                        entries[k] = (entry["v"], created)
+        except FileNotFoundError:
+            pass
+        keep = sorted(entries.items(), key=lambda e: e[1][1])[-EXPANSION_CACHE_SIZE:] if EXPANSION_CACHE_SIZE > 0 else []
+        tmp = Path(path + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for k, (v, created) in keep:
+                f.write(json.dumps({"k": k, "v": v, "t": created}) + "\n")
+        tmp.replace(path)
+        _file_lines = len(keep)
+
+
+def _persist(key: str, phrases: list[str]) -> None:
+    global _file_lines
+    if not EXPANSION_CACHE_PATH:
+        return
+    with _locked(EXPANSION_CACHE_PATH):
+        with open(EXPANSION_CACHE_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"k": key, "v": phrases, "t": time.time()}) + "\n")
+        _file_lines += 1
+        compact = _file_lines > 2 * max(EXPANSION_CACHE_SIZE, 1)
+    if compact:
+        _compact(EXPANSION_CACHE_PATH)
+
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+
 def expand_query(query: str) -> list[str]:
     """Refactor a help request into 3–5 short search phrases for RAG retrieval."""
     if not OPENAI_API_KEY or not query or not query.strip():
         return [query.strip()] if query and query.strip() else []
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": SYSTEM},
-            {"role": "user", "content": query.strip()},
-        ],
-        max_tokens=150,
-    )
+    key = f"{_KEY_PREFIX}:{normalize_query(query)}"
+    cached = _cache.get(key)
+    if cached is not None:
+        return list(cached)
+    return _expand_llm(query, key)
+
+
+def _expand_llm(query: str, key: str) -> list[str]:
+    # Checked when the call actually starts: a queued call must not go out after the circuit opened
+    OPENAI.breaker.allow()
+    with OPENAI.breaker.record():
+        resp = get_openai().chat.completions.create(
+            model=EXPANSION_MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM},
+                {"role": "user", "content": query.strip()},
+            ],
+            max_tokens=150,
+            timeout=EXPANSION_TIMEOUT_SECONDS,
+        )
     text = (resp.choices[0].message.content or "").strip()
     # One phrase per line; drop numbering/bullets
     raw = [line.strip().lstrip(".-)0123456789 ").strip() for line in text.splitlines() if line.strip()]
     phrases = [p for p in raw if p][:5]
-    return phrases if phrases else [query.strip()]
+    if not phrases:
+        return [query.strip()]
+    _cache.set(key, phrases)
+    _persist(key, phrases)
+    return phrases
+
+
+def is_phrase_like(query: str) -> bool:
+    """Short keyword-style query ("data science mentor"), not a question or sentence."""
+    words = [w.strip(".,;:!\"'()") for w in query.lower().split()]
+    return 0 < len(words) <= EXPANSION_SHORT_QUERY_WORDS and "?" not in query and not _SENTENCE_WORDS.intersection(words)
+
+
+def local_expand(query: str, vocabulary: Collection[str] = ()) -> list[str]:
+    """
+    Deterministic expansion without the LLM, in microseconds. Known companies / titles /
+    skills come first (longest match against the vocabulary), then leftover content words
+    in runs of up to 4, then the kinds of help asked for. At most 5 phrases.
+    """
+    tokens = tokenize(query)
+    entities: list[str] = []
+    others: list[str] = []
+    help_phrases: list[str] = []
+    run: list[str] = []
+
+    def flush() -> None:
+        if run:
+            others.append(" ".join(run))
+            run.clear()
+
+    i = 0
+    while i < len(tokens):
+        for n in range(min(_MAX_NGRAM, len(tokens) - i), 0, -1):
+            candidate = " ".join(tokens[i : i + n])
+            if candidate in vocabulary and (n > 1 or candidate not in _FILLER):
+                flush()
+                entities.append(candidate)
+                i += n
+                break
+        else:
+            token = tokens[i]
+            i += 1
+            if token in _HELP_PHRASES:
+                flush()
+                help_phrases.append(_HELP_PHRASES[token])
+            elif token in _FILLER:
+                flush()
+            else:
+                run.append(token)
+                if len(run) == _MAX_RUN:
+                    flush()
+    flush()
+    phrases = list(dict.fromkeys(entities + others + help_phrases))[:5]
+    return phrases or ([query.strip()] if query.strip() else [])
+
+
+def _llm_future(query: str, key: str) -> Future:
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        if len(_inflight) >= EXPANSION_LLM_MAX_PENDING:
+            raise UpstreamUnavailable("openai", "saturated")
+        future = _inflight[key] = _llm_pool.submit(_expand_llm, query, key)
+    # Outside the lock: the callback runs right here if the call has already finished
+    future.add_done_callback(lambda _: _forget(key))
+    return future
+
+
+def _forget(key: str) -> None:
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+
+def expand_within_budget(
+    query: str, vocabulary: Collection[str] = (), budget_ms: float = EXPANSION_BUDGET_MS
+) -> tuple[list[str], str]:
+    """
+    expand_query() for the request path. Returns (phrases, source), where source is "cache",
+    "llm", "local" (EXPANSION_MODE skipped the LLM), "fallback" (the LLM missed the budget,
+    failed, its circuit is open or too many LLM calls are pending; local_expand() plus the query itself) or "none" (no OpenAI key: the query as is).
+    """
+    query = (query or "").strip()
+    if not query:
+        return [], "none"
+    if not OPENAI_API_KEY:
+        source, phrases = "none", [query]
+    else:
+        key = f"{_KEY_PREFIX}:{normalize_query(query)}"
+        cached = _cache.get(key)
+        if cached is not None:
+            source, phrases = "cache", list(cached)
+        elif EXPANSION_MODE == "local" or (EXPANSION_MODE == "auto" and is_phrase_like(query)):
+            source, phrases = "local", local_expand(query, vocabulary)
+        else:
+            try:
+                # An open OpenAI circuit or a full LLM queue skips straight to the fallback
+                # instead of waiting out the budget
+                if OPENAI.breaker.is_open():
+                    raise UpstreamUnavailable("openai", "circuit_open")
+                phrases = _llm_future(query, key).result(timeout=budget_ms / 1000 if budget_ms > 0 else None)
+                source = "llm"
+            except Exception:
+                # Circuit open, queue full, timed out (the call keeps going and caches its answer) or the LLM call failed
+                source, phrases = "fallback", _fallback_phrases(query, vocabulary)
+    QUERY_EXPANSIONS.inc(source=source)
+    return phrases, source
+
+
+def _fallback_phrases(query: str, vocabulary: Collection[str]) -> list[str]:
+    return list(dict.fromkeys([query] + local_expand(query, vocabulary)))[:5]
+
+
+def _expand_chunk(chunk: list[str], vocabulary: Collection[str] = ()) -> list[tuple[list[str], bool]]:
+    """
+    One LLM call for up to EXPANSION_BATCH_SIZE queries, as (phrases, fell_back) per query.
+    Anything the call leaves out, or the whole chunk if the call fails, is expanded singly.
+    """
+    try:
+        OPENAI.breaker.allow()
+        with OPENAI.breaker.record():
+            resp = get_openai().chat.completions.create(
+                model=EXPANSION_MODEL,
+                messages=[
+                    {"role": "system", "content": BATCH_SYSTEM},
+                    {"role": "user", "content": json.dumps({str(i): q for i, q in enumerate(chunk, start=1)})},
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=60 * len(chunk),
+            )
+        answer = json.loads(resp.choices[0].message.content or "{}")
+    except Exception:
+        # Circuit open, the call failed or the answer is not JSON
+        answer = {}
+    if not isinstance(answer, dict):
+        answer = {}
+    out = []
+    for i, query in enumerate(chunk, start=1):
+        value = answer.get(str(i))
+        phrases = [p.strip() for p in value if isinstance(p, str) and p.strip()][:5] if isinstance(value, list) else []
+        if not phrases:
+            out.append(_expand_single(query, vocabulary))
+            continue
+        key = f"{_KEY_PREFIX}:{normalize_query(query)}"
+        _cache.set(key, phrases)
+        _persist(key, phrases)
+        out.append((phrases, False))
+    return out
+
+
+def _expand_single(query: str, vocabulary: Collection[str]) -> tuple[list[str], bool]:
+    """expand_query(), or the local fallback when the circuit is open or the call fails."""
+    try:
+        return expand_query(query), False
+    except Exception:
+        QUERY_EXPANSIONS.inc(source="fallback")
+        return _fallback_phrases(query, vocabulary), True
+
+
+def expand_queries(
+    queries: list[str], vocabulary: Collection[str] = (), fallback: set[int] | None = None
+) -> list[list[str]]:
+    """
+    Expand many queries: cache hits are free, duplicates are expanded once, the rest are batched.
+    Queries the LLM could not expand get the local fallback; their positions are added to fallback, if given.
+    """
+    results: list[list[str] | None] = [None] * len(queries)
+    pending: dict[str, list[int]] = {}  # normalized query -> positions
+    for i, query in enumerate(queries):
+        query = (query or "").strip()
+        if not OPENAI_API_KEY or not query:
+            results[i] = [query] if query else []
+            continue
+        norm = normalize_query(query)
+        cached = _cache.get(f"{_KEY_PREFIX}:{norm}")
+        if cached is not None:
+            results[i] = list(cached)
+        else:
+            pending.setdefault(norm, []).append(i)
+    if pending:
+        groups = list(pending.values())
+        texts = [queries[positions[0]].strip() for positions in groups]
+        chunks = [texts[i : i + EXPANSION_BATCH_SIZE] for i in range(0, len(texts), EXPANSION_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=min(len(chunks), _BATCH_CONCURRENCY)) as pool:
+            expanded = [r for chunk in pool.map(partial(_expand_chunk, vocabulary=vocabulary), chunks) for r in chunk]
+        for positions, (phrases, fell_back) in zip(groups, expanded):
+            for i in positions:
+                results[i] = list(phrases)
+            if fell_back and fallback is not None:
+                fallback.update(positions)
+    return results
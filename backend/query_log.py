@@ -0,0 +1,95 @@
+"""
+Opt-in capture of /search traffic for offline replay (benchmarks/replay.py).
+
+When QUERY_LOG_PATH is set, each sampled /search or /search/stream request is written
+as one JSON line: query text, normalized cache key, facet filters (if any), dataset generation, where the
+answer came from ("cache", "fast_path", "pipeline", or "coalesced" for requests that
+waited on an identical query already in flight), expanded phrases and where they came
+from (query_expand.expand_within_budget: "llm", "cache", "local", "fallback"), why the answer was
+degraded (main._run_search, e.g. "openai:circuit_open"; null for a full answer), per-stage timings,
+total latency and the ranked hit ids with scores. Lines go through a queue to a
+background writer, so request threads never wait on disk. The file rotates at
+QUERY_LOG_MAX_BYTES and keeps QUERY_LOG_BACKUPS old files (search.jsonl.1, .2, ...).
+
+Queries are user-written text: enable this only where storing them is acceptable.
+"""
+import json
+import logging
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+from config import QUERY_LOG_PATH, QUERY_LOG_MAX_BYTES, QUERY_LOG_BACKUPS, QUERY_LOG_SAMPLE_RATE
+from metrics import request_timings
+
+_logger = logging.getLogger("fiskconnect.query_log")
+_logger.propagate = False
+_logger.setLevel(logging.INFO)
+_listener: QueueListener | None = None
+
+
+def start(path: str = QUERY_LOG_PATH) -> bool:
+    """Open the rotating log and start the writer thread (called from main.lifespan). False when disabled."""
+    global _listener
+    if not path or _listener is not None:
+        return _listener is not None
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(path, maxBytes=QUERY_LOG_MAX_BYTES, backupCount=QUERY_LOG_BACKUPS, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    records: queue.Queue = queue.Queue(-1)
+    _logger.addHandler(QueueHandler(records))
+    _listener = QueueListener(records, handler)
+    _listener.start()
+    return True
+
+
+def stop() -> None:
+    """Flush queued lines and close the file (called on shutdown)."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in list(_listener.handlers):
+        handler.close()
+    for handler in list(_logger.handlers):
+        _logger.removeHandler(handler)
+    _listener = None
+
+
+def begin(endpoint: str, query: str, normalized: str, generation: int, filters: dict | None = None) -> dict | None:
+    """New entry for one request, or None when logging is off or the request is not sampled."""
+    if _listener is None or (QUERY_LOG_SAMPLE_RATE < 1.0 and random.random() >= QUERY_LOG_SAMPLE_RATE):
+        return None
+    return {
+        "ts": round(time.time(), 3),
+        "endpoint": endpoint,
+        "query": query,
+        "normalized": normalized,
+        "filters": filters,
+        "generation": generation,
+        "source": None,
+        "phrases": None,
+        "expansion": None,
+        "degraded": None,
+        "_start": time.perf_counter(),
+        # Stage timings recorded by metrics.stage() for this request (same list the Server-Timing header reads)
+        "_timings": request_timings(),
+    }
+
+
+def finish(entry: dict | None, alumni: list[dict], source: str | None = None, degraded: str | None = None) -> None:
+    """Complete the entry with timings and hits (and why the answer was degraded, if it was) and queue it for writing."""
+    if entry is None or _listener is None:
+        return
+    total_ms = (time.perf_counter() - entry.pop("_start")) * 1000
+    stages: dict[str, float] = {}
+    for name, seconds in entry.pop("_timings") or []:
+        stages[name] = stages.get(name, 0.0) + seconds * 1000
+    entry["source"] = entry["source"] or source
+    entry["degraded"] = degraded
+    entry["timings_ms"] = {name: round(ms, 2) for name, ms in stages.items()}
+    entry["total_ms"] = round(total_ms, 2)
+    entry["hits"] = [[a.get("id"), a.get("relevanceScore")] for a in alumni]
+    _logger.info(json.dumps(entry, ensure_ascii=False))
@@ -0,0 +1,164 @@
+"""
+Token-bucket rate limiting and a concurrent batch runner for ingestion.
+
+Budgets are in estimated tokens per minute (the unit embedding providers meter),
+not records, so batches of long profiles and short profiles cost what they really
+cost. The bucket adapts to feedback: a 429 halves the refill rate and honours
+Retry-After for every caller sharing the bucket; successes slowly restore it.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Sequence
+
+from metrics import RATE_LIMITED
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    """True for HTTP 429 errors from the Pinecone or OpenAI SDKs."""
+    status = getattr(exc, "status", None) or getattr(exc, "status_code", None)
+    return status == 429
+
+
+def retry_after_seconds(exc: Exception) -> float | None:
+    """Retry-After (seconds) from a Pinecone/OpenAI HTTP error, if the server sent one."""
+    headers = getattr(exc, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled at tokens_per_minute (capacity = one minute of budget).
+    acquire() blocks until the requested tokens are available; a request larger than the
+    capacity waits for a full bucket and then drives it negative, so it is never starved.
+    """
+
+    def __init__(self, tokens_per_minute: float, min_fraction: float = 0.1, recovery: float = 0.05):
+        self.max_rate = tokens_per_minute / 60.0
+        self.min_rate = self.max_rate * min_fraction
+        self.recovery = recovery
+        self.rate = self.max_rate
+        self.capacity = float(tokens_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float) -> None:
+        need = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= need:
+                    self._tokens -= tokens
+                    return
+                wait = max(self._paused_until - now, (need - self._tokens) / self.rate)
+            time.sleep(min(max(wait, 0.01), 5.0))
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        """Server said slow down: halve the rate, drain the bucket, pause for Retry-After."""
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def on_success(self) -> None:
+        """Additive increase back towards the configured rate."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+
+def token_batches(
+    items: Sequence[Any],
+    cost: Callable[[Any], int],
+    max_tokens: int,
+    max_items: int,
+) -> list[list[int]]:
+    """Group item indices into consecutive batches of at most max_tokens / max_items each."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for i, item in enumerate(items):
+        c = cost(item)
+        if current and (current_tokens + c > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += c
+    if current:
+        batches.append(current)
+    return batches
+
+
+def run_batches(
+    batches: Sequence[Any],
+    send: Callable[[Any], Any],
+    limiter: TokenBucket | None = None,
+    cost: Callable[[Any], int] | None = None,
+    concurrency: int = 1,
+    max_retries: int = 8,
+    on_done: Callable[[Any, Any], None] | None = None,
+    upstream: str = "",
+) -> list[Any]:
+    """
+    Send batches with up to `concurrency` in flight, each first paying cost(batch) tokens
+    to the limiter. 429s feed back into the limiter and the batch is retried (fallback
+    backoff when there is no Retry-After). Returns send() results in batch order;
+    on_done(batch, result) runs as each batch completes. The first other error is raised.
+    429s are counted in metrics under `upstream` (e.g. "pinecone").
+    """
+    def work(batch):
+        for attempt in range(max_retries):
+            if limiter is not None:
+                limiter.acquire(cost(batch) if cost else 1)
+            try:
+                result = send(batch)
+            except Exception as e:
+                if not is_rate_limited(e):
+                    raise
+                RATE_LIMITED.inc(upstream=upstream or "unknown", operation="batch")
+                if attempt == max_retries - 1:
+                    raise
+                retry_after = retry_after_seconds(e)
+                if limiter is not None:
+                    limiter.on_throttle(retry_after)
+                if retry_after is None:
+                    time.sleep(min(60.0, 2.0 ** attempt))
+                continue
+            if limiter is not None:
+                limiter.on_success()
+            if on_done:
+                on_done(batch, result)
+            return result
+
+    if concurrency <= 1 or len(batches) <= 1:
+        return [work(b) for b in batches]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(work, b) for b in batches]
+        try:
+            return [f.result() for f in futures]
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
@@ -0,0 +1,175 @@
+"""
+Protection for the request path against slow or failing upstreams (Pinecone, OpenAI).
+
+Each Upstream pairs a Bulkhead with a CircuitBreaker:
+- Bulkhead: at most max_concurrent requests use the upstream at once. A request that
+  cannot get a slot within wait_ms gives up instead of queueing behind the others.
+- CircuitBreaker: after `failures` consecutive failed calls the circuit opens and calls are
+  refused immediately for reset_seconds. Then one probe call is let through
+  (half-open): success closes the circuit, failure opens it again.
+
+Refusals, and failures of guarded calls, raise UpstreamUnavailable. It carries the
+upstream, a reason ("circuit_open", "saturated", "rate_limited", "timeout", "error") and a
+Retry-After hint. main.py then answers /search from the local keyword index (degraded
+mode). Where there is no local source, it returns 503 with Retry-After.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from config import (
+    PINECONE_MAX_CONCURRENT_REQUESTS,
+    OPENAI_MAX_CONCURRENT_REQUESTS,
+    BULKHEAD_WAIT_MS,
+    BREAKER_FAILURES,
+    BREAKER_RESET_SECONDS,
+)
+from rate_limit import is_rate_limited, retry_after_seconds
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream was not called (circuit open, no free slot), or the guarded call failed."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{upstream} unavailable ({reason})")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> None:
+        """Raise UpstreamUnavailable unless a call may go ahead now (closed, or this is the half-open probe)."""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            # A probe that never reported back (caller gave up first) is replaced after reset_seconds
+            since = now - (self._opened_at if self.state == OPEN else self._probe_at)
+            if since >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._probe_at = now
+                return
+            self.rejected += 1
+            retry_after = self.reset_seconds - since
+        raise UpstreamUnavailable(self.name, "circuit_open", retry_after)
+
+    def is_open(self) -> bool:
+        """True while allow() would refuse; unlike allow() this never claims the half-open probe."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            since = time.monotonic() - (self._opened_at if self.state == OPEN else self._probe_at)
+            return since < self.reset_seconds
+
+    def success(self) -> None:
+        with self._lock:
+            self._consecutive = 0
+            self.state = CLOSED
+
+    def failure(self) -> None:
+        with self._lock:
+            self._consecutive += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._consecutive >= self.failures):
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+
+    @contextmanager
+    def record(self) -> Iterator[None]:
+        """Count the block as a success, or as a failure if it raises; errors come out as UpstreamUnavailable."""
+        try:
+            yield
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            self.failure()
+            if is_rate_limited(e):
+                reason = "rate_limited"
+            elif isinstance(e, TimeoutError) or "Timeout" in type(e).__name__:
+                reason = "timeout"
+            else:
+                reason = "error"
+            raise UpstreamUnavailable(self.name, reason, retry_after_seconds(e) or 1.0) from e
+        self.success()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._consecutive, "opened": self.opened, "rejected": self.rejected}
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int, wait_ms: float = BULKHEAD_WAIT_MS):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.wait = max(0.0, wait_ms) / 1000
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+
+    def acquire(self) -> None:
+        """Take one of max_concurrent slots; UpstreamUnavailable if none frees up within wait_ms. Pair with release()."""
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self.rejected += 1
+            raise UpstreamUnavailable(self.name, "saturated")
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot for the block (acquire() / release())."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"in_flight": self.in_flight, "max_concurrent": self.max_concurrent, "rejected": self.rejected}
+
+
+class Upstream:
+    def __init__(self, name: str, max_concurrent: int):
+        self.name = name
+        self.bulkhead = Bulkhead(name, max_concurrent)
+        self.breaker = CircuitBreaker(name)
+
+    @contextmanager
+    def call(self) -> Iterator[None]:
+        """Breaker check, bulkhead slot and outcome recording around one use of the upstream."""
+        self.breaker.allow()
+        with self.bulkhead.slot(), self.breaker.record():
+            yield
+
+    def stats(self) -> dict:
+        return {"circuit": self.breaker.stats(), "bulkhead": self.bulkhead.stats()}
+
+
+PINECONE = Upstream("pinecone", PINECONE_MAX_CONCURRENT_REQUESTS)
+OPENAI = Upstream("openai", OPENAI_MAX_CONCURRENT_REQUESTS)
+UPSTREAMS = (PINECONE, OPENAI)
+
+
+def upstream_stats() -> dict:
+    return {u.name: u.stats() for u in UPSTREAMS}
@@ -1,6 +1,10 @@
 """
 Retrieve top-k profiles by cosine similarity between query embedding and index.
 Format results as SourcedAlumni for the frontend.
+
+The corpus matrix should be L2-normalized once (normalize_rows) and passed with
+normalized=True; then scoring every phrase is a single matrix multiply plus an
+argpartition top-k, with no per-call renormalization of the corpus.
 """
 from typing import Any
 
@@ -9,16 +13,104 @@ import numpy as np
 from config import TOP_K
 
 
+# Rows scored per matmul; bounds temporaries when the corpus is a large memmap
+SCORE_BLOCK_ROWS = 65536
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    """L2-normalize the last axis. Returns a float32 array (a copy)."""
+    x = np.asarray(x, dtype=np.float32)
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-8)
+
+
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
     """a: (n, dim), b: (dim,) or (m, dim). Returns (n,) or (n, m)."""
-    a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-8)
-    if b.ndim == 1:
-        b_norm = b / (np.linalg.norm(b) + 1e-8)
-        return np.dot(a_norm, b_norm)
-    b_norm = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-8)
+    a_norm = normalize_rows(a)
+    b_norm = normalize_rows(b)
     return np.dot(a_norm, b_norm.T)
 
 
+def max_similarity(
+    corpus: np.ndarray,
+    query_embeddings: np.ndarray | list,
+    normalized: bool = False,
+) -> np.ndarray:
+    """
+    corpus: (n, dim); query_embeddings: (dim,) or (m, dim).
+    Returns (n,) float32: for each row, the max cosine similarity over all queries.
+    With normalized=True the corpus rows are assumed unit-length and used as-is.
+    """
+    queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))).T
+    n = corpus.shape[0]
+    out = np.empty(n, dtype=np.float32)
+    for start in range(0, n, SCORE_BLOCK_ROWS):
+        block = corpus[start : start + SCORE_BLOCK_ROWS]
+        if not normalized:
+            block = normalize_rows(block)
+        np.max(block @ queries, axis=1, out=out[start : start + SCORE_BLOCK_ROWS])
+    return out
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, sorted descending (argpartition, O(n + k log k))."""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        idx = np.argpartition(scores, n - k)[n - k :]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(scores[idx])[::-1]]
+
+
+def top_k_scores(
+    corpus: np.ndarray,
+    query_embeddings: np.ndarray | list,
+    top_k: int = TOP_K,
+    normalized: bool = False,
+) -> list[tuple[int, float]]:
+    """Max-fused cosine top-k over all query embeddings. Returns [(row, score)] with score > 0."""
+    if len(query_embeddings) == 0 or corpus.shape[0] == 0:
+        return []
+    scores = max_similarity(corpus, query_embeddings, normalized=normalized)
+    return [(int(i), float(scores[i])) for i in top_k_indices(scores, top_k) if scores[i] > 0]
+
+
+def top_k_per_query(
+    corpus: np.ndarray,
+    query_embeddings: np.ndarray | list,
+    top_k: int = TOP_K,
+    normalized: bool = False,
+    query_chunk: int = 256,
+) -> list[list[tuple[int, float]]]:
+    """
+    Separate cosine top-k for each query embedding (no fusion): [(row, score)] per query, score > 0.
+    The corpus is read once per chunk of queries; each block keeps only its top_k candidates per query.
+    """
+    queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+    n = corpus.shape[0]
+    out: list[list[tuple[int, float]]] = []
+    if n == 0 or len(query_embeddings) == 0:
+        return [[] for _ in range(len(query_embeddings))]
+    for q_start in range(0, len(queries), query_chunk):
+        q = queries[q_start : q_start + query_chunk].T
+        cand_rows, cand_scores = [], []
+        for start in range(0, n, SCORE_BLOCK_ROWS):
+            block = corpus[start : start + SCORE_BLOCK_ROWS]
+            if not normalized:
+                block = normalize_rows(block)
+            scores = block @ q
+            k = min(top_k, len(scores))
+            idx = np.argpartition(scores, len(scores) - k, axis=0)[len(scores) - k :]
+            cand_rows.append(idx + start)
+            cand_scores.append(np.take_along_axis(scores, idx, axis=0))
+        rows, scores = np.concatenate(cand_rows), np.concatenate(cand_scores)
+        for j in range(q.shape[1]):
+            col = scores[:, j]
+            out.append([(int(rows[i, j]), float(col[i])) for i in top_k_indices(col, top_k) if col[i] > 0])
+    return out
+
+
 def _get(obj: Any, *keys: str, default: str | None = None):
     for key in keys:
         if isinstance(obj, dict) and key in obj and obj[key] is not None:
@@ -76,19 +168,15 @@ def retrieve(
     embeddings: np.ndarray,
     query_embedding: np.ndarray,
     top_k: int = TOP_K,
+    normalized: bool = False,
 ) -> list[dict]:
     """
     Get top-k profiles by cosine similarity.
     query_embedding: (dim,) array.
     Returns list of SourcedAlumni dicts sorted by score descending.
     """
-    scores = cosine_similarity(embeddings, query_embedding)
-    indices = np.argsort(scores)[::-1][:top_k]
-    return [
-        profile_to_sourced(profiles[i], float(scores[i]))
-        for i in indices
-        if scores[i] > 0
-    ]
+    hits = top_k_scores(embeddings, query_embedding, top_k=top_k, normalized=normalized)
+    return [profile_to_sourced(profiles[i], score) for i, score in hits]
 
 
 def retrieve_multi(
@@ -96,21 +184,13 @@ def retrieve_multi(
     embeddings: np.ndarray,
     query_embeddings: list[np.ndarray],
     top_k: int = TOP_K,
+    normalized: bool = False,
 ) -> list[dict]:
     """
     Get top-k profiles using multiple query embeddings (e.g. from query expansion).
     For each profile takes the max similarity over all query embeddings.
     """
-    if not query_embeddings:
+    if len(query_embeddings) == 0:
         return []
-    all_scores = np.stack(
-        [cosine_similarity(embeddings, q) for q in query_embeddings],
-        axis=1,
-    )
-    scores = np.max(all_scores, axis=1)
-    indices = np.argsort(scores)[::-1][:top_k]
-    return [
-        profile_to_sourced(profiles[i], float(scores[i]))
-        for i in indices
-        if scores[i] > 0
-    ]
+    hits = top_k_scores(embeddings, np.asarray(query_embeddings), top_k=top_k, normalized=normalized)
+    return [profile_to_sourced(profiles[i], score) for i, score in hits]
@@ -0,0 +1,124 @@
+"""
+Local manifest of what embed_json_to_vectordb.py has already written to Pinecone.
+
+Tracks profile id -> document hash for one (index, namespace, mode). Each run diffs the
+new JSON against it (adds / changes / deletes) so only the delta is sent. Progress is
+committed per upsert batch to an append-only journal next to the snapshot, so a run
+interrupted after hours of rate-limited batches resumes from the last committed batch.
+
+Files (path = SYNC_MANIFEST_PATH):
+- <path>: JSON snapshot {"target": {...}, "records": {id: hash}, "status": ...}
+- <path>.journal: JSON lines {"upsert": {id: hash}} / {"delete": [ids]}, folded into the
+  snapshot by compact() at the end of a successful run
+"""
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+def document_hash(document: str) -> str:
+    return hashlib.sha256(document.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SyncPlan:
+    adds: list[str] = field(default_factory=list)
+    changes: list[str] = field(default_factory=list)
+    deletes: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def upserts(self) -> list[str]:
+        return self.adds + self.changes
+
+
+class SyncManifest:
+    """id -> document hash of records committed to one Pinecone target."""
+
+    def __init__(self, path: str, target: dict):
+        self.path = Path(path)
+        self.journal_path = self.path.with_name(self.path.name + ".journal")
+        self.target = target
+        self.records: dict[str, str] = {}
+        self.status = "empty"
+        self._lock = threading.Lock()  # batches commit from concurrent upload workers
+        self._load()
+
+    def _load(self) -> None:
+        if self.path.exists():
+            snap = json.loads(self.path.read_text(encoding="utf-8"))
+            if snap.get("target") != self.target:
+                # Different index/namespace/mode: nothing we recorded applies; start over
+                self.journal_path.unlink(missing_ok=True)
+                return
+            self.records = dict(snap.get("records") or {})
+            self.status = snap.get("status") or "complete"
+        if self.journal_path.exists():
+            data = self.journal_path.read_bytes()
+            committed = 0
+            for line in data.splitlines(keepends=True):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self._apply(entry)
+                committed += len(line)
+            if committed < len(data):
+                # Torn tail from a crash mid-write: cut it off so new commits start on a fresh line
+                with open(self.journal_path, "r+b") as f:
+                    f.truncate(committed)
+                    os.fsync(f.fileno())
+            self.status = "interrupted"
+
+    def _apply(self, entry: dict) -> None:
+        self.records.update(entry.get("upsert") or {})
+        for pid in entry.get("delete") or []:
+            self.records.pop(pid, None)
+
+    def plan(self, hashes: dict[str, str]) -> SyncPlan:
+        """Diff the desired state (id -> document hash) against what is committed."""
+        plan = SyncPlan()
+        for pid, h in hashes.items():
+            old = self.records.get(pid)
+            if old is None:
+                plan.adds.append(pid)
+            elif old != h:
+                plan.changes.append(pid)
+            else:
+                plan.unchanged += 1
+        plan.deletes = [pid for pid in self.records if pid not in hashes]
+        return plan
+
+    def commit(self, upserted: dict[str, str] | None = None, deleted: list[str] | None = None) -> None:
+        """Durably record one completed batch."""
+        entry = {}
+        if upserted:
+            entry["upsert"] = upserted
+        if deleted:
+            entry["delete"] = list(deleted)
+        if not entry:
+            return
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(entry)
+
+    def compact(self) -> None:
+        """Fold the journal into the snapshot (atomic rename) and mark the sync complete."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"target": self.target, "records": self.records, "status": "complete"}),
+            encoding="utf-8",
+        )
+        tmp.replace(self.path)
+        self.journal_path.unlink(missing_ok=True)
+        self.status = "complete"
@@ -0,0 +1,149 @@
+"""IVFIndex add / replace against a fresh build, and when update_ann_index retrains."""
+import numpy as np
+import pytest
+
+import ann_index
+from ann_index import ANN_FILE, IVFIndex, row_fingerprints, update_ann_index
+from local_store import load_local_index, save_local_index
+from search import normalize_rows
+
+DIM = 16
+
+
+def _matrix(n: int, seed: int) -> np.ndarray:
+    return normalize_rows(np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32))
+
+
+def _fresh(index: IVFIndex, vectors: np.ndarray) -> IVFIndex:
+    """Same centroids / codebooks, every row assigned and encoded from scratch."""
+    fresh = IVFIndex(
+        index.centroids, np.empty(0, dtype=np.int32), index.trained_rows, codebooks=index.codebooks, fingerprints=np.empty(0, dtype=np.uint64)
+    )
+    fresh.add(vectors)
+    return fresh
+
+
+def _assert_same_rows(index: IVFIndex, expected: IVFIndex) -> None:
+    np.testing.assert_array_equal(index.assignments, expected.assignments)
+    np.testing.assert_array_equal(index.fingerprints, expected.fingerprints)
+    np.testing.assert_array_equal(index.list_rows, expected.list_rows)
+    np.testing.assert_array_equal(index.list_offsets, expected.list_offsets)
+    if expected.codes is not None:
+        np.testing.assert_array_equal(index.codes, expected.codes)
+
+
+def test_fingerprints_change_with_any_value():
+    x = _matrix(4, seed=0)
+    y = x.copy()
+    y[2, 5] = np.nextafter(y[2, 5], np.float32(2))
+    fx, fy = row_fingerprints(x), row_fingerprints(y)
+    assert fx.dtype == np.uint64
+    assert (fx != fy).tolist() == [False, False, True, False]
+    np.testing.assert_array_equal(row_fingerprints(x), fx)
+    assert len(row_fingerprints(x[:0])) == 0
+
+
+@pytest.mark.parametrize("pq_m", [0, 4])
+def test_add_matches_a_fresh_assignment(pq_m):
+    base, extra = _matrix(300, seed=1), _matrix(40, seed=2)
+    index = IVFIndex.train(base, nlist=8, pq_m=pq_m)
+    index.add(extra)
+    assert len(index) == 340
+    _assert_same_rows(index, _fresh(index, np.concatenate([base, extra])))
+
+
+@pytest.mark.parametrize("pq_m", [0, 4])
+def test_replace_matches_a_fresh_assignment(pq_m):
+    vectors = _matrix(300, seed=3)
+    index = IVFIndex.train(vectors, nlist=8, pq_m=pq_m)
+    changed = np.array([0, 17, 299])
+    vectors = vectors.copy()
+    vectors[changed] = _matrix(3, seed=4)
+    index.replace(changed, vectors[changed])
+    _assert_same_rows(index, _fresh(index, vectors))
+
+
+def test_search_finds_added_and_replaced_rows():
+    vectors = _matrix(300, seed=5)
+    index = IVFIndex.train(vectors, nlist=8)
+    extra = _matrix(1, seed=6)
+    index.add(extra)
+    vectors = np.concatenate([vectors, extra])
+    vectors[10] = _matrix(1, seed=7)[0]
+    index.replace(np.array([10]), vectors[10:11])
+    for row in (10, 300):
+        hits = index.search(vectors, vectors[row], top_k=1, nprobe=1)
+        assert hits[0][0] == row and hits[0][1] == pytest.approx(1.0, abs=1e-5)
+
+
+@pytest.fixture
+def local_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ann_index, "ANN_MIN_PROFILES", 10)
+    monkeypatch.setattr(ann_index, "ANN_NLIST", 8)
+    monkeypatch.setattr(ann_index, "ANN_PQ_M", 0)
+    trains = []
+    train = IVFIndex.train.__func__
+    monkeypatch.setattr(IVFIndex, "train", classmethod(lambda cls, *a, **kw: trains.append(1) or train(cls, *a, **kw)))
+
+    def write(ids: list[str], vectors: np.ndarray) -> int:
+        """Save the local index, update the ANN index and return how many times it was trained so far."""
+        save_local_index(str(tmp_path), ids, vectors, "test-model")
+        update_ann_index(str(tmp_path))
+        return len(trains)
+
+    return tmp_path, write
+
+
+def test_update_appends_and_replaces_without_retraining(local_dir):
+    path, write = local_dir
+    ids = [f"p{i}" for i in range(200)]
+    vectors = _matrix(200, seed=8)
+    assert write(ids, vectors) == 1
+
+    # Appended rows and a few changed vectors under the same ids: no retrain
+    ids += [f"p{i}" for i in range(200, 260)]
+    vectors = np.concatenate([vectors, _matrix(60, seed=9)])
+    vectors[[3, 50]] = _matrix(2, seed=10)
+    assert write(ids, vectors) == 1
+
+    index = IVFIndex.load(path / ANN_FILE)
+    assert len(index) == 260 and index.trained_rows == 200
+    # Compare with the matrix as saved (save_local_index re-normalizes, which may move the last bit)
+    _, saved, _ = load_local_index(str(path))
+    _assert_same_rows(index, _fresh(index, saved))
+
+
+def test_update_retrains_when_most_rows_changed(local_dir):
+    _, write = local_dir
+    ids = [f"p{i}" for i in range(200)]
+    vectors = _matrix(200, seed=11)
+    write(ids, vectors)
+    vectors[:150] = _matrix(150, seed=12)
+    assert write(ids, vectors) == 2
+
+
+def test_update_retrains_when_ids_are_reordered_or_removed(local_dir):
+    _, write = local_dir
+    ids = [f"p{i}" for i in range(200)]
+    vectors = _matrix(200, seed=13)
+    write(ids, vectors)
+    assert write(ids[::-1], vectors[::-1].copy()) == 2
+    assert write(ids[:150], vectors[:150].copy()) == 3
+
+
+def test_update_retrains_an_index_without_fingerprints(local_dir):
+    path, write = local_dir
+    ids = [f"p{i}" for i in range(200)]
+    vectors = _matrix(200, seed=14)
+    write(ids, vectors)
+    index = IVFIndex.load(path / ANN_FILE)
+    index.fingerprints = None
+    index.save(path / ANN_FILE)
+    assert write(ids, vectors) == 2
+    assert IVFIndex.load(path / ANN_FILE).fingerprints is not None
+
+
+def test_small_matrices_keep_no_index(local_dir):
+    path, write = local_dir
+    write([f"p{i}" for i in range(5)], _matrix(5, seed=15))
+    assert not (path / ANN_FILE).exists()
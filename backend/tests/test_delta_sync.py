@@ -0,0 +1,115 @@
+"""
+Delta sync (embed_json_to_vectordb.main + sync_manifest) against an in-memory Pinecone stand-in.
+
+get_index() is replaced by a recorder; every record is its own upsert batch so batch
+boundaries are predictable.
+"""
+import json
+
+import pytest
+
+import embed_json_to_vectordb
+import pinecone_store
+from sync_manifest import SyncManifest
+
+
+class RecordingIndex:
+    """Records upsert_records / delete calls; raises after fail_after successful upserts."""
+
+    def __init__(self, fail_after: int | None = None):
+        self.upserts: list[list[str]] = []
+        self.deletes: list[list[str]] = []
+        self.fail_after = fail_after
+
+    def upsert_records(self, namespace, records):
+        if self.fail_after is not None and len(self.upserts) >= self.fail_after:
+            raise RuntimeError("simulated crash")
+        self.upserts.append([r["_id"] for r in records])
+
+    def delete(self, ids, namespace):
+        self.deletes.append(list(ids))
+
+
+def _profile(i: int, headline: str = "") -> dict:
+    return {
+        "id": f"p{i}",
+        "firstName": f"Person{i}",
+        "headline": headline or f"Engineer {i}",
+        "topSkills": "Python • SQL",
+        "location": {"parsed": {"text": "Nashville, Tennessee, United States"}},
+        "currentPosition": [{"companyName": f"Company {i}"}],
+    }
+
+
+@pytest.fixture
+def sync(tmp_path, monkeypatch):
+    """Returns run(profiles, index) -> exit code, sharing one manifest across runs."""
+    data_path = tmp_path / "profiles.json"
+    monkeypatch.setattr(embed_json_to_vectordb, "VECTOR_BACKEND", "pinecone")
+    monkeypatch.setattr(embed_json_to_vectordb, "DATA_PATH", str(data_path))
+    monkeypatch.setattr(embed_json_to_vectordb, "MAX_INDEX_PROFILES", 100)
+    monkeypatch.setattr(embed_json_to_vectordb, "PINECONE_API_KEY", "pc-test")
+    monkeypatch.setattr(embed_json_to_vectordb, "PINECONE_USE_INTEGRATED_EMBEDDING", True)
+    monkeypatch.setattr(embed_json_to_vectordb, "SYNC_MANIFEST_PATH", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(pinecone_store, "PINECONE_UPSERT_BATCH_TOKENS", 1)
+    monkeypatch.setattr(pinecone_store, "PINECONE_UPSERT_CONCURRENCY", 1)
+
+    def run(profiles: list[dict], index: RecordingIndex) -> int:
+        data_path.write_text(json.dumps(profiles), encoding="utf-8")
+        monkeypatch.setattr(pinecone_store, "get_index", lambda: index)
+        return embed_json_to_vectordb.main()
+
+    return run
+
+
+def test_second_run_without_changes_sends_nothing(sync):
+    profiles = [_profile(i) for i in range(5)]
+    first = RecordingIndex()
+    assert sync(profiles, first) == 0
+    assert sorted(pid for batch in first.upserts for pid in batch) == [f"p{i}" for i in range(5)]
+
+    second = RecordingIndex()
+    assert sync(profiles, second) == 0
+    assert second.upserts == []
+    assert second.deletes == []
+
+
+def test_crash_resumes_after_last_committed_batch(sync):
+    profiles = [_profile(i) for i in range(5)]
+    crashed = RecordingIndex(fail_after=2)
+    with pytest.raises(RuntimeError):
+        sync(profiles, crashed)
+    assert crashed.upserts == [["p0"], ["p1"]]
+
+    resumed = RecordingIndex()
+    assert sync(profiles, resumed) == 0
+    assert resumed.upserts == [["p2"], ["p3"], ["p4"]]
+    assert resumed.deletes == []
+
+
+def test_edit_and_removal_send_one_upsert_and_one_delete(sync):
+    profiles = [_profile(i) for i in range(5)]
+    assert sync(profiles, RecordingIndex()) == 0
+
+    edited = [p for p in profiles if p["id"] != "p4"]
+    edited[2] = _profile(2, headline="Data Scientist")
+    index = RecordingIndex()
+    assert sync(edited, index) == 0
+    assert index.upserts == [["p2"]]
+    assert index.deletes == [["p4"]]
+
+
+def test_torn_journal_line_does_not_swallow_later_commits(tmp_path):
+    path = tmp_path / "manifest.json"
+    target = {"index": "test", "namespace": "ns", "mode": "text:text"}
+    manifest = SyncManifest(str(path), target)
+    manifest.commit(upserted={"a": "1"})
+    with open(manifest.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"upsert": {"b":')  # crash mid-write
+
+    reopened = SyncManifest(str(path), target)
+    assert reopened.records == {"a": "1"}
+    reopened.commit(upserted={"c": "3"})
+
+    again = SyncManifest(str(path), target)
+    assert again.records == {"a": "1", "c": "3"}
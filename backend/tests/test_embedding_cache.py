@@ -0,0 +1,96 @@
+"""EmbeddingCache: persistence, deduplication and recovery from torn writes."""
+import numpy as np
+import pytest
+
+from embedding_cache import INDEX_FILE, VECTORS_FILE, EmbeddingCache, document_key
+
+MODEL = "test-model"
+DIM = 4
+
+
+def _vectors(n: int, start: int = 0) -> np.ndarray:
+    return np.arange(start * DIM, (start + n) * DIM, dtype=np.float32).reshape(n, DIM)
+
+
+def _assert_cached(cache: EmbeddingCache, texts: list[str], expected: np.ndarray) -> None:
+    vectors, misses = cache.get_many(texts)
+    assert misses == []
+    np.testing.assert_array_equal(np.stack(vectors), expected)
+
+
+def test_vectors_persist_across_instances(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a", "b"], _vectors(2))
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 2 and reopened.dim == DIM
+    _assert_cached(reopened, ["b", "a"], _vectors(2)[::-1])
+    vectors, misses = reopened.get_many(["a", "unknown"])
+    assert misses == [1] and vectors[1] is None
+
+
+def test_cached_and_repeated_texts_are_stored_once(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a"], _vectors(1))
+    cache.put_many(["a", "b", "b"], _vectors(3, start=1))
+    assert len(cache) == 2
+    assert (cache.path / VECTORS_FILE).stat().st_size == 2 * DIM * 4
+    # The first vector stored for a text wins
+    _assert_cached(cache, ["a", "b"], np.stack([_vectors(1)[0], _vectors(3, start=1)[1]]))
+
+
+def test_keys_depend_on_the_model(tmp_path):
+    assert document_key("m1", "text") != document_key("m2", "text")
+    EmbeddingCache(str(tmp_path), "m1").put_many(["text"], _vectors(1))
+    assert EmbeddingCache(str(tmp_path), "m2").get_many(["text"])[1] == [0]
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a"], _vectors(1))
+    with pytest.raises(ValueError):
+        cache.put_many(["b"], np.zeros((1, DIM + 1), dtype=np.float32))
+    with pytest.raises(ValueError):
+        cache.put_many(["b", "c"], _vectors(1))
+
+
+def test_torn_vector_row_is_truncated_and_appends_stay_aligned(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a", "b"], _vectors(2))
+    # Crash after writing part of a row, before its index line
+    with open(cache.path / VECTORS_FILE, "ab") as f:
+        f.write(b"\x01\x02\x03\x04\x05\x06")
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert (reopened.path / VECTORS_FILE).stat().st_size == 2 * DIM * 4
+    reopened.put_many(["c"], _vectors(1, start=2))
+    _assert_cached(EmbeddingCache(str(tmp_path), MODEL), ["a", "b", "c"], _vectors(3))
+
+
+def test_torn_index_line_is_truncated(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a"], _vectors(1))
+    # Crash after a full row but in the middle of its index line
+    with open(cache.path / VECTORS_FILE, "ab") as f:
+        f.write(_vectors(1, start=1).tobytes())
+    with open(cache.path / INDEX_FILE, "a", encoding="utf-8") as f:
+        f.write(document_key(MODEL, "b")[:20])
+
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 1
+    assert (reopened.path / INDEX_FILE).read_text(encoding="utf-8").endswith("\n")
+    # The unreferenced row stays; the next entry goes after it and its index line starts on a fresh line
+    reopened.put_many(["b"], _vectors(1, start=5))
+    _assert_cached(EmbeddingCache(str(tmp_path), MODEL), ["a", "b"], np.stack([_vectors(1)[0], _vectors(1, start=5)[0]]))
+
+
+def test_index_entries_past_the_vectors_are_ignored(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), MODEL)
+    cache.put_many(["a", "b"], _vectors(2))
+    # Vectors file cut back (e.g. lost on a crash) while the index still lists row 1
+    with open(cache.path / VECTORS_FILE, "r+b") as f:
+        f.truncate(DIM * 4)
+    reopened = EmbeddingCache(str(tmp_path), MODEL)
+    assert len(reopened) == 1
+    assert reopened.get_many(["a", "b"])[1] == [1]
+    reopened.put_many(["b"], _vectors(1, start=7))
+    _assert_cached(EmbeddingCache(str(tmp_path), MODEL), ["a", "b"], np.stack([_vectors(1)[0], _vectors(1, start=7)[0]]))
@@ -0,0 +1,105 @@
+"""FacetIndex: value normalization, OR within a facet / AND across facets, counts, store round trip."""
+import numpy as np
+import pytest
+
+from facets import FacetIndex, _intersect, facet_metadata, pinecone_filter
+
+
+def _profile(pid: str, companies=(), location: str = "", skills=()) -> dict:
+    return {
+        "id": pid,
+        "currentPosition": [{"companyName": c} for c in companies],
+        "location": {"parsed": {"text": location}} if location else {},
+        "topSkills": " • ".join(skills),
+    }
+
+
+PROFILES = [
+    _profile("a", ["Google"], "Nashville, Tennessee, United States", ["Python", "SQL"]),
+    _profile("b", ["Deloitte"], "Atlanta, Georgia, United States", ["Excel"]),
+    _profile("c", ["google", "Fisk University"], "Memphis, Tennessee, United States", ["Python"]),
+    _profile("d", [], "", ["SQL"]),
+    _profile("e", ["Deloitte"], "Nashville, Tennessee, United States", ["Python", "Excel"]),
+]
+
+
+@pytest.fixture(scope="module")
+def index() -> FacetIndex:
+    return FacetIndex.build(PROFILES)
+
+
+def _ids(index: FacetIndex, rows) -> list[str]:
+    return [index.ids[r] for r in rows]
+
+
+def test_values_match_case_insensitively(index):
+    assert _ids(index, index.match({"company": ["GOOGLE"]})) == ["a", "c"]
+    assert _ids(index, index.match({"skill": ["  python "]})) == ["a", "c", "e"]
+
+
+def test_locations_match_by_comma_separated_part(index):
+    assert _ids(index, index.match({"location": ["Tennessee"]})) == ["a", "c", "e"]
+    assert _ids(index, index.match({"location": ["Nashville, Tennessee, United States"]})) == ["a", "e"]
+
+
+def test_values_or_within_a_facet_and_facets_and(index):
+    assert _ids(index, index.match({"company": ["Google", "Deloitte"]})) == ["a", "b", "c", "e"]
+    assert _ids(index, index.match({"company": ["Google", "Deloitte"], "skill": ["Python"]})) == ["a", "c", "e"]
+    assert _ids(index, index.match({"company": ["Deloitte"], "location": ["Tennessee"], "skill": ["Excel"]})) == ["e"]
+
+
+def test_unknown_values_match_nothing(index):
+    assert len(index.match({"company": ["Nope"]})) == 0
+    assert len(index.match({"company": ["Google"], "skill": ["Nope"]})) == 0
+
+
+def test_select_ignores_blank_values(index):
+    assert index.select({"company": ["", "  "], "skill": []}) is None
+    scope = index.select({"skill": ["SQL", "sql"], "company": [""]})
+    assert scope.values == {"skill": ("sql",)}
+    assert _ids(index, scope.rows) == ["a", "d"]
+    assert scope.contains(0) and scope.contains(3) and not scope.contains(1) and not scope.contains(None)
+
+
+def test_filter_key_is_order_independent(index):
+    one = index.select({"skill": ["Python", "SQL"], "company": ["Google"]})
+    two = index.select({"company": ["google"], "skill": ["sql", "python"]})
+    assert one.key == two.key
+
+
+def test_counts_over_all_and_filtered_rows(index):
+    assert index.counts("skill") == [("Python", 3), ("SQL", 2), ("Excel", 2)]
+    rows = index.match({"location": ["Tennessee"]})
+    assert dict(index.counts("company", rows=rows)) == {"Google": 2, "Fisk University": 1, "Deloitte": 1}
+    assert index.counts("company", rows=rows[:0]) == []
+    assert len(index.counts("skill", limit=1)) == 1
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ([1, 3, 5, 7], [3, 4, 5, 9]),
+        ([9], [1, 2, 9]),
+        ([0, 2], [1, 3]),
+        ([], [1, 2]),
+        ([1, 2, 3], [1, 2, 3]),
+    ],
+)
+def test_intersect_matches_set_intersection(a, b):
+    a, b = np.array(a, dtype=np.int32), np.array(b, dtype=np.int32)
+    expected = sorted(set(a.tolist()) & set(b.tolist()))
+    assert _intersect(a, b).tolist() == expected
+    assert _intersect(b, a).tolist() == expected
+
+
+def test_round_trip_through_tables(index):
+    loaded = FacetIndex.from_tables(index.to_tables())
+    query = {"company": ["Deloitte", "Google"], "location": ["Tennessee"]}
+    assert loaded.match(query).tolist() == index.match(query).tolist()
+    assert loaded.counts("location") == index.counts("location")
+
+
+def test_pinecone_filter_uses_normalized_metadata_values():
+    assert facet_metadata(PROFILES[2])["company"] == ["google", "fisk university"]
+    assert pinecone_filter({"company": ["Google", "GOOGLE"], "skill": []}) == {"company": {"$in": ["google"]}}
+    assert pinecone_filter({"skill": []}) is None
@@ -0,0 +1,102 @@
+"""KeywordIndex BM25 ranking, the exact-match fast path and reciprocal-rank fusion."""
+import numpy as np
+import pytest
+
+from keyword_index import KeywordIndex, rrf_fuse, tokenize
+
+
+def _profile(pid: str, headline: str, company: str = "", position: str = "", skills: str = "") -> dict:
+    exp = [{"companyName": company, "position": position}] if company or position else []
+    return {"id": pid, "headline": headline, "experience": exp, "topSkills": skills}
+
+
+PROFILES = [
+    _profile("p0", "Data analyst", company="KPMG", position="Manager", skills="Python • SQL"),
+    _profile("p1", "Python python python developer", company="Acme Corp", skills="Python"),
+    _profile("p2", "Marketing lead", company="Acme Corp", position="Manager"),
+    _profile("p3", "Nurse practitioner", company="Vanderbilt Health"),
+    _profile("p4", "Software engineer", company="Acme Corp", position="Engineer", skills="C++ • Python"),
+]
+
+
+@pytest.fixture(scope="module")
+def index() -> KeywordIndex:
+    return KeywordIndex.build(PROFILES)
+
+
+def test_tokenize_drops_stopwords_and_keeps_symbols():
+    assert tokenize("The C++ and C# developer, for YOU") == ["c++", "c#", "developer"]
+
+
+def test_search_ranks_by_bm25(index):
+    hits = index.search("python", n_results=10)
+    ids = [pid for pid, _ in hits]
+    assert set(ids) == {"p0", "p1", "p4"}
+    # Highest term frequency first; scores descending
+    assert ids[0] == "p1"
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+
+def test_rare_terms_outweigh_common_ones(index):
+    # "nurse" occurs once in the corpus, "acme" three times
+    hits = index.search("nurse acme", n_results=5)
+    assert hits[0][0] == "p3"
+
+
+def test_search_restricted_to_allowed_rows(index):
+    hits = index.search("python", n_results=10, allowed=np.array([0, 3], dtype=np.int32))
+    assert [pid for pid, _ in hits] == ["p0"]
+    assert index.search("python", n_results=10, allowed=np.array([], dtype=np.int32)) == []
+
+
+def test_search_without_known_terms_is_empty(index):
+    assert index.search("zzz qqq", n_results=5) == []
+    assert index.search("", n_results=5) == []
+
+
+def test_exact_match_only_for_company_names(index):
+    hits = index.exact_match("KPMG", n_results=5)
+    assert [pid for pid, _ in hits] == ["p0"]
+    # Titles and skills are known entities, but too generic for the fast path
+    assert "manager" in index.entities and "python" in index.entities
+    assert index.exact_match("Manager", n_results=5) is None
+    assert index.exact_match("Python", n_results=5) is None
+    assert index.exact_match("KPMG consulting", n_results=5) is None
+
+
+def test_exact_match_respects_max_share(index):
+    # Acme Corp is in 3 of 5 profiles
+    assert len(index.exact_match("acme corp", n_results=5, max_share=0.6)) == 3
+    assert index.exact_match("acme corp", n_results=5, max_share=0.5) is None
+    assert index.exact_match("KPMG", n_results=5, max_share=0.2) is not None
+
+
+def test_exact_match_with_no_allowed_rows_is_none(index):
+    assert index.exact_match("KPMG", n_results=5, allowed=np.array([1, 2], dtype=np.int32)) is None
+
+
+def test_round_trip_through_tables(index):
+    loaded = KeywordIndex.from_tables(index.ids, index.to_tables())
+    assert loaded.search("python manager", n_results=5) == index.search("python manager", n_results=5)
+    assert loaded.companies == index.companies and loaded.entities == index.entities
+
+
+def test_rrf_scales_first_in_every_list_to_one():
+    fused = rrf_fuse([[("a", 0.9), ("b", 0.8)], [("a", 12.0), ("c", 3.0)]], n_results=5, k=60)
+    assert fused[0] == ("a", pytest.approx(1.0))
+    scores = dict(fused)
+    # Found by one list only: at most half
+    assert scores["b"] == pytest.approx((1 / 62) / (2 / 61))
+    assert scores["b"] < 0.5 and scores["c"] == pytest.approx(scores["b"])
+
+
+def test_rrf_ignores_empty_lists_and_duplicates():
+    fused = rrf_fuse([[("a", 1.0), ("a", 0.5), ("b", 0.4)], []], n_results=5, k=60)
+    assert fused[0] == ("a", pytest.approx(1.0))
+    assert dict(fused)["b"] == pytest.approx(61 / 63)
+    assert rrf_fuse([[], []], n_results=5) == []
+
+
+def test_rrf_truncates_to_n_results():
+    fused = rrf_fuse([[(str(i), 1.0) for i in range(10)]], n_results=3)
+    assert [pid for pid, _ in fused] == ["0", "1", "2"]
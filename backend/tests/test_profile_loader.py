@@ -0,0 +1,73 @@
+"""indexer.iter_profiles / load_profiles: streaming a JSON array across read-chunk boundaries."""
+import json
+
+import pytest
+
+import indexer
+from indexer import iter_profiles, load_profiles
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Read 7 characters at a time so every object straddles several chunk boundaries."""
+    monkeypatch.setattr(indexer, "_READ_CHUNK", 7)
+
+
+def _write(tmp_path, text: str):
+    path = tmp_path / "profiles.json"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+PROFILES = [
+    {"id": "a", "headline": "Data analyst, [brackets] and {braces}", "topSkills": "Python • SQL"},
+    {"id": "b", "about": "Quote \" and comma, inside", "nested": {"list": [1, 2, {"x": "]"}]}},
+    {"id": "c", "headline": "Ünïcödé ✓"},
+]
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_objects_split_across_chunks(tmp_path, small_chunks, indent):
+    path = _write(tmp_path, json.dumps(PROFILES, indent=indent, ensure_ascii=False))
+    assert list(iter_profiles(path)) == PROFILES
+
+
+def test_object_split_at_the_real_chunk_size(tmp_path):
+    # One profile larger than a 1 MiB chunk, with the next one starting right after it
+    big = {"id": "big", "about": "x" * (indexer._READ_CHUNK + 123)}
+    profiles = [{"id": "first"}, big, {"id": "last"}]
+    path = _write(tmp_path, json.dumps(profiles))
+    assert [p["id"] for p in iter_profiles(path)] == ["first", "big", "last"]
+
+
+def test_whitespace_bom_and_separators(tmp_path, small_chunks):
+    path = _write(tmp_path, "\ufeff  \n [ \n" + '{"id": "a"} ,\n\n  {"id": "b"}\n ] \n')
+    assert [p["id"] for p in iter_profiles(path)] == ["a", "b"]
+
+
+def test_non_objects_are_skipped(tmp_path, small_chunks):
+    path = _write(tmp_path, '[1, "two", {"id": "a"}, null, [3], {"id": "b"}]')
+    assert [p["id"] for p in iter_profiles(path)] == ["a", "b"]
+
+
+@pytest.mark.parametrize("text", ['{"id": "a"}', "[]", "", "   "])
+def test_no_profiles(tmp_path, small_chunks, text):
+    assert list(iter_profiles(_write(tmp_path, text))) == []
+
+
+def test_truncated_file_raises(tmp_path, small_chunks):
+    path = _write(tmp_path, '[{"id": "a"}, {"id": "b", "headline": "cut off')
+    profiles = iter_profiles(path)
+    assert next(profiles)["id"] == "a"
+    with pytest.raises(json.JSONDecodeError):
+        next(profiles)
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_profiles(str(tmp_path / "missing.json")))
+
+
+def test_load_profiles_stops_at_the_limit(tmp_path, small_chunks):
+    path = _write(tmp_path, json.dumps([{"id": str(i)} for i in range(10)]))
+    assert [p["id"] for p in load_profiles(path, limit=3)] == ["0", "1", "2"]
@@ -0,0 +1,122 @@
+"""EmbeddingBatcher: coalescing, per-request ordering and error fan-out; embed_phrases caching."""
+import threading
+
+import numpy as np
+import pytest
+
+import query_embed
+from query_embed import EmbeddingBatcher
+from resilience import CircuitBreaker, UpstreamUnavailable
+
+
+class FakeEmbeddings:
+    """Stands in for _create_embeddings (vector = [length, sum of code points]) and records every call."""
+
+    def __init__(self, fail: bool = False):
+        self.calls: list[list[str]] = []
+        self.fail = fail
+
+    def __call__(self, phrases: list[str], model: str) -> list[np.ndarray]:
+        self.calls.append(list(phrases))
+        if self.fail:
+            raise RuntimeError("embeddings API down")
+        return [_vector(p) for p in phrases]
+
+
+def _vector(phrase: str) -> np.ndarray:
+    return np.array([len(phrase), sum(map(ord, phrase))], dtype=np.float32)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A fresh OpenAI circuit for each test (failures=2)."""
+    breaker = CircuitBreaker("openai", failures=2, reset_seconds=60)
+    monkeypatch.setattr(query_embed.OPENAI, "breaker", breaker)
+    return breaker
+
+
+def _run_concurrently(batcher: EmbeddingBatcher, requests: list[list[str]]) -> list:
+    results: list = [None] * len(requests)
+
+    def run(i: int) -> None:
+        try:
+            results[i] = batcher.embed(requests[i], "m")
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(requests))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return results
+
+
+def test_concurrent_requests_share_one_call_and_keep_their_order(monkeypatch, breaker):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(query_embed, "_create_embeddings", fake)
+    batcher = EmbeddingBatcher(window_ms=200, max_batch=100, concurrency=1)
+    requests = [["resume", "finance"], ["finance", "mentoring", "resume"], ["google"]]
+    results = _run_concurrently(batcher, requests)
+
+    assert len(fake.calls) == 1
+    # Deduplicated across requests
+    assert sorted(fake.calls[0]) == ["finance", "google", "mentoring", "resume"]
+    for phrases, vectors in zip(requests, results):
+        np.testing.assert_array_equal(np.stack(vectors), np.stack([_vector(p) for p in phrases]))
+    assert batcher.stats()["requests"] == 3 and batcher.stats()["api_calls"] == 1
+
+
+def test_batches_are_split_at_max_batch(monkeypatch, breaker):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(query_embed, "_create_embeddings", fake)
+    batcher = EmbeddingBatcher(window_ms=200, max_batch=2, concurrency=2)
+    results = _run_concurrently(batcher, [["a"], ["b"], ["c"], ["d"], ["e"]])
+    assert len(fake.calls) >= 3
+    assert all(len(call) <= 2 for call in fake.calls)
+    assert [np.stack(r)[:, 1].tolist() for r in results] == [[97], [98], [99], [100], [101]]
+
+
+def test_a_failed_batch_fails_every_request_but_counts_once(monkeypatch, breaker):
+    fake = FakeEmbeddings(fail=True)
+    monkeypatch.setattr(query_embed, "_create_embeddings", fake)
+    batcher = EmbeddingBatcher(window_ms=200, max_batch=100, concurrency=1)
+    results = _run_concurrently(batcher, [["a"], ["b"], ["c"], ["d"]])
+
+    assert len(fake.calls) == 1
+    assert all(isinstance(r, UpstreamUnavailable) and r.reason == "error" for r in results)
+    # One upstream failure, not one per waiting request: the circuit (failures=2) stays closed
+    assert breaker._consecutive == 1 and breaker.state == "closed"
+
+
+def test_direct_path_without_window(monkeypatch, breaker):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(query_embed, "_create_embeddings", fake)
+    batcher = EmbeddingBatcher(window_ms=0)
+    vectors = batcher.embed(["x", "yy"], "m")
+    assert fake.calls == [["x", "yy"]]
+    np.testing.assert_array_equal(vectors[1], _vector("yy"))
+    fake.fail = True
+    with pytest.raises(UpstreamUnavailable):
+        batcher.embed(["z"], "m")
+    assert breaker._consecutive == 1
+
+
+def test_embed_phrases_sends_only_misses_and_fails_fast_when_open(monkeypatch, breaker):
+    fake = FakeEmbeddings()
+    monkeypatch.setattr(query_embed, "_create_embeddings", fake)
+    monkeypatch.setattr(query_embed, "_batcher", EmbeddingBatcher(window_ms=0))
+    monkeypatch.setattr(query_embed, "_cache", query_embed.LRUCache(100, name="test_phrase_embedding"))
+
+    first = query_embed.embed_phrases(["Resume", "finance"], model="m")
+    second = query_embed.embed_phrases(["resume ", "finance", "mentoring"], model="m")
+    assert fake.calls == [["Resume", "finance"], ["mentoring"]]
+    np.testing.assert_array_equal(second[:2], first)
+
+    breaker.failure()
+    breaker.failure()
+    with pytest.raises(UpstreamUnavailable):
+        query_embed.embed_phrases(["new phrase"], model="m")
+    # Cached phrases are still served with the circuit open
+    assert query_embed.embed_phrases(["finance"], model="m").shape == (1, 2)
+    assert len(fake.calls) == 2
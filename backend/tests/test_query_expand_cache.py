@@ -0,0 +1,60 @@
+"""Expansion cache file: replay, and compaction that keeps other workers' entries."""
+import json
+
+import pytest
+
+import query_expand
+from cache import LRUCache
+
+
+@pytest.fixture
+def cache_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "expansions.jsonl")
+    monkeypatch.setattr(query_expand, "EXPANSION_CACHE_PATH", path)
+    monkeypatch.setattr(query_expand, "EXPANSION_CACHE_SIZE", 3)
+    monkeypatch.setattr(query_expand, "_cache", LRUCache(3, name="expansion"))
+    monkeypatch.setattr(query_expand, "_file_lines", 0)
+    return path
+
+
+def _key(query: str) -> str:
+    return f"{query_expand._KEY_PREFIX}:{query}"
+
+
+def _lines(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_persisted_expansions_are_replayed(cache_file):
+    query_expand._persist(_key("resume"), ["resume", "career advice"])
+    query_expand._cache.clear()
+    assert query_expand.load_cache(cache_file) == 1
+    assert query_expand._cache.get(_key("resume")) == ["resume", "career advice"]
+
+
+def test_file_is_compacted_past_twice_the_cache_size(cache_file):
+    for i in range(6):
+        query_expand._persist(_key(f"q{i}"), [f"p{i}"])
+    assert len(_lines(cache_file)) == 6
+    # Another worker appended a newer answer for q5 while this one counted its own lines
+    with open(cache_file, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"k": _key("q5"), "v": ["other worker"], "t": 4e9}) + "\n")
+        f.write(json.dumps({"k": "stale-prompt:q9", "v": ["x"], "t": 4e9}) + "\n")
+        f.write("{torn line\n")
+    query_expand._persist(_key("q6"), ["p6"])
+
+    entries = _lines(cache_file)
+    # Newest EXPANSION_CACHE_SIZE entries, one per key; other prompts' keys and torn lines dropped
+    assert [e["k"] for e in entries] == [_key("q4"), _key("q6"), _key("q5")]
+    assert entries[-1]["v"] == ["other worker"]
+    assert query_expand._file_lines == 3
+
+
+def test_expired_entries_are_dropped(cache_file, monkeypatch):
+    monkeypatch.setattr(query_expand, "EXPANSION_CACHE_TTL_SECONDS", 60.0)
+    with open(cache_file, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"k": _key("old"), "v": ["old"], "t": 1.0}) + "\n")
+    query_expand._persist(_key("new"), ["new"])
+    query_expand._compact(cache_file)
+    assert [e["k"] for e in _lines(cache_file)] == [_key("new")]
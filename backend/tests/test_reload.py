@@ -0,0 +1,94 @@
+"""Hot reload: the source watcher waits for files to settle, and old stores close once unused."""
+import asyncio
+import gc
+
+import pytest
+
+import main
+from dataset import Dataset
+
+
+class FakeStore:
+    def __init__(self):
+        self.closed = False
+
+    def __len__(self) -> int:
+        return 1
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _dataset(generation: int, sources: dict | None = None) -> Dataset:
+    return Dataset(generation=generation, store=FakeStore(), alumni_body=b"", sources=sources or {})
+
+
+@pytest.fixture
+def watcher(monkeypatch):
+    """Run _watch_sources against scripted source mtimes; returns (files, reloads, run)."""
+    files = {"data.json": 1}
+    reloads = []
+    monkeypatch.setattr(main, "RELOAD_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(main, "RELOAD_SETTLE_SECONDS", 0.15)
+    monkeypatch.setattr(main, "source_mtimes", lambda: dict(files))
+    monkeypatch.setattr(main, "_dataset", _dataset(1, dict(files)))
+
+    async def reload_dataset():
+        reloads.append(dict(files))
+        main._dataset = _dataset(main._dataset.generation + 1, dict(files))
+
+    monkeypatch.setattr(main, "reload_dataset", reload_dataset)
+
+    async def run(script):
+        task = asyncio.create_task(main._watch_sources())
+        try:
+            await script()
+        finally:
+            task.cancel()
+
+    return files, reloads, lambda script: asyncio.run(run(script))
+
+
+def test_watcher_waits_until_the_files_settle(watcher):
+    files, reloads, run = watcher
+
+    async def script():
+        # The ingestion run rewrites the files one after another, each within the settle window
+        for step in range(2, 6):
+            files["data.json"] = step
+            files["profiles.store"] = step
+            await asyncio.sleep(0.05)
+        assert reloads == []
+        await asyncio.sleep(0.4)
+
+    run(script)
+    assert reloads == [{"data.json": 5, "profiles.store": 5}]
+
+
+def test_watcher_reloads_on_the_marker_without_settling(watcher, monkeypatch):
+    files, reloads, run = watcher
+    monkeypatch.setattr(main, "RELOAD_SETTLE_SECONDS", 60.0)
+    monkeypatch.setattr(main, "RELOAD_MARKER_PATH", "ready")
+
+    async def script():
+        files["data.json"] = 2
+        await asyncio.sleep(0.1)
+
+    run(script)
+    assert reloads == [{"data.json": 2}]
+
+
+def test_old_store_closes_once_the_last_request_lets_go(monkeypatch):
+    monkeypatch.setattr(main, "load_dataset", _dataset)
+    monkeypatch.setattr(main, "_dataset", _dataset(1))
+    in_flight = main._dataset
+    old_store = in_flight.store
+
+    asyncio.run(main.reload_dataset())
+    assert main._dataset.generation == 2
+    # A request that grabbed generation 1 is still using it
+    assert not old_store.closed
+    del in_flight
+    gc.collect()
+    assert old_store.closed
+    assert not main._dataset.store.closed
@@ -0,0 +1,137 @@
+"""CircuitBreaker / Bulkhead state transitions and /search load shedding."""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from resilience import HALF_OPEN, OPEN, Bulkhead, CircuitBreaker, UpstreamUnavailable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("resilience.time.monotonic", clock)
+    return clock
+
+
+def _fail(breaker: CircuitBreaker) -> None:
+    with pytest.raises(UpstreamUnavailable):
+        with breaker.record():
+            raise RuntimeError("upstream down")
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failures=3, reset_seconds=10)
+    for _ in range(2):
+        _fail(breaker)
+        breaker.allow()
+    _fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.is_open()
+    with pytest.raises(UpstreamUnavailable) as exc:
+        breaker.allow()
+    assert exc.value.reason == "circuit_open"
+    assert exc.value.retry_after == pytest.approx(10)
+    assert breaker.rejected == 1
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failures=2, reset_seconds=10)
+    _fail(breaker)
+    with breaker.record():
+        pass
+    _fail(breaker)
+    assert breaker.state != OPEN
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=10)
+    _fail(breaker)
+    clock.now += 10
+    assert not breaker.is_open()
+    breaker.allow()  # the probe
+    assert breaker.state == HALF_OPEN
+    # is_open() never claims the probe; a second caller is refused while it runs
+    assert breaker.is_open()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.allow()
+
+
+def test_failed_probe_reopens_and_successful_probe_closes(clock):
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=10)
+    _fail(breaker)
+    clock.now += 10
+    breaker.allow()
+    _fail(breaker)
+    assert breaker.state == OPEN and breaker.opened == 2
+    clock.now += 10
+    breaker.allow()
+    with breaker.record():
+        pass
+    assert breaker.state == "closed"
+    breaker.allow()
+
+
+def test_probe_that_never_reports_back_is_replaced(clock):
+    breaker = CircuitBreaker("test", failures=1, reset_seconds=10)
+    _fail(breaker)
+    clock.now += 10
+    breaker.allow()
+    clock.now += 10
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_bulkhead_rejects_when_full():
+    bulkhead = Bulkhead("test", max_concurrent=2, wait_ms=0)
+    bulkhead.acquire()
+    with bulkhead.slot():
+        assert bulkhead.in_flight == 2
+        with pytest.raises(UpstreamUnavailable) as exc:
+            bulkhead.acquire()
+        assert exc.value.reason == "saturated"
+    bulkhead.release()
+    assert bulkhead.in_flight == 0
+    assert bulkhead.rejected == 1
+    with bulkhead.slot():
+        pass
+
+
+def test_bulkhead_waits_for_a_slot_within_wait_ms():
+    bulkhead = Bulkhead("test", max_concurrent=1, wait_ms=2000)
+    bulkhead.acquire()
+    threading.Timer(0.05, bulkhead.release).start()
+    with bulkhead.slot():
+        assert bulkhead.in_flight == 1
+    assert bulkhead.rejected == 0
+
+
+def test_search_requests_beyond_the_limit_are_shed(monkeypatch):
+    monkeypatch.setattr(main, "SEARCH_MAX_INFLIGHT", 2)
+    monkeypatch.setattr(main, "_dataset", None)
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main, "_search_inflight", 2)
+    r = client.post("/search", json={"query": "resume help"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == str(main.SHED_RETRY_AFTER_SECONDS)
+    assert "Too many" in r.json()["detail"]
+
+    # Below the limit the request is admitted (and fails only because no dataset is loaded)
+    monkeypatch.setattr(main, "_search_inflight", 1)
+    r = client.post("/search", json={"query": "resume help"})
+    assert r.status_code == 503
+    assert r.json()["detail"] == "Search index not ready"
+    assert main._search_inflight == 1
+    # Other endpoints are never shed
+    monkeypatch.setattr(main, "_search_inflight", 2)
+    assert client.get("/health").status_code == 200
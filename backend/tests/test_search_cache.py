@@ -0,0 +1,187 @@
+"""SingleFlight coalescing, the /search result cache and /search/stream joining the same flight."""
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import LeaderGone, LRUCache, SingleFlight
+
+CARD = {"id": "p1", "name": "Ada", "relevanceScore": 0.9}
+
+
+def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _in_threads(fn, n: int) -> tuple[list[threading.Thread], list]:
+    results: list = [None] * n
+
+    def run(i: int) -> None:
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def test_single_flight_runs_once_per_key():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    threads, results = _in_threads(lambda: flight.do("k", fn), 4)
+    _wait_for(lambda: flight.coalesced == 3)
+    release.set()
+    for t in threads:
+        t.join(5)
+    assert results == ["result"] * 4 and len(calls) == 1
+    # Nothing in flight any more: the next call runs again
+    assert flight.do("k", lambda: "again") == "again"
+
+
+def test_single_flight_shares_the_leaders_exception():
+    flight = SingleFlight()
+    call, leader = flight.join("k")
+    assert leader
+    threads, results = _in_threads(lambda: flight.do("k", lambda: "not run"), 2)
+    _wait_for(lambda: flight.coalesced == 2)
+    flight.finish("k", call, error=RuntimeError("boom"))
+    for t in threads:
+        t.join(5)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_abandoned_leader_hands_over_to_a_waiter():
+    flight = SingleFlight()
+    call, _ = flight.join("k")
+    threads, results = _in_threads(lambda: flight.do("k", lambda: "rerun"), 1)
+    _wait_for(lambda: flight.coalesced == 1)
+    flight.finish("k", call, abandoned=True)
+    threads[0].join(5)
+    assert results == ["rerun"]
+    with pytest.raises(LeaderGone):
+        flight.wait(call)
+
+
+def test_peek_leaves_counters_alone():
+    cache = LRUCache(10)
+    cache.set("a", 1)
+    assert cache.peek("a") == 1 and cache.peek("b") is None
+    assert cache.hits == 0 and cache.misses == 0
+
+
+@pytest.fixture
+def search(monkeypatch):
+    """/search against a stub snapshot; runs records each pipeline run and gate holds it until set."""
+    monkeypatch.setattr(main, "_dataset", SimpleNamespace(generation=1, facets=None))
+    monkeypatch.setattr(main, "_search_cache", LRUCache(100, name="search"))
+    monkeypatch.setattr(main, "_search_flight", SingleFlight())
+    monkeypatch.setattr(main, "_fast_path", lambda *a, **kw: None)
+    monkeypatch.setattr(main, "VECTOR_BACKEND", "pinecone")
+    monkeypatch.setattr(main, "PINECONE_USE_INTEGRATED_EMBEDDING", True)
+    state = SimpleNamespace(runs=[], degraded=None, gate=threading.Event(), client=TestClient(main.app))
+    state.gate.set()
+
+    def run_search(dataset, query, entry=None, scope=None):
+        state.runs.append(query)
+        state.gate.wait(5)
+        return [CARD], state.degraded
+
+    monkeypatch.setattr(main, "_run_search", run_search)
+    return state
+
+
+def test_full_answers_are_cached(search):
+    for _ in range(3):
+        r = search.client.post("/search", json={"query": "Resume help"})
+        assert r.json()["alumni"][0]["id"] == "p1" and "X-Search-Degraded" not in r.headers
+    assert search.runs == ["Resume help"]
+
+
+def test_degraded_answers_are_not_cached(search):
+    search.degraded = "expansion"
+    for _ in range(2):
+        r = search.client.post("/search", json={"query": "resume help"})
+        assert r.headers["X-Search-Degraded"] == "expansion"
+    assert len(search.runs) == 2
+    assert len(main._search_cache) == 0
+
+
+def test_concurrent_searches_run_the_pipeline_once(search):
+    search.gate.clear()
+    threads, results = _in_threads(lambda: search.client.post("/search", json={"query": "resume help"}), 3)
+    _wait_for(lambda: main._search_flight.coalesced == 2)
+    search.gate.set()
+    for t in threads:
+        t.join(5)
+    assert [r.json()["alumni"][0]["id"] for r in results] == ["p1"] * 3
+    assert len(search.runs) == 1
+
+
+def test_leader_rechecks_the_cache(search):
+    key = main._search_key(main._dataset, "resume help")
+    main._search_cache.set(key, [CARD])
+    # A caller that missed just before the previous run stored its result
+    assert main._search_and_cache(main._dataset, "resume help", key) == ([CARD], None)
+    assert search.runs == []
+
+
+def _events(response) -> list[dict]:
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_search_waits_on_a_stream_in_flight(search, monkeypatch):
+    release = threading.Event()
+    streams = []
+
+    def stream_search(dataset, query, key, entry=None, scope=None):
+        streams.append(query)
+        yield "phrases", {"phrases": [query]}
+        release.wait(5)
+        main._search_cache.set(key, [CARD])
+        return [CARD], None
+
+    monkeypatch.setattr(main, "_stream_search", stream_search)
+    stream_thread, stream_result = _in_threads(lambda: search.client.post("/search/stream", json={"query": "resume help"}), 1)
+    _wait_for(lambda: streams)
+    search_thread, search_result = _in_threads(lambda: search.client.post("/search", json={"query": "resume help"}), 1)
+    _wait_for(lambda: main._search_flight.coalesced == 1)
+    release.set()
+    for t in stream_thread + search_thread:
+        t.join(5)
+
+    assert [e["event"] for e in _events(stream_result[0])] == ["phrases", "done"]
+    assert search_result[0].json()["alumni"][0]["id"] == "p1"
+    assert search.runs == [] and len(streams) == 1
+
+
+def test_stream_waits_on_a_search_in_flight(search, monkeypatch):
+    monkeypatch.setattr(main, "_stream_search", lambda *a, **kw: pytest.fail("stream ran the pipeline"))
+    search.gate.clear()
+    search_thread, search_result = _in_threads(lambda: search.client.post("/search", json={"query": "resume help"}), 1)
+    _wait_for(lambda: search.runs)
+    stream_thread, stream_result = _in_threads(lambda: search.client.post("/search/stream", json={"query": "resume help"}), 1)
+    _wait_for(lambda: main._search_flight.coalesced == 1)
+    search.gate.set()
+    for t in search_thread + stream_thread:
+        t.join(5)
+
+    events = _events(stream_result[0])
+    assert [e["event"] for e in events] == ["done"] and events[0]["alumni"][0]["id"] == "p1"
+    assert len(search.runs) == 1
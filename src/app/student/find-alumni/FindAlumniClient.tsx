@@ -98,17 +98,43 @@ export function FindAlumniClient() {
     setError(null);
     setLoading(true);
     try {
-      const res = await fetch(`${SOURCING_API_URL}/search`, {
+      const res = await fetch(`${SOURCING_API_URL}/search/stream`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query: query.trim() }),
       });
-      if (!res.ok) {
+      if (!res.ok || !res.body) {
         const err = await res.json().catch(() => ({}));
         throw new Error(err.detail || res.statusText || "Search failed");
       }
-      const data = await res.json();
-      setAlumni((data.alumni || []) as SourcedAlumni[]);
+      setAlumni([]);
+      // NDJSON: cards show up after the first phrase; later lines re-rank them; "done" is final
+      const cards = new Map<string, SourcedAlumni>();
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() ?? "";
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const msg = JSON.parse(line);
+          if (msg.event === "error") throw new Error(msg.detail || "Search failed");
+          if (msg.event === "done") {
+            setAlumni((msg.alumni || []) as SourcedAlumni[]);
+          } else if (msg.event === "update") {
+            for (const a of (msg.alumni || []) as SourcedAlumni[]) cards.set(a.id, a);
+            const ranked = ((msg.ranking || []) as { id: string; relevanceScore: number }[])
+              .filter((r) => cards.has(r.id))
+              .map((r) => ({ ...cards.get(r.id)!, relevanceScore: r.relevanceScore }));
+            setAlumni(ranked);
+            setLoading(false);
+          }
+        }
+      }
     } catch (e) {
       setError(e instanceof Error ? e.message : "Search failed");
       setAlumni([]);